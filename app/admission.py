@@ -0,0 +1,84 @@
+from itertools import islice
+from threading import BoundedSemaphore
+from time import monotonic
+
+
+class DeadlineExceeded(Exception):
+    """Raised by `Deadline.check` when a calculation is over its compute budget."""
+
+
+class Deadline:
+    """Point in time by which a calculation should be finished, checked cooperatively."""
+
+    # Number of items between two checks in `checked`, so checking costs next to nothing
+    CHECK_INTERVAL = 1024
+
+    def __init__(self, budget):
+        """
+        Start the budget now.
+
+        :param float budget: Number of seconds the calculation may take
+        """
+        self.budget = budget
+        self.expires = monotonic() + budget
+
+    def remaining(self):
+        """
+        Seconds left in the budget.
+
+        :return: Float of the remaining seconds, 0 once the deadline has passed
+        """
+        return max(self.expires - monotonic(), 0.0)
+
+    def check(self):
+        """Raise `DeadlineExceeded` once the deadline has passed."""
+        if monotonic() > self.expires:
+            raise DeadlineExceeded(f"calculation exceeded its budget of {self.budget}s")
+
+    def checked(self, items):
+        """
+        Iterate over the items, checking the deadline before every `CHECK_INTERVAL` items.
+
+        :param iterable items: Items of a loop of a calculation
+
+        :return: Generator of the items
+        """
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, self.CHECK_INTERVAL))
+            if not chunk:
+                return
+            self.check()
+            yield from chunk
+
+
+class ConcurrencyLimiter:
+    """
+    Limits the number of requests that calculate at the same time in this process. Requests
+    beyond the limit wait for at most `wait` seconds and are then rejected, instead of
+    queueing up behind a burst of large paths.
+    """
+
+    def __init__(self, limit, wait=0.0):
+        """
+        :param int limit: Maximum number of concurrent calculations, 0 disables the limit
+        :param float wait: Seconds to wait for a slot before rejecting the request
+        """
+        self.limit = limit
+        self.wait = wait
+        self.slots = BoundedSemaphore(limit) if limit else None
+
+    def acquire(self):
+        """
+        Take a slot, waiting for at most `wait` seconds.
+
+        :return: Boolean whether a slot was taken
+        """
+        if self.slots is None:
+            return True
+        return self.slots.acquire(timeout=self.wait) if self.wait else self.slots.acquire(blocking=False)
+
+    def release(self):
+        """Give back a slot taken with `acquire`."""
+        if self.slots is not None:
+            self.slots.release()
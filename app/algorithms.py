@@ -1,12 +1,25 @@
+import math
 from abc import ABC, abstractmethod
+from array import array
 from bisect import bisect_left, bisect_right
 
+from app.admission import DeadlineExceeded
+from app.config import Config
+from app.segments import grouped
+from app.workers import default_workers, get_process_pool, in_worker_process
+
 
 class CoordinateCounter(ABC):
 
+    # Optional `Deadline` of the calculation, which the counters check in their loops, so
+    # they stop cooperatively with `DeadlineExceeded` once it has passed
+    deadline = None
+
     def __init__(self, x_ranges, y_ranges):
         """
-        Initialize any of the coordinate counters with common input.
+        Initialize any of the coordinate counters with common input. The output of
+        `Segments.merged` is used as is by the counters that need the lines grouped by
+        axis, other ranges are grouped by them first.
 
         :param set x_ranges: Set of tuples (y_pos, start_x, end_x) for horizontal lines
         :param set y_ranges: Set of tuples (x_pos, start_y, end_y) for vertical lines
@@ -25,31 +38,51 @@ class CoordinateCounter(ABC):
         """
         pass
 
+    def checked(self, items):
+        """
+        Iterate over the items of a loop, checking the deadline if there is one.
+
+        :param iterable items: Items of a loop of the counter
+
+        :return: Iterable of the items
+        """
+        return items if self.deadline is None else self.deadline.checked(items)
+
+    def delegate(self, algorithm):
+        """
+        Counter of another algorithm for the same input and with the same deadline.
+
+        :param CoordinateCounter algorithm: Algorithm to count with
+
+        :return: The new counter
+        """
+        counter = algorithm(self.x_ranges, self.y_ranges)
+        counter.deadline = self.deadline
+        return counter
+
 
 class BinarySearch(CoordinateCounter):
     """Binary search implementation, which turned out to be the fastest."""
 
     @staticmethod
-    def count_intersections(start_y, end_y, x_pos, x_by_y, y_positions):
+    def count_intersections(start_y, end_y, x_pos, lines):
         """
-        Counts the number of intersections between vertical lines defined in `relevant_ys`
-        and a horizontal line.
+        Counts the number of intersections between the horizontal lines in `lines` and a
+        vertical line.
 
-        :param int start_y: The start y-coordinate of the horizontal line
-        :param int end_y: The ending y-coordinate of the horizontal line
-        :param int x_pos: The x-coordinate of the horizontal line
-        :param dict x_by_y: Dictionary for quick lookup of x-by-y coordinates
-        :param list y_positions: List of relevant sorted y-coordinates
+        :param int start_y: The start y-coordinate of the vertical line
+        :param int end_y: The ending y-coordinate of the vertical line
+        :param int x_pos: The x-coordinate of the vertical line
+        :param Segments lines: Horizontal lines grouped by y position, see `grouped`
 
         :return: Integer representing the number of intersections
         """
-        start_idx = bisect_left(y_positions, start_y)
-        end_idx = bisect_right(y_positions, end_y)
-        relevant_ys = y_positions[start_idx:end_idx]
+        # The lines are sorted by y position, so the relevant lines are a single slice
+        first = lines.offsets[bisect_left(lines.positions, start_y)]
+        last = lines.offsets[bisect_right(lines.positions, end_y)]
         return sum(
             1
-            for y in relevant_ys
-            for x_start, x_end in x_by_y[y]
+            for x_start, x_end in zip(lines.starts[first:last], lines.ends[first:last])
             if x_start <= x_pos <= x_end
         )
 
@@ -61,20 +94,17 @@ class BinarySearch(CoordinateCounter):
         :return: Integer representing the number of unique coordinates
         """
 
-        # Sort x_ranges by y position for binary search and sum of all points
+        # Horizontal lines grouped by y position for binary search and sum of all points
         # on horizontal lines
-        y_positions = sorted(set(y for y, _, _ in self.x_ranges))
-        x_by_y = {y: [] for y in y_positions}
-        for y, start_x, end_x in self.x_ranges:
-            x_by_y[y].append((start_x, end_x))
-            self.total += (end_x - start_x + 1)
+        lines = grouped(self.x_ranges)
+        self.total += sum(lines.ends) - sum(lines.starts) + len(lines)
 
         # Count vertical lines and subtract intersections
-        for x_pos, start_y, end_y in self.y_ranges:
+        for x_pos, start_y, end_y in self.checked(self.y_ranges):
             points_in_line = end_y - start_y + 1
 
             # Binary search for relevant y positions
-            intersections = self.count_intersections(start_y, end_y, x_pos, x_by_y, y_positions)
+            intersections = self.count_intersections(start_y, end_y, x_pos, lines)
             self.total += points_in_line - intersections
 
         return self.total
@@ -120,7 +150,7 @@ class EarlyIntersectionFiltering(CoordinateCounter):
             self.total += (end_x - start_x + 1)
 
         # Count vertical lines and subtract intersections
-        for x_pos, start_y, end_y in self.y_ranges:
+        for x_pos, start_y, end_y in self.checked(self.y_ranges):
             points_in_line = end_y - start_y + 1
 
             # Only check y positions that have horizontal lines
@@ -163,7 +193,7 @@ class SimpleIntersection(CoordinateCounter):
             self.total += (end_x - start_x + 1)
 
         # Sum of all points on vertical lines, but subtract intersections
-        for x_pos, start_y, end_y in self.y_ranges:
+        for x_pos, start_y, end_y in self.checked(self.y_ranges):
             points_in_line = end_y - start_y + 1
 
             # Subtract intersection points
@@ -171,3 +201,381 @@ class SimpleIntersection(CoordinateCounter):
             self.total += points_in_line - intersections
 
         return self.total
+
+
+class FenwickTree:
+    """Binary indexed tree over a fixed number of slots, used by `SweepLine`."""
+
+    def __init__(self, size):
+        """
+        Initialize an empty tree.
+
+        :param int size: Number of slots in the tree
+        """
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, value):
+        """
+        Add `value` to the slot at `index`.
+
+        :param int index: Zero-based index of the slot
+        :param int value: Value to add to the slot
+        """
+        index += 1
+        while index <= self.size:
+            self.tree[index] += value
+            index += index & -index
+
+    def prefix_sum(self, index):
+        """
+        Sum of the slots up to and including `index`.
+
+        :param int index: Zero-based index of the last slot, -1 for an empty prefix
+
+        :return: Integer representing the sum of the slots
+        """
+        index += 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class SweepLine(CoordinateCounter):
+    """
+    Sweeps a horizontal line from bottom to top, keeping the vertical lines that cross the
+    sweep line in a Fenwick tree over their compressed x-coordinates. Counting runs in
+    O((H + V) log V), regardless of the shape of the path or the size of the coordinates.
+    """
+
+    ADD = 0
+    QUERY = 1
+    REMOVE = 2
+
+    def count_intersections(self):
+        """
+        Counts the number of intersections between all horizontal and vertical lines.
+
+        :return: Integer representing the number of intersections
+        """
+
+        # Compress the x-coordinates of the vertical lines to slots in the tree, which are
+        # the groups of the merged lines
+        verticals = grouped(self.y_ranges)
+        x_positions = verticals.positions
+        tree = FenwickTree(len(x_positions))
+
+        # Horizontal lines are queried by the range of slots they cover, lines that cover
+        # no slot cannot intersect and are left out
+        query_starts, query_ends = array("q"), array("q")
+        for _, start_x, end_x in self.x_ranges:
+            query_starts.append(bisect_left(x_positions, start_x))
+            query_ends.append(bisect_right(x_positions, end_x))
+
+        # Vertical lines are added at their start and removed at their end, horizontal
+        # lines are queried in between, so lines ending on the same y are still counted.
+        # Every event is packed into a single integer of (y, kind, slot or query), which
+        # sorts the same as a tuple and takes a fraction of its memory
+        size = max(len(x_positions), len(query_starts)) + 1
+        events = []
+        offsets, starts, ends = verticals.offsets, verticals.starts, verticals.ends
+        for slot in range(len(x_positions)):
+            for index in range(offsets[slot], offsets[slot + 1]):
+                events.append((starts[index] * 3 + self.ADD) * size + slot)
+                events.append((ends[index] * 3 + self.REMOVE) * size + slot)
+        for query, (y_pos, _, _) in enumerate(self.x_ranges):
+            if query_starts[query] < query_ends[query]:
+                events.append((y_pos * 3 + self.QUERY) * size + query)
+        events.sort()
+
+        intersections = 0
+        for event in self.checked(events):
+            position_kind, first = divmod(event, size)
+            kind = position_kind % 3
+            if kind == self.ADD:
+                tree.add(first, 1)
+            elif kind == self.REMOVE:
+                tree.add(first, -1)
+            else:
+                intersections += tree.prefix_sum(query_ends[first] - 1) - tree.prefix_sum(query_starts[first] - 1)
+
+        return intersections
+
+    def unique_coordinates(self):
+        """
+        Main method to be implemented for counting the unique coordinates, should return
+        the number of unique coordinates.
+
+        :return: Integer representing the number of unique coordinates
+        """
+
+        # Sum of all points on horizontal and vertical lines
+        for _, start, end in self.x_ranges:
+            self.total += (end - start + 1)
+        for _, start, end in self.y_ranges:
+            self.total += (end - start + 1)
+
+        # Subtract the points that are on both a horizontal and a vertical line
+        self.total -= self.count_intersections()
+        return self.total
+
+
+def _count_band_intersections(x_ranges, y_ranges):
+    """
+    Counts the intersections within a single band of `ParallelSweepLine`, at the module
+    level so it can be sent to a worker process.
+
+    :param list x_ranges: List of tuples (y_pos, start_x, end_x) for horizontal lines
+    :param list y_ranges: List of tuples (x_pos, start_y, end_y) for vertical lines
+
+    :return: Integer representing the number of intersections
+    """
+    return SweepLine(x_ranges, y_ranges).count_intersections()
+
+
+class ParallelSweepLine(SweepLine):
+    """
+    Sweep line implementation that splits the vertical lines into bands of x-coordinates
+    and counts the intersections of every band in a pool of worker processes. Inputs with
+    fewer lines than `threshold` are counted in the current process, since sending the
+    lines to the workers costs more than it saves, and so are inputs that are already
+    counted in a worker process. The defaults are `algorithm.parallel_workers` and
+    `algorithm.parallel_threshold` of the config, read on first use.
+    """
+
+    def __init__(self, x_ranges, y_ranges, workers=None, threshold=None):
+        """
+        Initialize the counter with the common input and the parallelization settings.
+
+        :param set x_ranges: Set of tuples (y_pos, start_x, end_x) for horizontal lines
+        :param set y_ranges: Set of tuples (x_pos, start_y, end_y) for vertical lines
+        :param int workers: Number of worker processes (default is `default_workers`)
+        :param int threshold: Minimum number of lines to count in parallel
+        """
+        super().__init__(x_ranges, y_ranges)
+        self.workers = workers
+        self.threshold = threshold
+
+    def count_intersections(self):
+        """
+        Counts the number of intersections between all horizontal and vertical lines, in
+        parallel if the input is large enough.
+
+        :return: Integer representing the number of intersections
+        """
+        if in_worker_process():
+            return super().count_intersections()
+        workers = self.workers or default_workers()
+        threshold = Config.PARALLEL_THRESHOLD if self.threshold is None else self.threshold
+        if workers < 2 or len(self.x_ranges) + len(self.y_ranges) < threshold:
+            return super().count_intersections()
+
+        # Split the vertical lines, sorted by x-coordinate, into bands with an equal number of lines
+        y_ranges = list(grouped(self.y_ranges))
+        if not y_ranges:
+            return 0
+        band_size = -(-len(y_ranges) // workers)
+        bands = [y_ranges[index:index + band_size] for index in range(0, len(y_ranges), band_size)]
+
+        # Every band only needs the horizontal lines that overlap its x-coordinates
+        pool = get_process_pool(workers)
+        futures = []
+        for band in bands:
+            low, high = band[0][0], band[-1][0]
+            x_ranges = [line for line in self.x_ranges if line[1] <= high and line[2] >= low]
+            futures.append(pool.submit(_count_band_intersections, x_ranges, band))
+
+        if self.deadline is None:
+            return sum(future.result() for future in futures)
+
+        # The bands cannot be interrupted, but the request stops waiting for them
+        try:
+            return sum(future.result(timeout=self.deadline.remaining()) for future in futures)
+        except TimeoutError as e:
+            for future in futures:
+                future.cancel()
+            raise DeadlineExceeded(f"calculation exceeded its budget of {self.deadline.budget}s") from e
+
+
+class Bitmap(CoordinateCounter):
+    """
+    Paints the lines into a bitmap of the bounding box, with a byte per cell, and counts the
+    painted cells. Every line is painted with a single slice assignment, so the cost
+    depends on the size of the bounding box instead of the number of intersections. Inputs
+    with a bounding box of more than `max_area` cells are counted with `fallback` instead.
+    """
+
+    # Default of `max_area`, `None` reads `algorithm.bitmap_max_area` of the config on first use
+    MAX_AREA = None
+
+    def __init__(self, x_ranges, y_ranges, max_area=None, fallback=SweepLine):
+        """
+        Initialize the counter with the common input and the size limit of the bitmap.
+
+        :param set x_ranges: Set of tuples (y_pos, start_x, end_x) for horizontal lines
+        :param set y_ranges: Set of tuples (x_pos, start_y, end_y) for vertical lines
+        :param int max_area: Maximum number of cells of the bitmap (default is `MAX_AREA`)
+        :param CoordinateCounter fallback: Algorithm for larger bounding boxes
+        """
+        super().__init__(x_ranges, y_ranges)
+        if max_area is None:
+            max_area = Config.BITMAP_MAX_AREA if self.MAX_AREA is None else self.MAX_AREA
+        self.max_area = max_area
+        self.fallback = fallback
+
+    def bounding_box(self):
+        """
+        Smallest box containing all lines.
+
+        :return: Tuple of (min_x, min_y, width, height), or `None` without lines
+        """
+        horizontal, vertical = grouped(self.x_ranges), grouped(self.y_ranges)
+        xs = vertical.positions[:1] + vertical.positions[-1:]
+        ys = horizontal.positions[:1] + horizontal.positions[-1:]
+        if horizontal.positions:
+            xs += [min(horizontal.starts), max(horizontal.ends)]
+        if vertical.positions:
+            ys += [min(vertical.starts), max(vertical.ends)]
+        if not xs:
+            return None
+        return min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1
+
+    def unique_coordinates(self):
+        """
+        Main method to be implemented for counting the unique coordinates, should return
+        the number of unique coordinates.
+
+        :return: Integer representing the number of unique coordinates
+        """
+        box = self.bounding_box()
+        if box is None:
+            return self.total
+        min_x, min_y, width, height = box
+        if width * height > self.max_area:
+            self.total = self.delegate(self.fallback).unique_coordinates()
+            return self.total
+
+        # Paint the lines with slice assignments, vertical lines as a slice with a step of a row
+        grid = bytearray(width * height)
+        for y_pos, start, end in self.checked(self.x_ranges):
+            offset = (y_pos - min_y) * width - min_x
+            grid[offset + start:offset + end + 1] = b"\x01" * (end - start + 1)
+        for x_pos, start, end in self.checked(self.y_ranges):
+            offset = x_pos - min_x
+            grid[offset + (start - min_y) * width:offset + (end - min_y) * width + 1:width] = b"\x01" * (end - start + 1)
+
+        self.total = grid.count(1)
+        return self.total
+
+
+class AutoSelect(CoordinateCounter):
+    """
+    Picks the counter with the lowest estimated cost for the shape of the input. The cost
+    of `BinarySearch` grows with the number of horizontal lines every vertical line has to
+    scan, which is estimated from a sample of the vertical lines, while `SweepLine` costs
+    O((H + V) log V) regardless of the shape and `Bitmap` depends on the size of the
+    bounding box. Large inputs for `SweepLine` are counted
+    with `ParallelSweepLine`, which falls back to a single process itself when needed.
+    """
+
+    SAMPLE_SIZE = 256
+
+    # Relative cost of a sweep line event, and of painting a line, allocating and counting
+    # a cell and painting a cell of a vertical line for `Bitmap`, compared to a scanned
+    # horizontal line, measured with `python -m app.benchmark`
+    SWEEP_EVENT_COST = 1.2
+    BITMAP_LINE_COST = 3
+    BITMAP_CELL_COST = 0.012
+    BITMAP_PAINT_COST = 0.08
+
+    def __init__(self, x_ranges, y_ranges):
+        # The ranges are grouped once, so the estimates and the selected counter share them
+        super().__init__(grouped(x_ranges), grouped(y_ranges))
+        self.selected = None
+
+    def estimate_binary_search(self):
+        """
+        Estimates the cost of `BinarySearch` as the number of lines plus the number of
+        horizontal lines within the y-range of every vertical line.
+
+        :return: Float of the estimated cost
+        """
+        y_positions, offsets = self.x_ranges.positions, self.x_ranges.offsets
+        y_ranges = list(self.y_ranges)
+        step = max(len(y_ranges) // self.SAMPLE_SIZE, 1)
+        sample = y_ranges[::step]
+        scanned = sum(
+            offsets[bisect_right(y_positions, end_y)] - offsets[bisect_left(y_positions, start_y)]
+            for _, start_y, end_y in sample
+        )
+        return len(self.x_ranges) + len(y_ranges) + scanned * len(y_ranges) / max(len(sample), 1)
+
+    def estimate_sweep_line(self):
+        """
+        Estimates the cost of `SweepLine` from the number of events and the depth of the tree.
+
+        :return: Float of the estimated cost
+        """
+        events = len(self.x_ranges) + 2 * len(self.y_ranges)
+        return self.SWEEP_EVENT_COST * events * math.log2(events + 1)
+
+    def estimate_bitmap(self):
+        """
+        Estimates the cost of `Bitmap` from the number of lines, the area of the bounding
+        box and the number of cells on vertical lines.
+
+        :return: Float of the estimated cost, infinite if the bounding box is too large
+        """
+        bitmap = Bitmap(self.x_ranges, self.y_ranges)
+        box = bitmap.bounding_box()
+        if box is None or box[2] * box[3] > bitmap.max_area:
+            return math.inf
+        vertical_cells = sum(end - start + 1 for _, start, end in self.y_ranges)
+        return (
+            self.BITMAP_LINE_COST * (len(self.x_ranges) + len(self.y_ranges))
+            + self.BITMAP_CELL_COST * box[2] * box[3]
+            + self.BITMAP_PAINT_COST * vertical_cells
+        )
+
+    def select(self):
+        """
+        Select the counter with the lowest estimated cost.
+
+        :return: `CoordinateCounter` class to count with
+        """
+        costs = {
+            BinarySearch: self.estimate_binary_search(),
+            SweepLine: self.estimate_sweep_line(),
+            Bitmap: self.estimate_bitmap(),
+        }
+        selected = min(costs, key=costs.get)
+        if selected is not SweepLine:
+            return selected
+        if (
+            not in_worker_process() and len(self.x_ranges) + len(self.y_ranges) >= Config.PARALLEL_THRESHOLD
+            and default_workers() > 1
+        ):
+            return ParallelSweepLine
+        return SweepLine
+
+    def unique_coordinates(self):
+        """
+        Main method to be implemented for counting the unique coordinates, should return
+        the number of unique coordinates.
+
+        :return: Integer representing the number of unique coordinates
+        """
+        self.selected = self.select()
+        self.total = self.delegate(self.selected).unique_coordinates()
+        return self.total
+
+
+# Counters by class name, for selecting one by name, for example in a request
+ALGORITHMS = {
+    counter.__name__: counter
+    for counter in (
+        AutoSelect, BinarySearch, SweepLine, ParallelSweepLine, Bitmap, EarlyIntersectionFiltering, SimpleIntersection
+    )
+}
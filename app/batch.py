@@ -0,0 +1,104 @@
+from app.cache import path_hash, results
+from app.admission import DeadlineExceeded
+from app.encoding import MAX_COORDINATE, MIN_COORDINATE, valid_command
+from app.logic import calculate_path
+from app.workers import default_workers, get_process_pool
+
+
+def parse_path(path):
+    """
+    Validate a path of a batch, so invalid paths fail on their own instead of failing the
+    calculation of the whole batch in the worker processes.
+
+    :param dict path: Dictionary with the 'start' (x, y) and the 'commands'
+
+    :return: Tuple of (Tuple of the starting (x, y) coordinate, List of the commands)
+    """
+    try:
+        start_point = parse_start(path["start"])
+        commands = parse_commands(path["commands"])
+    except (KeyError, TypeError) as e:
+        raise ValueError("invalid path") from e
+    return start_point, commands
+
+
+def parse_start(start):
+    """
+    Validate the starting point of a path, which has to fit in the signed 32-bit range of
+    the binary payload format.
+
+    :param dict start: Dictionary with the 'x' and 'y' coordinate
+
+    :return: Tuple of the starting (x, y) coordinate
+    """
+    try:
+        start_point = (int(start["x"]), int(start["y"]))
+    except (KeyError, TypeError, OverflowError) as e:
+        raise ValueError("invalid starting point") from e
+    if not all(MIN_COORDINATE <= coordinate <= MAX_COORDINATE for coordinate in start_point):
+        raise ValueError("invalid starting point")
+    return start_point
+
+
+def parse_commands(commands):
+    """
+    Validate the commands of a path, like the commands appended to a walk session.
+
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+
+    :return: The list of commands
+    """
+    if not isinstance(commands, list) or not all(valid_command(command) for command in commands):
+        raise ValueError("invalid commands")
+    return commands
+
+
+def evaluate_paths(paths, algorithm, parallel_threshold=16, deadline=None):
+    """
+    Calculate the unique coordinates of many paths. Paths in the in-process result cache
+    are not calculated again, the others are calculated in the shared process pool when
+    there are at least `parallel_threshold` of them, or in the current process otherwise.
+
+    :param list paths: List of tuples (start_point, commands) from `parse_path`
+    :param CoordinateCounter algorithm: Algorithm to be used
+    :param int parallel_threshold: Minimum number of paths to calculate in parallel
+    :param Deadline deadline: Optional deadline, after which `DeadlineExceeded` is raised
+
+    :return: List of tuples (result, duration, stats, path hash) in the order of `paths`
+    """
+    keys = [path_hash(commands) for _, commands in paths]
+    evaluated = [None] * len(paths)
+    pending = []
+    for index, key in enumerate(keys):
+        result = results.get(key)
+        if result is None:
+            pending.append(index)
+        else:
+            evaluated[index] = (result, 0.0, {}, key)
+
+    # Paths are sent to the workers in chunks, so small paths do not cost a round-trip each
+    arguments = ([paths[index][0] for index in pending], [paths[index][1] for index in pending])
+    if len(pending) >= parallel_threshold:
+
+        # Fast paths could be done before their results are waited for with the timeout
+        if deadline is not None:
+            deadline.check()
+        workers = default_workers()
+        chunk_size = max(len(pending) // (workers * 4), 1)
+        calculated = get_process_pool(workers).map(
+            calculate_path, *arguments, [algorithm] * len(pending), chunksize=chunk_size,
+            timeout=deadline.remaining() if deadline is not None else None,
+        )
+    else:
+        calculated = (
+            calculate_path(start_point, commands, algorithm, deadline=deadline) for start_point, commands in zip(*arguments)
+        )
+
+    # The chunks in the workers cannot be interrupted, but the request stops waiting for them
+    try:
+        for index, (result, duration, stats) in zip(pending, calculated):
+            results.put(keys[index], result)
+            evaluated[index] = (result, duration, stats, keys[index])
+    except TimeoutError as e:
+        raise DeadlineExceeded(f"calculation exceeded its budget of {deadline.budget}s") from e
+    return evaluated
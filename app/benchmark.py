@@ -0,0 +1,247 @@
+"""
+Reproducible benchmarks of all `CoordinateCounter` implementations, run with for example:
+
+    python -m app.benchmark --sizes 1000 10000 --output results.json --baseline baseline.json
+"""
+import argparse
+import json
+import platform
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timezone
+from inspect import isabstract
+from time import perf_counter
+
+from app import logic
+from app.algorithms import CoordinateCounter
+
+
+def spiral(size):
+    """Spiral outwards from the origin, so no line crosses another one."""
+    directions = ["east", "north", "west", "south"]
+    return (0, 0), [
+        {"direction": directions[index % 4], "steps": index // 2 + 1} for index in range(size)
+    ]
+
+
+def back_and_forth(size):
+    """Walk east and west over the same line, so all lines overlap."""
+    return (0, 0), [
+        {"direction": "east" if index % 2 == 0 else "west", "steps": 99999} for index in range(size)
+    ]
+
+
+def comb(size):
+    """Zig-zag over long horizontal lines, then cross all of them with vertical lines."""
+    rows = size // 4
+    commands = []
+    for index in range(rows):
+        commands.append({"direction": "north", "steps": 2})
+        commands.append({"direction": "east" if index % 2 == 0 else "west", "steps": 99999})
+
+    # Walk back over the horizontal lines, crossing all of them on every vertical line
+    inwards = "east" if rows % 2 == 0 else "west"
+    for index in range(size - len(commands)):
+        if index % 2:
+            commands.append({"direction": inwards, "steps": 3})
+        else:
+            commands.append({"direction": "south" if index % 4 == 0 else "north", "steps": 2 * rows})
+    return (0, 0), commands
+
+
+def random_walk(size, seed=42):
+    """Random directions and steps, with a fixed seed."""
+    rng = random.Random(seed)
+    directions = list(logic.DIRECTIONS)
+    return (0, 0), [
+        {"direction": rng.choice(directions), "steps": rng.randint(1, 1000)} for _ in range(size)
+    ]
+
+
+def maximum_input(size):
+    """Squares with the maximum number of steps, as in the maximum input unit test."""
+    return (-100000, -100000), [
+        {"direction": "east", "steps": 99999},
+        {"direction": "north", "steps": 99999},
+        {"direction": "west", "steps": 99998},
+        {"direction": "south", "steps": 99998},
+    ] * (size // 4)
+
+
+WORKLOADS = {
+    "spiral": spiral,
+    "back_and_forth": back_and_forth,
+    "comb": comb,
+    "random_walk": random_walk,
+    "maximum_input": maximum_input,
+}
+
+
+def counters():
+    """
+    All concrete `CoordinateCounter` implementations, including the ones added later.
+
+    :return: Dictionary of class name to class
+    """
+    found = {}
+    pending = list(CoordinateCounter.__subclasses__())
+    while pending:
+        counter = pending.pop(0)
+        pending.extend(counter.__subclasses__())
+        if not isabstract(counter):
+            found[counter.__name__] = counter
+    return found
+
+
+def _phases(start_point, commands, algorithm):
+    """
+    Split `calculate_unique_coordinates` into separately callable phases, which share
+    their intermediate results through a state dictionary.
+
+    :return: Tuple of (Dictionary of the state, Dictionary of phase name to callable)
+    """
+    state = {}
+
+    def build():
+        builder = logic.RangeBuilder(start_point)
+        builder.add_moves((logic.DIRECTIONS[command["direction"]], command["steps"]) for command in commands)
+        state["x_ranges"], state["y_ranges"] = builder.ranges()
+
+    def merge():
+        state["x_ranges"] = state["x_ranges"].merged()
+        state["y_ranges"] = state["y_ranges"].merged()
+
+    def count():
+        state["result"] = algorithm(state["x_ranges"], state["y_ranges"]).unique_coordinates()
+
+    return state, {"build": build, "merge": merge, "count": count}
+
+
+def measure(start_point, commands, algorithm, repeat=3, memory=True):
+    """
+    Measure the time of every phase as the best of `repeat` runs, and the peak memory of
+    every phase in a separate run, since tracing memory slows down the code.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+    :param CoordinateCounter algorithm: Algorithm to be measured
+    :param int repeat: Number of timed runs
+    :param bool memory: Whether to measure the peak memory
+
+    :return: Dictionary with the result and the measurements per phase
+    """
+    phases = {}
+    for _ in range(repeat):
+        state, steps = _phases(start_point, commands, algorithm)
+        for name, step in steps.items():
+            start_time = perf_counter()
+            step()
+            duration = perf_counter() - start_time
+            phases.setdefault(name, {"time": duration})
+            phases[name]["time"] = min(phases[name]["time"], duration)
+
+    if memory:
+        _, steps = _phases(start_point, commands, algorithm)
+        for name, step in steps.items():
+            tracemalloc.start()
+            step()
+            phases[name]["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    return {
+        "result": state["result"],
+        "time": sum(phase["time"] for phase in phases.values()),
+        "phases": phases,
+    }
+
+
+def run(workloads, sizes, algorithms, repeat=3, memory=True):
+    """
+    Run the benchmark for every combination of workload, size and algorithm.
+
+    :param list workloads: List of workload names from `WORKLOADS`
+    :param list sizes: List of numbers of commands
+    :param list algorithms: List of algorithm names from `counters()`
+    :param int repeat: Number of timed runs
+    :param bool memory: Whether to measure the peak memory
+
+    :return: Dictionary with the environment and the list of results
+    """
+    available = counters()
+    results = []
+    for workload in workloads:
+        for size in sizes:
+            start_point, commands = WORKLOADS[workload](size)
+            for name in algorithms:
+                measurement = measure(start_point, commands, available[name], repeat, memory)
+                results.append({"workload": workload, "size": size, "algorithm": name, **measurement})
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": results,
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Compare a report with a stored baseline report.
+
+    :param dict report: Report from `run`
+    :param dict baseline: Report from an earlier `run`
+    :param float tolerance: Allowed relative slowdown before flagging a regression
+
+    :return: List of strings describing the regressions
+    """
+    expected = {
+        (result["workload"], result["size"], result["algorithm"]): result
+        for result in baseline["results"]
+    }
+    regressions = []
+    for result in report["results"]:
+        key = (result["workload"], result["size"], result["algorithm"])
+        if key not in expected:
+            continue
+        if result["result"] != expected[key]["result"]:
+            regressions.append(f"{key}: result {result['result']} != {expected[key]['result']}")
+        if result["time"] > expected[key]["time"] * (1 + tolerance):
+            regressions.append(f"{key}: {result['time']:.4f}s > {expected[key]['time']:.4f}s")
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workloads", nargs="+", choices=list(WORKLOADS), default=list(WORKLOADS))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[1000, 10000])
+    parser.add_argument("--algorithms", nargs="+", choices=list(counters()), default=list(counters()))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip measuring the peak memory")
+    parser.add_argument("--output", help="Path to write the JSON report to")
+    parser.add_argument("--baseline", help="Path of a JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(arguments)
+
+    report = run(args.workloads, args.sizes, args.algorithms, args.repeat, not args.no_memory)
+    for result in report["results"]:
+        print(f"{result['workload']:>15} {result['size']:>8} {result['algorithm']:>28} {result['time']:.4f}s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+from collections import OrderedDict
+from hashlib import sha256
+from threading import Lock
+from time import perf_counter
+
+from app.config import Config
+from app.database import db
+from app.encoding import encode_commands
+from app.models import Execution
+
+
+class ResultCache:
+    """Thread-safe, in-process LRU cache of unique coordinate counts by path hash."""
+
+    def __init__(self, size=None):
+        """
+        Initialize an empty cache.
+
+        :param int size: Maximum number of results to keep, 0 disables the cache (default is
+                         `cache.size` of the config, read on first use)
+        """
+        self.size = size
+        self.results = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.results:
+                return None
+            self.results.move_to_end(key)
+            return self.results[key]
+
+    def put(self, key, result):
+        size = Config.CACHE_SIZE if self.size is None else self.size
+        if not size:
+            return
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > size:
+                self.results.popitem(last=False)
+
+
+results = ResultCache()
+
+
+def path_hash(commands=None, records=None):
+    """
+    Canonical hash of a path, which does not include the starting point, since the number
+    of unique coordinates is the same for every starting point. The hash is taken over
+    the binary records of `app.encoding`, so JSON and binary payloads share cache entries.
+
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+    :param bytes records: Already encoded records, as an alternative to `commands`
+
+    :return: String of the hexadecimal hash
+    """
+    if records is None:
+        records = encode_commands(commands)
+    return sha256(records).hexdigest()
+
+
+def cached_unique_coordinates(key, calculate):
+    """
+    Look up the number of unique coordinates for a path hash in the in-process tier and
+    then the shared tier, or calculate and store it otherwise.
+
+    :param str key: Hash of the path from `path_hash`
+    :param callable calculate: Function returning a tuple of (result, duration)
+
+    :return: Tuple of (Integer of unique coordinates, Float of the duration)
+    """
+    start_time = perf_counter()
+    result = results.get(key)
+
+    # Executions of other workers are found through the hash column
+    if result is None and Config.CACHE_SHARED:
+        result = db.session.query(Execution.result).filter_by(path_hash=key).limit(1).scalar()
+
+    if result is not None:
+        results.put(key, result)
+        return result, perf_counter() - start_time
+
+    result, duration = calculate()
+    results.put(key, result)
+    return result, duration
@@ -1,26 +1,128 @@
 import os
+from functools import lru_cache
+
 import yaml
 
 
+@lru_cache(maxsize=None)
 def load_config_from_env(environment):
     current_dir = os.path.dirname(os.path.abspath(__file__))
     config_path = os.path.join(current_dir, "configs", f"{environment}.yaml")
     with open(config_path, "r") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
 
 
-class Config:
+class setting:
+    """
+    Class attribute of `Config` that is read from the config of the environment on first
+    access, after which the value replaces the attribute. Importing the config therefore
+    does not read any file, and the file is parsed only once.
+    """
+
+    def __init__(self, read):
+        """
+        :param callable read: Function of the parsed config returning the value
+        """
+        self.read = read
+
+    def __set_name__(self, owner, name):
+        self.owner = owner
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        # Default to 'dev' if ENV is not set
+        value = self.read(load_config_from_env(os.getenv("ENV", "dev")))
+        setattr(self.owner, self.name, value)
+        return value
+
 
-    # Default to 'dev' if ENV is not set
-    env = os.getenv("ENV", "dev")
-    config = load_config_from_env(env)
+class Config:
 
     # Access configurations
-    DATABASE_DB = config["database"]["db"]
-    DATABASE_HOST = config["database"]["host"]
-    DATABASE_USER = config["database"]["user"]
-    DATABASE_PASSWORD = config["database"]["password"]
+    DATABASE_DB = setting(lambda config: config["database"]["db"])
+    DATABASE_HOST = setting(lambda config: config["database"]["host"])
+    DATABASE_USER = setting(lambda config: config["database"]["user"])
+    DATABASE_PASSWORD = setting(lambda config: config["database"]["password"])
+
+    # Connection pool of the database engine
+    SQLALCHEMY_ENGINE_OPTIONS = setting(lambda config: {
+        "pool_size": config["database"].get("pool_size", 5),
+        "max_overflow": config["database"].get("max_overflow", 10),
+        "pool_pre_ping": config["database"].get("pool_pre_ping", False),
+        "pool_recycle": config["database"].get("pool_recycle", -1),
+    })
+
+    # Production WSGI server, 0 workers means one worker per core
+    SERVER_WORKERS = setting(lambda config: config.get("server", {}).get("workers", 0))
+    SERVER_THREADS = setting(lambda config: config.get("server", {}).get("threads", 1))
+    SERVER_TIMEOUT = setting(lambda config: config.get("server", {}).get("timeout", 60))
+
+    # Answer the health check before loading the application, see `app.startup`
+    SERVER_FAST_START = setting(lambda config: config.get("server", {}).get("fast_start", False))
+
+    # Admission control of the enter-path endpoint, 0 disables a limit: the size of the body
+    # in bytes and the number of commands, concurrent calculations per process (waiting for
+    # at most `queue_timeout` seconds for a slot) and the compute budget in seconds
+    ADMISSION_MAX_PAYLOAD = setting(lambda config: config.get("admission", {}).get("max_payload", 0))
+    ADMISSION_MAX_COMMANDS = setting(lambda config: config.get("admission", {}).get("max_commands", 0))
+    ADMISSION_MAX_CONCURRENT = setting(lambda config: config.get("admission", {}).get("max_concurrent", 0))
+    ADMISSION_QUEUE_TIMEOUT = setting(lambda config: config.get("admission", {}).get("queue_timeout", 0))
+    ADMISSION_RETRY_AFTER = setting(lambda config: config.get("admission", {}).get("retry_after", 1))
+    ADMISSION_COMPUTE_BUDGET = setting(lambda config: config.get("admission", {}).get("compute_budget", 0))
+
+    # Result cache, with an in-process LRU tier and a shared tier in the database
+    CACHE_SIZE = setting(lambda config: config.get("cache", {}).get("size", 1024))
+    CACHE_SHARED = setting(lambda config: config.get("cache", {}).get("shared", False))
+
+    # Counter used when a request does not pass `?algorithm=`, by class name
+    ALGORITHM = setting(lambda config: config.get("algorithm", {}).get("default", "AutoSelect"))
+
+    # Largest bounding box, in cells, that `Bitmap` paints instead of counting intervals
+    BITMAP_MAX_AREA = setting(lambda config: config.get("algorithm", {}).get("bitmap_max_area", 1 << 22))
+
+    # Processes of the pool of every worker process, 0 divides the cores over the gunicorn
+    # workers, and the minimum number of lines that `ParallelSweepLine` counts in parallel
+    PARALLEL_WORKERS = setting(lambda config: config.get("algorithm", {}).get("parallel_workers", 0))
+    PARALLEL_THRESHOLD = setting(lambda config: config.get("algorithm", {}).get("parallel_threshold", 20000))
+
+    # Batch endpoint, paths are calculated in the process pool from `parallel_threshold` paths
+    BATCH_MAX_PATHS = setting(lambda config: config.get("batch", {}).get("max_paths", 1000))
+    BATCH_PARALLEL_THRESHOLD = setting(lambda config: config.get("batch", {}).get("parallel_threshold", 16))
+
+    # Paths from `threshold` commands are calculated in a job by one of `workers` threads,
+    # 0 disables the threshold. Finished jobs are kept for `ttl` seconds, and paths beyond
+    # `max_queued` unfinished jobs per process are rejected
+    JOBS_THRESHOLD = setting(lambda config: config.get("jobs", {}).get("threshold", 0))
+    JOBS_WORKERS = setting(lambda config: config.get("jobs", {}).get("workers", 2))
+    JOBS_TTL = setting(lambda config: config.get("jobs", {}).get("ttl", 3600))
+    JOBS_MAX_QUEUED = setting(lambda config: config.get("jobs", {}).get("max_queued", 100))
+
+    # Walk sessions expire after `ttl` seconds without use and walk at most `max_commands`
+    # commands in total, 0 disables the limit
+    SESSIONS_TTL = setting(lambda config: config.get("sessions", {}).get("ttl", 3600))
+    SESSIONS_MAX_COMMANDS = setting(lambda config: config.get("sessions", {}).get("max_commands", 10000))
+
+    # Store the merged lines of calculated paths for the spatial queries
+    SPATIAL_SEGMENTS = setting(lambda config: config.get("spatial", {}).get("store_segments", False))
+
+    # Store the duration per phase with every execution
+    METRICS_PERSIST_PHASES = setting(lambda config: config.get("metrics", {}).get("persist_phases", False))
+
+    # Directory in which the worker processes share their metrics, none keeps them per process
+    METRICS_MULTIPROCESS_DIR = setting(lambda config: config.get("metrics", {}).get("multiprocess_dir"))
+
+    # Executions older than `days` days are compacted into a rollup per `rollup_interval`
+    # seconds by `python -m app.retention`, 0 keeps all executions
+    RETENTION_DAYS = setting(lambda config: config.get("retention", {}).get("days", 0))
+    RETENTION_ROLLUP_INTERVAL = setting(lambda config: config.get("retention", {}).get("rollup_interval", 3600))
+
+    # Write-behind persistence of executions by a background writer
+    WRITE_BEHIND = setting(lambda config: config.get("persistence", {}).get("write_behind", False))
+    WRITE_BEHIND_BATCH_SIZE = setting(lambda config: config.get("persistence", {}).get("batch_size", 500))
+    WRITE_BEHIND_FLUSH_INTERVAL = setting(lambda config: config.get("persistence", {}).get("flush_interval", 0.5))
+    WRITE_BEHIND_QUEUE_SIZE = setting(lambda config: config.get("persistence", {}).get("queue_size", 10000))
 
+    # `DATABASE_URL` replaces the database of the config, for example SQLite for `app.loadtest`
     @property
     def SQLALCHEMY_DATABASE_URI(self):
-        return f"postgresql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}/{self.DATABASE_DB}"
+        return os.getenv("DATABASE_URL") or f"postgresql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}/{self.DATABASE_DB}"
@@ -0,0 +1,267 @@
+from bisect import bisect_left, bisect_right, insort
+
+# Values are offset into [0, 2**64), the leaves of the segment tree of `StabbingIndex`
+VALUE_OFFSET = 1 << 63
+LEAVES = 1 << 64
+
+
+class StabbingIndex:
+    """
+    Segment tree over the values along an axis, of which every node keeps the sorted axis
+    positions of the intervals that cover the whole range of the node. An interval is kept
+    in the O(log n) nodes that make up its range, and the intervals covering a value are in
+    the nodes on the path from its leaf to the root, so counting them per range of positions
+    does not depend on the number of positions in the range. Only nodes with intervals are
+    stored, in a dictionary by their index in the tree.
+    """
+
+    def __init__(self):
+        self.nodes = {}
+
+        # Number of nodes per height above the leaves, so counting skips the empty heights
+        self.heights = {}
+
+    @staticmethod
+    def _cover(start, end):
+        """
+        Nodes that together cover exactly the values `start` to `end`, as tuples of their
+        height above the leaves and their index in the tree.
+        """
+        low, high = start + VALUE_OFFSET + LEAVES, end + VALUE_OFFSET + LEAVES + 1
+        height = 0
+        while low < high:
+            if low & 1:
+                yield height, low
+                low += 1
+            if high & 1:
+                high -= 1
+                yield height, high
+            low >>= 1
+            high >>= 1
+            height += 1
+
+    def add(self, position, start, end):
+        """Add the interval `start` to `end` on the axis at `position`."""
+        nodes, heights = self.nodes, self.heights
+        for height, node in self._cover(start, end):
+            positions = nodes.get(node)
+            if positions is None:
+                nodes[node] = [position]
+                heights[height] = heights.get(height, 0) + 1
+            else:
+                insort(positions, position)
+
+    def remove(self, position, start, end):
+        """Remove an interval that was added with the same arguments."""
+        nodes, heights = self.nodes, self.heights
+        for height, node in self._cover(start, end):
+            positions = nodes[node]
+            del positions[bisect_left(positions, position)]
+            if not positions:
+                del nodes[node]
+                heights[height] -= 1
+                if not heights[height]:
+                    del heights[height]
+
+    def count(self, low, high, value):
+        """
+        Count the intervals on the positions `low` to `high` that cover `value`.
+
+        :param int low: The lowest axis position
+        :param int high: The highest axis position
+        :param int value: The value along the axis
+
+        :return: Integer representing the number of covering intervals
+        """
+        nodes = self.nodes
+        leaf = value + VALUE_OFFSET + LEAVES
+        count = 0
+        for height in self.heights:
+            positions = nodes.get(leaf >> height)
+            if positions:
+                count += bisect_right(positions, high) - bisect_left(positions, low)
+        return count
+
+
+class AxisIntervals:
+    """
+    Disjoint, sorted intervals per axis position, for either the horizontal lines (by
+    y-coordinate) or the vertical lines (by x-coordinate). Adding an interval merges it
+    in place, so the intervals are always equal to the output of `_merge_ranges`.
+    """
+
+    def __init__(self):
+        self.positions = []
+        self.intervals = {}
+        self.index = StabbingIndex()
+
+    def __iter__(self):
+        """Iterate over the intervals as (axis, start, end) tuples, sorted by axis and start."""
+        for position in self.positions:
+            starts, ends = self.intervals[position]
+            for start, end in zip(starts, ends):
+                yield position, start, end
+
+    def __len__(self):
+        return sum(len(starts) for starts, _ in self.intervals.values())
+
+    def add(self, position, start, end):
+        """
+        Add an interval and merge it with the overlapping intervals on the same axis.
+
+        :param int position: The axis position of the interval
+        :param int start: The start of the interval
+        :param int end: The end of the interval
+
+        :return: List of (start, end) tuples of the parts that were not covered yet
+        """
+        if position not in self.intervals:
+            insort(self.positions, position)
+            self.intervals[position] = ([start], [end])
+            self.index.add(position, start, end)
+            return [(start, end)]
+
+        # Intervals [first, last) overlap with the new interval
+        starts, ends = self.intervals[position]
+        first = bisect_left(ends, start)
+        last = bisect_right(starts, end)
+
+        # Collect the gaps between the overlapping intervals
+        gaps = []
+        cursor = start
+        for index in range(first, last):
+            if starts[index] > cursor:
+                gaps.append((cursor, starts[index] - 1))
+            cursor = max(cursor, ends[index] + 1)
+        if cursor <= end:
+            gaps.append((cursor, end))
+
+        # Replace the overlapping intervals by a single merged interval
+        if first < last:
+            start = min(start, starts[first])
+            end = max(end, ends[last - 1])
+        for index in range(first, last):
+            self.index.remove(position, starts[index], ends[index])
+        starts[first:last] = [start]
+        ends[first:last] = [end]
+        self.index.add(position, start, end)
+        return gaps
+
+    def covers(self, position, value):
+        """
+        Whether `value` is within an interval on the axis at `position`, in O(log n).
+
+        :param int position: The axis position
+        :param int value: The value along the axis
+
+        :return: Boolean whether the value is covered
+        """
+        if position not in self.intervals:
+            return False
+        starts, ends = self.intervals[position]
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= ends[index]
+
+    def count_covering(self, low, high, value):
+        """
+        Counts the axis positions between `low` and `high` of which an interval covers
+        `value`, in O(log n) with the `StabbingIndex`. The intervals on a position do not
+        overlap, so at most one of them covers the value.
+
+        :param int low: The lowest axis position
+        :param int high: The highest axis position
+        :param int value: The value along the axis
+
+        :return: Integer representing the number of covering axis positions
+        """
+        return self.index.count(low, high, value)
+
+
+class Coverage:
+    """
+    Incrementally maintained set of visited coordinates, stored as merged horizontal and
+    vertical intervals together with the number of unique coordinates. Adding a line
+    only counts the parts that were not covered yet, so the total never has to be
+    recalculated from scratch.
+    """
+
+    def __init__(self):
+        self.horizontal = AxisIntervals()
+        self.vertical = AxisIntervals()
+        self.total = 0
+
+    @classmethod
+    def restore(cls, horizontal, vertical, total):
+        """
+        Coverage of intervals that were stored earlier, for example of a walk session.
+
+        :param iterable horizontal: Iterable of (y_pos, start_x, end_x) of the merged
+                                    horizontal lines, like iterating `AxisIntervals`
+        :param iterable vertical: Iterable of (x_pos, start_y, end_y) of the merged vertical lines
+        :param int total: Number of unique coordinates of the intervals
+
+        :return: The restored `Coverage`
+        """
+        coverage = cls()
+        for axis, start, end in horizontal:
+            coverage.horizontal.add(axis, start, end)
+        for axis, start, end in vertical:
+            coverage.vertical.add(axis, start, end)
+        coverage.total = total
+        return coverage
+
+    def add_horizontal(self, y_pos, start_x, end_x):
+        """
+        Add a horizontal line and update the number of unique coordinates.
+
+        :param int y_pos: The y-coordinate of the line
+        :param int start_x: The lowest x-coordinate of the line
+        :param int end_x: The highest x-coordinate of the line
+        """
+        for gap_start, gap_end in self.horizontal.add(y_pos, start_x, end_x):
+            crossings = self.vertical.count_covering(gap_start, gap_end, y_pos)
+            self.total += gap_end - gap_start + 1 - crossings
+
+    def add_vertical(self, x_pos, start_y, end_y):
+        """
+        Add a vertical line and update the number of unique coordinates.
+
+        :param int x_pos: The x-coordinate of the line
+        :param int start_y: The lowest y-coordinate of the line
+        :param int end_y: The highest y-coordinate of the line
+        """
+        for gap_start, gap_end in self.vertical.add(x_pos, start_y, end_y):
+            crossings = self.horizontal.count_covering(gap_start, gap_end, x_pos)
+            self.total += gap_end - gap_start + 1 - crossings
+
+    def add_move(self, coordinate, delta, steps):
+        """
+        Add the line of a single move, similar to `_add_move_to_ranges`.
+
+        :param tuple coordinate: Tuple of the starting (x, y) coordinate
+        :param tuple delta: Tuple of the (delta_x, delta_y) of a single step
+        :param int steps: Number of steps to take
+
+        :return: Tuple of the ending coordinate
+        """
+        delta_x, delta_y = delta
+        new_x = coordinate[0] + delta_x * steps
+        new_y = coordinate[1] + delta_y * steps
+
+        if not delta_y:
+            self.add_horizontal(coordinate[1], *sorted((coordinate[0], new_x)))
+        elif not delta_x:
+            self.add_vertical(coordinate[0], *sorted((coordinate[1], new_y)))
+
+        return new_x, new_y
+
+    def contains(self, x_pos, y_pos):
+        """
+        Whether the coordinate has been visited, in O(log n).
+
+        :param int x_pos: The x-coordinate
+        :param int y_pos: The y-coordinate
+
+        :return: Boolean whether the coordinate has been visited
+        """
+        return self.horizontal.covers(y_pos, x_pos) or self.vertical.covers(x_pos, y_pos)
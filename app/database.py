@@ -1,7 +1,15 @@
+import logging
+from collections import defaultdict
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from time import monotonic
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import insert
 from sqlalchemy.exc import SQLAlchemyError
 
 db = SQLAlchemy()
+logger = logging.getLogger(__name__)
 
 
 def add_to_db(db_entry):
@@ -13,10 +21,12 @@ def add_to_db(db_entry):
     :return: Dictionary representation of the entry if successful, otherwise `None`.
     """
     try:
-        # Add the entry to the session and commit the transaction
+        # Serialise the entry before the commit expires it, which would select it again
         db.session.add(db_entry)
+        db.session.flush()
+        result = db_entry.to_dict()
         db.session.commit()
-        return db_entry.to_dict()
+        return result
 
     except SQLAlchemyError as e:
         # Roll back the session on error to maintain database consistency
@@ -26,3 +36,133 @@ def add_to_db(db_entry):
     finally:
         # Close the session to release resources
         db.session.remove()
+
+
+def add_all_to_db(db_entries):
+    """
+    Safely add many entries to the database in a single transaction.
+
+    :param list db_entries: List of SQLAlchemy model instances to add to the database.
+                            Must implement a `to_dict()` method for serialization.
+    :return: List of dictionary representations of the entries if successful, otherwise `None`.
+    """
+    try:
+        db.session.add_all(db_entries)
+        db.session.flush()
+        results = [db_entry.to_dict() for db_entry in db_entries]
+        db.session.commit()
+        return results
+
+    except SQLAlchemyError:
+        db.session.rollback()
+        return None
+
+    finally:
+        db.session.remove()
+
+
+class ExecutionWriter:
+    """
+    Write-behind writer, which queues entries and inserts them in bulk from a background
+    thread, so the database round-trip is not part of the request.
+    """
+
+    def __init__(self, app, batch_size=500, flush_interval=0.5, queue_size=10000):
+        """
+        Initialize the writer, the background thread is started on the first entry.
+
+        :param app: Flask application, used for the application context of the thread
+        :param int batch_size: Maximum number of entries per insert
+        :param float flush_interval: Maximum number of seconds an entry waits in the queue
+        :param int queue_size: Maximum number of queued entries
+        """
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = None
+        self.lock = Lock()
+
+    def submit(self, db_entry):
+        """
+        Queue an entry to be inserted. The generated columns, like `id` and `timestamp`,
+        are not available on the entry afterwards.
+
+        :param db_entry: SQLAlchemy model instance to add to the database
+
+        :return: Boolean whether the entry was queued, `False` if the queue is full
+        """
+        with self.lock:
+            if self.thread is None:
+                self.thread = Thread(target=self._run, name="execution-writer", daemon=True)
+                self.thread.start()
+
+        try:
+            self.queue.put_nowait(db_entry)
+            return True
+        except Full:
+            return False
+
+    def drain(self):
+        """Block until all queued entries have been written."""
+        self.queue.join()
+
+    def _run(self):
+        """Collect entries into batches and write them until the process exits."""
+        while True:
+            batch = [self.queue.get()]
+            deadline = monotonic() + self.flush_interval
+
+            # Fill the batch until it is full or the oldest entry has waited long enough
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get(timeout=max(deadline - monotonic(), 0)))
+                except Empty:
+                    break
+
+            try:
+                self._write(batch)
+            except Exception:
+                # Keep the thread alive, the batch is lost like a failed request
+                logger.exception("Writing a batch of %d entries failed", len(batch))
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write(self, batch):
+        """
+        Insert a batch of entries with one multi-row insert per model.
+
+        :param list batch: List of SQLAlchemy model instances
+        """
+        by_model = defaultdict(list)
+        for db_entry in batch:
+            by_model[type(db_entry)].append(_column_values(db_entry))
+
+        with self.app.app_context():
+            try:
+                for model, rows in by_model.items():
+                    db.session.execute(insert(model), rows)
+                db.session.commit()
+
+            except SQLAlchemyError:
+                # Roll back the session on error, the batch is lost like a failed request
+                db.session.rollback()
+
+            finally:
+                db.session.remove()
+
+
+def _column_values(db_entry):
+    """
+    Values of the columns of an entry, except for the columns generated by the database.
+
+    :param db_entry: SQLAlchemy model instance
+
+    :return: Dictionary of column name to value
+    """
+    return {
+        column.key: getattr(db_entry, column.key)
+        for column in db_entry.__table__.columns
+        if not column.primary_key and column.server_default is None
+    }
@@ -0,0 +1,92 @@
+import struct
+
+from app.logic import DIRECTIONS
+
+
+# Content type of the binary payload format of the enter-path endpoint, which consists
+# of a header with the starting (x, y) coordinate followed by one record per command
+CONTENT_TYPE = "application/x-tibber-path"
+HEADER = struct.Struct("<ii")
+RECORD = struct.Struct("<BI")
+
+# Largest number of steps of a command, the range of the unsigned 32-bit steps of a record,
+# so every valid path can be encoded and hashed, see `app.cache.path_hash`
+MAX_STEPS = 2 ** 32 - 1
+
+# Range of the starting coordinates, the signed 32-bit coordinates of the header
+MIN_COORDINATE = -2 ** 31
+MAX_COORDINATE = 2 ** 31 - 1
+
+# Direction codes are the index of the direction in `DIRECTIONS`
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+DELTAS = tuple(DIRECTIONS.values())
+
+
+def valid_command(command):
+    """
+    Whether a command can be encoded in a record: a known direction and an integer number
+    of steps from 0 to `MAX_STEPS`.
+
+    :param dict command: Dictionary containing the 'direction' and 'steps'
+
+    :return: Boolean whether the command is valid
+    """
+    try:
+        steps = command["steps"]
+        return command["direction"] in DIRECTION_CODES and isinstance(steps, int) and 0 <= steps <= MAX_STEPS
+    except (KeyError, TypeError):
+        return False
+
+
+def encode_commands(commands):
+    """
+    Encode the commands as packed (direction code, steps) records of 5 bytes each.
+
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+
+    :return: Bytes of the encoded commands
+    """
+    pack = RECORD.pack
+    return b"".join(pack(DIRECTION_CODES[command["direction"]], command["steps"]) for command in commands)
+
+
+def encode_path(start_point, commands):
+    """
+    Client-side helper to encode a path in the binary payload format.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+
+    :return: Bytes of the encoded path
+    """
+    return HEADER.pack(*start_point) + encode_commands(commands)
+
+
+def command_count(body):
+    """
+    Number of commands in a path in the binary payload format, without decoding it.
+
+    :param bytes body: Bytes of the encoded path
+
+    :return: Integer representing the number of commands
+    """
+    records, remainder = divmod(len(body) - HEADER.size, RECORD.size)
+    if records < 0 or remainder:
+        raise ValueError("Invalid length of the binary path")
+    return records
+
+
+def decode_path(body):
+    """
+    Decode a path in the binary payload format. The records are unpacked lazily from a
+    view on the body, so they can be fed straight into `calculate_unique_coordinates_from_moves`.
+
+    :param bytes body: Bytes of the encoded path
+
+    :return: Tuple of (Tuple of the starting (x, y) coordinate, Generator of moves)
+    """
+    command_count(body)
+    view = memoryview(body)
+    start_point = HEADER.unpack_from(view)
+    moves = ((DELTAS[code], steps) for code, steps in RECORD.iter_unpack(view[HEADER.size:]))
+    return start_point, moves
@@ -0,0 +1,116 @@
+from collections import OrderedDict
+from threading import Lock
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.algorithms import AutoSelect
+from app.database import db
+from app.models import FleetMember
+from app.segments import Segments
+from app.spatial import load_segments
+
+
+class FleetCoverage:
+    """
+    Union of the visited coordinates of the paths of a fleet of robots. The merged lines of
+    a path are a summary that is combined with `Segments.union`, so adding a path merges
+    only its own lines into the lines of the fleet, instead of processing the commands of
+    all paths again. Instances are not changed once created, `merge` returns a new one.
+    """
+
+    def __init__(self, x_ranges=None, y_ranges=None, members=frozenset(), algorithm=AutoSelect):
+        """
+        :param Segments x_ranges: Merged horizontal lines of the fleet, in absolute coordinates
+        :param Segments y_ranges: Merged vertical lines of the fleet, in absolute coordinates
+        :param frozenset members: Execution ids of the paths in the union
+        :param CoordinateCounter algorithm: Algorithm to count the union with
+        """
+        self.x_ranges = x_ranges if x_ranges is not None else Segments().merged()
+        self.y_ranges = y_ranges if y_ranges is not None else Segments().merged()
+        self.members = members
+        self.algorithm = algorithm
+        self.result = algorithm(self.x_ranges, self.y_ranges).unique_coordinates() if members else 0
+
+    def merge(self, summaries):
+        """
+        Union with the summaries of other paths, counted once for all of them.
+
+        :param dict summaries: Dictionary of execution id to tuple of merged `Segments`
+                               (x_ranges, y_ranges), see `load_segments`
+
+        :return: New `FleetCoverage`
+        """
+        x_ranges, y_ranges = self.x_ranges, self.y_ranges
+        for execution_id, (other_x_ranges, other_y_ranges) in summaries.items():
+            if execution_id not in self.members:
+                x_ranges, y_ranges = x_ranges.union(other_x_ranges), y_ranges.union(other_y_ranges)
+        return FleetCoverage(x_ranges, y_ranges, self.members.union(summaries), self.algorithm)
+
+
+class FleetStore:
+    """
+    Per-process cache of the coverage of the most recently used fleets. The members are
+    stored in the database, so every worker brings its cached coverage up to date by merging
+    only the summaries of the members it has not seen yet.
+    """
+
+    def __init__(self, size=64):
+        self.size = size
+        self.fleets = OrderedDict()
+        self.lock = Lock()
+
+    def coverage(self, fleet):
+        """
+        Current coverage of a fleet.
+
+        :param str fleet: Name of the fleet
+
+        :return: `FleetCoverage` of the stored members, with no members for an unknown fleet
+        """
+        members = FleetMember.query.filter_by(fleet=fleet).all()
+        with self.lock:
+            coverage = self.fleets.get(fleet) or FleetCoverage()
+
+        # Members are only added, so the cached union is a subset of the stored one
+        summaries = {}
+        for member in members:
+            if member.execution_id not in coverage.members:
+                summaries[member.execution_id] = load_segments(member.path_hash, (member.start_x, member.start_y))
+        if summaries:
+            coverage = coverage.merge(summaries)
+
+        with self.lock:
+            cached = self.fleets.get(fleet)
+            if cached is None or len(cached.members) < len(coverage.members):
+                self.fleets[fleet] = coverage
+            self.fleets.move_to_end(fleet)
+            while len(self.fleets) > self.size:
+                self.fleets.popitem(last=False)
+        return coverage
+
+
+def add_members(fleet, executions):
+    """
+    Add executions with stored segments to a fleet, executions in it already are skipped.
+
+    :param str fleet: Name of the fleet
+    :param list executions: List of `Execution` with stored segments
+    """
+    existing = {
+        row[0] for row in db.session.query(FleetMember.execution_id).filter(
+            FleetMember.fleet == fleet, FleetMember.execution_id.in_([execution.id for execution in executions]),
+        )
+    }
+    for execution in executions:
+        if execution.id not in existing:
+            existing.add(execution.id)
+            db.session.add(FleetMember(
+                fleet=fleet, execution_id=execution.id, path_hash=execution.path_hash,
+                start_x=execution.start_x, start_y=execution.start_y,
+            ))
+    try:
+        db.session.commit()
+
+    except SQLAlchemyError:
+        # Roll back the session on error, for example when another worker added them first
+        db.session.rollback()
@@ -0,0 +1,21 @@
+import os
+
+from app import metrics
+from app.config import Config
+
+
+# Pre-forking server for production, configured through the `server` section of the
+# configs. The app is loaded before forking, so the workers share its memory, unless
+# `server.fast_start` is enabled, in which case every worker loads it on its first request.
+bind = os.getenv("BIND", "0.0.0.0:5000")
+wsgi_app = "app.wsgi:app"
+preload_app = True
+workers = Config.SERVER_WORKERS or os.cpu_count()
+threads = Config.SERVER_THREADS
+timeout = Config.SERVER_TIMEOUT
+
+
+def on_starting(server):
+    """Remove the shared metrics of the workers of an earlier run, see `app.metrics.share`."""
+    if Config.METRICS_MULTIPROCESS_DIR:
+        metrics.clear(Config.METRICS_MULTIPROCESS_DIR)
@@ -0,0 +1,124 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_
+
+from app.database import db
+from app.models import Execution
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def encode_cursor(execution):
+    """
+    Opaque cursor pointing after an execution in the history.
+
+    :param Execution execution: Last execution of a page
+
+    :return: String of the cursor
+    """
+    return urlsafe_b64encode(f"{execution.timestamp.isoformat()},{execution.id}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor from `encode_cursor`.
+
+    :param str cursor: String of the cursor
+
+    :return: Tuple of (datetime of the timestamp, Integer of the id)
+    """
+    try:
+        timestamp, execution_id = urlsafe_b64decode(cursor.encode()).decode().split(",")
+        return datetime.fromisoformat(timestamp), int(execution_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def list_executions(limit=DEFAULT_LIMIT, cursor=None):
+    """
+    Page of the execution history, newest first. Pages are selected by the (timestamp, id)
+    of the last execution of the previous page instead of an offset, so every page is a
+    range scan on the `ix_executions_timestamp_id` index, however far back it is.
+
+    :param int limit: Maximum number of executions, at most `MAX_LIMIT`
+    :param str cursor: Cursor from the previous page, or `None` for the first page
+
+    :return: Tuple of (List of executions, String of the cursor of the next page or `None`)
+    """
+    limit = max(1, min(limit, MAX_LIMIT))
+    query = Execution.query
+    if cursor is not None:
+        timestamp, execution_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            Execution.timestamp < timestamp,
+            and_(Execution.timestamp == timestamp, Execution.id < execution_id),
+        ))
+
+    # One extra execution tells whether there is a next page
+    executions = query.order_by(Execution.timestamp.desc(), Execution.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(executions[limit - 1]) if len(executions) > limit else None
+    return executions[:limit], next_cursor
+
+
+def execution_statistics(since=None, until=None):
+    """
+    Aggregates of the executions in a time window, computed by the database.
+
+    :param datetime since: Start of the window (inclusive), or `None` for no start
+    :param datetime until: End of the window (exclusive), or `None` for no end
+
+    :return: Dictionary with the count, the sum of the commands and results, and the
+             average, minimum, maximum and percentiles of the duration
+    """
+    window = []
+    if since is not None:
+        window.append(Execution.timestamp >= since)
+    if until is not None:
+        window.append(Execution.timestamp < until)
+
+    count, commands, results, average, minimum, maximum = db.session.query(
+        func.count(Execution.id),
+        func.sum(Execution.commands),
+        func.sum(Execution.result),
+        func.avg(Execution.duration),
+        func.min(Execution.duration),
+        func.max(Execution.duration),
+    ).filter(*window).one()
+
+    return {
+        "count": count,
+        "commands": int(commands or 0),
+        "results": int(results or 0),
+        "duration": {
+            "avg": float(average) if average is not None else None,
+            "min": minimum,
+            "max": maximum,
+            **_duration_percentiles(window, count),
+        },
+    }
+
+
+def _duration_percentiles(window, count):
+    """
+    Percentiles of the duration in the window, with `percentile_cont` on PostgreSQL and by
+    fetching the single row at the rank of every percentile on other databases.
+    """
+    names = [f"p{round(percentile * 100)}" for percentile in PERCENTILES]
+    if not count:
+        return dict.fromkeys(names)
+
+    if db.engine.dialect.name == "postgresql":
+        values = db.session.query(*(
+            func.percentile_cont(percentile).within_group(Execution.duration)
+            for percentile in PERCENTILES
+        )).filter(*window).one()
+    else:
+        values = [
+            db.session.query(Execution.duration).filter(*window).order_by(Execution.duration)
+            .offset(round(percentile * (count - 1))).limit(1).scalar()
+            for percentile in PERCENTILES
+        ]
+    return dict(zip(names, values))
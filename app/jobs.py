@@ -0,0 +1,128 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from threading import Lock
+from uuid import uuid4
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.database import db
+from app.models import Execution, Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    """Raised by `JobStore.submit` when this process already has `max_queued` unfinished jobs."""
+
+
+def _now():
+    """Current UTC time without timezone, like the timestamps of `app.retention`."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class JobStore:
+    """
+    Store of jobs, which are run by a pool of `workers` threads of this process. The status
+    of the jobs is kept in the `jobs` table, so any worker process can return it, until `ttl`
+    seconds after they finished. At most `max_queued` jobs of this process are unfinished at
+    the same time, so the queue does not grow past what the admission limits allow.
+    """
+
+    def __init__(self, app, workers=2, ttl=3600, max_queued=100):
+        """
+        :param app: Flask application, used for the application context of the threads
+        :param int workers: Number of threads running the jobs
+        :param int ttl: Number of seconds a finished job is kept
+        :param int max_queued: Maximum number of unfinished jobs of this process
+        """
+        self.app = app
+        self.workers = workers
+        self.ttl = ttl
+        self.max_queued = max_queued
+        self.unfinished = 0
+        self.executor = None
+        self.lock = Lock()
+
+    def submit(self, work):
+        """
+        Store a new job, queue it and drop the expired ones.
+
+        :param callable work: Function returning the stored execution of the job, run in a
+                              worker thread within an application context
+
+        :return: Dictionary of the new job, or `None` if it could not be stored
+        """
+        with self.lock:
+            if self.unfinished >= self.max_queued:
+                raise JobQueueFull(f"{self.unfinished} jobs are queued")
+            self.unfinished += 1
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+
+        now = _now()
+        job = Job(id=uuid4().hex, status=Job.QUEUED, created=now)
+        try:
+            Job.query.filter(Job.finished < now - timedelta(seconds=self.ttl)).delete(synchronize_session=False)
+            db.session.add(job)
+            result = job.to_dict()
+            db.session.commit()
+
+        except SQLAlchemyError:
+            db.session.rollback()
+            with self.lock:
+                self.unfinished -= 1
+            return None
+
+        self.executor.submit(self._run, job.id, work)
+        return result
+
+    def get(self, job_id):
+        """
+        Fetch a job by id, including its stored execution once it is done.
+
+        :param str job_id: The id of the job
+
+        :return: Dictionary of the job, or `None` if it does not exist (anymore)
+        """
+        job = db.session.get(Job, job_id)
+        if job is None or (job.finished and job.finished < _now() - timedelta(seconds=self.ttl)):
+            return None
+        execution = db.session.get(Execution, job.execution_id) if job.execution_id is not None else None
+        return job.to_dict(execution.to_dict() if execution else None)
+
+    def _run(self, job_id, work):
+        """Run the work of a job and store its status, execution or error."""
+        try:
+            with self.app.app_context():
+                self._update(job_id, status=Job.RUNNING)
+                execution_id, error = None, None
+                try:
+                    result = work()
+                    if result is None:
+                        error = "request failed"
+                    else:
+                        execution_id = result["id"]
+                except Exception as e:
+                    error = (str(e) or type(e).__name__)[:255]
+                self._update(
+                    job_id, status=Job.FAILED if error else Job.DONE, error=error,
+                    execution_id=execution_id, finished=_now(),
+                )
+        finally:
+            with self.lock:
+                self.unfinished -= 1
+
+    @staticmethod
+    def _update(job_id, **values):
+        """Update the columns of a job, a failed update leaves its previous status."""
+        try:
+            Job.query.filter_by(id=job_id).update(values, synchronize_session=False)
+            db.session.commit()
+
+        except SQLAlchemyError:
+            db.session.rollback()
+            logger.exception("Updating job %s failed", job_id)
+
+        finally:
+            db.session.remove()
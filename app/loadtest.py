@@ -0,0 +1,317 @@
+"""
+Load test of the enter-path endpoint, which sends a mix of payloads from concurrent clients
+and reports the throughput and the latency percentiles, split into the compute and persist
+time from the `Server-Timing` header. Without `--url`, the app is started locally with the
+production server, gunicorn, in a subprocess, with a SQLite database in a temporary directory
+as a stand-in for PostgreSQL. Run with for example:
+
+    python -m app.loadtest --concurrency 8 --requests 500 --mix tiny=70 typical=25 maximum=5
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.client import HTTPConnection
+from os import path
+from threading import local
+from time import monotonic, perf_counter, sleep
+from urllib.parse import urlsplit
+
+from app import logic
+
+PATH = "/tibber-developer-test/enter-path"
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def tiny(rng):
+    """One to three short moves."""
+    return [
+        {"direction": rng.choice(list(logic.DIRECTIONS)), "steps": rng.randint(1, 10)}
+        for _ in range(rng.randint(1, 3))
+    ]
+
+
+def typical(rng):
+    """A hundred moves of up to a hundred steps, like a robot cleaning a room."""
+    return [{"direction": rng.choice(list(logic.DIRECTIONS)), "steps": rng.randint(1, 100)} for _ in range(100)]
+
+
+def maximum(rng):
+    """The maximum of 10,000 commands with up to 99,999 steps."""
+    return [{"direction": rng.choice(list(logic.DIRECTIONS)), "steps": rng.randint(1, 99999)} for _ in range(10000)]
+
+
+PAYLOADS = {
+    "tiny": tiny,
+    "typical": typical,
+    "maximum": maximum,
+}
+
+
+def parse_mix(weights):
+    """
+    Parse the mix of payloads.
+
+    :param list weights: List of strings `name=weight`, with names from `PAYLOADS`
+
+    :return: Dictionary of payload name to weight
+    """
+    mix = {}
+    for weight in weights:
+        name, _, value = weight.partition("=")
+        if name not in PAYLOADS or not value.isdigit():
+            raise ValueError(f"invalid payload weight {weight!r}")
+        mix[name] = int(value)
+    return mix
+
+
+def generate(mix, count, seed=42):
+    """
+    Generate the request bodies up front, so the clients only send them. Every path is
+    random, so the results are calculated instead of found in the result cache.
+
+    :param dict mix: Dictionary of payload name to weight
+    :param int count: Number of requests
+    :param int seed: Seed of the random generator
+
+    :return: List of tuples (payload name, bytes of the JSON body)
+    """
+    rng = random.Random(seed)
+    names = rng.choices(list(mix), weights=list(mix.values()), k=count)
+    return [
+        (name, json.dumps({"start": {"x": 0, "y": 0}, "commands": PAYLOADS[name](rng)}).encode())
+        for name in names
+    ]
+
+
+def server_timing(header):
+    """
+    Parse a `Server-Timing` header.
+
+    :param str header: Header like `parse;dur=0.100, persist;dur=1.500`
+
+    :return: Dictionary of phase name to duration in seconds
+    """
+    phases = {}
+    for entry in filter(None, (entry.strip() for entry in (header or "").split(","))):
+        name, _, duration = entry.partition(";dur=")
+        phases[name] = float(duration or 0) / 1000
+    return phases
+
+
+def percentiles(values):
+    """
+    Percentiles of the values, by the rank like the statistics of the history.
+
+    :param list values: List of numbers
+
+    :return: Dictionary of percentile name to value, or `None` without values
+    """
+    ordered = sorted(values)
+    return {
+        f"p{round(percentile * 100)}": ordered[round(percentile * (len(ordered) - 1))] if ordered else None
+        for percentile in PERCENTILES
+    }
+
+
+@contextmanager
+def local_server(database_dir, workers=None, timeout=60):
+    """
+    Start the app with the production entry point, gunicorn with `app/gunicorn.conf.py`, in a
+    subprocess with a SQLite database, and stop it afterwards.
+
+    :param str database_dir: Directory for the database file and the server log
+    :param int workers: Number of gunicorn workers (default is `server.workers` of the config)
+    :param float timeout: Maximum number of seconds to wait for the server to be ready
+
+    :return: Context manager of the string of the base URL of the server
+    """
+    # Imported here, since a load test of a running server with `--url` does not need them
+    from sqlalchemy import event
+
+    from app.config import Config
+    from app.database import db
+    from app.main import create_app
+
+    # The workers of the server wait for the lock of a writer instead of failing right away
+    database_url = f"sqlite:///{path.join(database_dir, 'loadtest.db')}?timeout=30"
+
+    class LoadTestConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_url
+        SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    flask_app = create_app(LoadTestConfig())
+    with flask_app.app_context():
+
+        # Concurrent readers do not wait for the writer in write-ahead logging mode, which is
+        # kept in the database file
+        event.listen(db.engine, "connect", lambda connection, _: connection.execute("PRAGMA journal_mode=WAL"))
+        db.create_all()
+        db.engine.dispose()
+
+    with socket.socket() as free:
+        free.bind(("127.0.0.1", 0))
+        port = free.getsockname()[1]
+
+    root = path.dirname(path.dirname(path.abspath(__file__)))
+    command = [
+        sys.executable, "-m", "gunicorn", "-c", path.join(root, "app", "gunicorn.conf.py"),
+        "--bind", f"127.0.0.1:{port}",
+    ] + (["--workers", str(workers)] if workers else [])
+    log_path = path.join(database_dir, "server.log")
+    with open(log_path, "w") as log:
+        server = subprocess.Popen(
+            command, cwd=root, env={**os.environ, "DATABASE_URL": database_url}, stdout=log, stderr=subprocess.STDOUT,
+        )
+    try:
+        _wait_until_ready(server, port, timeout, log_path)
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def _wait_until_ready(server, port, timeout, log_path):
+    """Wait until the server answers the health check, or raise `RuntimeError` with its log."""
+    expires = monotonic() + timeout
+    while monotonic() < expires and server.poll() is None:
+        connection = HTTPConnection("127.0.0.1", port, timeout=5)
+        try:
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            connection.close()
+        sleep(0.1)
+
+    with open(log_path) as log:
+        raise RuntimeError(f"server did not start:\n{log.read()[-2000:]}")
+
+
+def run(url, requests, concurrency):
+    """
+    Send the requests from `concurrency` clients, each with its own keep-alive connection.
+
+    :param str url: Base URL of the server
+    :param list requests: List of tuples (payload name, bytes of the JSON body)
+    :param int concurrency: Number of concurrent clients
+
+    :return: Dictionary with the environment, the summary of all requests and per payload
+    """
+    address = urlsplit(url)
+    connections = local()
+
+    def send(request):
+        name, body = request
+        if not hasattr(connections, "connection"):
+            connections.connection = HTTPConnection(address.hostname, address.port, timeout=300)
+        start_time = perf_counter()
+        try:
+            connections.connection.request("POST", PATH, body=body, headers={"Content-Type": "application/json"})
+            response = connections.connection.getresponse()
+            response.read()
+        except OSError:
+            connections.connection.close()
+            del connections.connection
+            return name, None, perf_counter() - start_time, {}
+        return name, response.status, perf_counter() - start_time, server_timing(response.getheader("Server-Timing"))
+
+    start_time = perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="loadtest-client") as executor:
+        responses = list(executor.map(send, requests))
+    elapsed = perf_counter() - start_time
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "url": url,
+            "concurrency": concurrency,
+        },
+        "summary": summarize(responses, elapsed),
+        "payloads": {
+            name: summarize([response for response in responses if response[0] == name], elapsed)
+            for name in dict.fromkeys(response[0] for response in responses)
+        },
+    }
+
+
+def summarize(responses, elapsed):
+    """
+    Summarize responses, where the compute time is the sum of all phases except `persist`.
+    Requests answered with `202` were only queued, as a job or for the write-behind writer,
+    so they are counted as accepted and left out of the throughput and the percentiles.
+
+    :param list responses: List of tuples (payload name, status or `None`, latency, phases)
+    :param float elapsed: Duration of the whole run in seconds
+
+    :return: Dictionary with the counts, the throughput and the percentiles
+    """
+    succeeded = [response for response in responses if response[1] == 200]
+    accepted = [response for response in responses if response[1] == 202]
+    return {
+        "requests": len(responses),
+        "errors": len(responses) - len(succeeded) - len(accepted),
+        "accepted": len(accepted),
+        "throughput": len(succeeded) / elapsed if elapsed else 0.0,
+        "latency": percentiles([latency for _, _, latency, _ in succeeded]),
+        "compute": percentiles([
+            sum(duration for phase, duration in phases.items() if phase != "persist") for *_, phases in succeeded
+        ]),
+        "persist": percentiles([phases.get("persist", 0.0) for *_, phases in succeeded]),
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Base URL of a running server (default is a local server)")
+    parser.add_argument("--workers", type=int, help="Number of workers of the local server")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--mix", nargs="+", default=["tiny=70", "typical=25", "maximum=5"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Path to write the JSON report to")
+    args = parser.parse_args(arguments)
+
+    requests = generate(parse_mix(args.mix), args.requests, args.seed)
+    if args.url:
+        report = run(args.url, requests, args.concurrency)
+    else:
+        with tempfile.TemporaryDirectory() as database_dir, local_server(database_dir, args.workers) as url:
+            report = run(url, requests, args.concurrency)
+
+    for name, summary in [("all", report["summary"]), *report["payloads"].items()]:
+        print(
+            f"{name:>8} {summary['requests']:>6} requests {summary['errors']:>4} errors "
+            f"{summary['accepted']:>4} accepted "
+            f"{summary['throughput']:>8.1f}/s "
+            + " ".join(
+                f"{kind} " + "/".join(f"{value * 1000:.1f}" if value is not None else "-" for value in summary[kind].values()) + "ms"
+                for kind in ("latency", "compute", "persist")
+            )
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    return 1 if report["summary"]["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,6 +2,7 @@ from collections import defaultdict
 from time import perf_counter
 
 from app.algorithms import BinarySearch
+from app.segments import Segments
 
 
 DIRECTIONS = {
@@ -23,13 +24,31 @@ def _add_to_ranges(coordinate, command, x_ranges, y_ranges):
     :param set x_ranges: Set of existing horizontal ranges of (x-axis, start, end)
     :param set y_ranges: Set of existing vertical ranges of (y-axis, start, end)
 
+    :return: Tuple of the ending coordinate
+    """
+    return _add_move_to_ranges(
+        coordinate, DIRECTIONS[command["direction"]], command["steps"], x_ranges, y_ranges
+    )
+
+
+def _add_move_to_ranges(coordinate, delta, steps, x_ranges, y_ranges):
+    """
+    Same as `_add_to_ranges`, but for a move that is already decoded into a
+    (delta_x, delta_y) tuple and the number of steps.
+
+    :param tuple coordinate: Tuple of the starting (x, y) coordinate
+    :param tuple delta: Tuple of the (delta_x, delta_y) of a single step
+    :param int steps: Number of steps to take
+    :param set x_ranges: Set of existing horizontal ranges of (x-axis, start, end)
+    :param set y_ranges: Set of existing vertical ranges of (y-axis, start, end)
+
     :return: Tuple of the ending coordinate
     """
 
     # Calculate the distance to be traveled and the ending (x, y) coordinate
-    delta_x, delta_y = DIRECTIONS[command["direction"]]
-    new_x = coordinate[0] + delta_x * command["steps"]
-    new_y = coordinate[1] + delta_y * command["steps"]
+    delta_x, delta_y = delta
+    new_x = coordinate[0] + delta_x * steps
+    new_y = coordinate[1] + delta_y * steps
 
     # For horizontal movement, add range to the `x_ranges` set
     if not delta_y:
@@ -45,6 +64,99 @@ def _add_to_ranges(coordinate, command, x_ranges, y_ranges):
     return new_x, new_y
 
 
+class RangeBuilder:
+    """
+    Builds the `x_ranges` and `y_ranges` of a path while walking its moves, coalescing the
+    lines online instead of adding a tuple per move. Consecutive moves on the same axis,
+    including reversals, are joined into a single line, and a finished line is joined
+    with the last line on the same axis position when they overlap, so a line that is
+    already covered is absorbed. The ranges then grow with the number of distinct lines
+    of the path instead of the number of moves, and are kept in columnar `Segments`. They
+    still need to be merged, since only the last line on every position is joined.
+    """
+
+    def __init__(self, start_point):
+        """
+        Initialize an empty builder at the starting point.
+
+        :param tuple start_point: Tuple of the starting (x, y) coordinate
+        """
+        self.current = start_point
+        self.x_ranges = Segments()
+        self.y_ranges = Segments()
+        self.last_lines = ({}, {})
+        self.pending = None
+
+    def add_move(self, delta, steps):
+        """
+        Walk a single move from the current coordinate.
+
+        :param tuple delta: Tuple of the (delta_x, delta_y) of a single step
+        :param int steps: Number of steps to take
+        """
+        self.add_moves(((delta, steps),))
+
+    def add_moves(self, moves):
+        """
+        Walk the moves from the current coordinate, with the state in local variables, since
+        this loop runs for every command of a path.
+
+        :param iterable moves: Iterable of ((delta_x, delta_y), steps) tuples
+        """
+        x, y = self.current
+        pending = self.pending
+        for (delta_x, delta_y), steps in moves:
+            new_x, new_y = x + delta_x * steps, y + delta_y * steps
+
+            # Vertical moves are stored on the x-axis position, like in `_add_move_to_ranges`
+            if not delta_y:
+                vertical, axis, start, end = False, y, (x if x < new_x else new_x), (new_x if x < new_x else x)
+            elif not delta_x:
+                vertical, axis, start, end = True, x, (y if y < new_y else new_y), (new_y if y < new_y else y)
+            else:
+                continue
+            x, y = new_x, new_y
+
+            # A move on the same axis as the previous move starts where that line ended
+            if pending is not None and pending[0] is vertical:
+                if start < pending[2] or end > pending[3]:
+                    pending = (vertical, axis, min(pending[2], start), max(pending[3], end))
+                continue
+            self.pending = pending
+            self._flush()
+            pending = (vertical, axis, start, end)
+
+        self.current = x, y
+        self.pending = pending
+
+    def _flush(self):
+        """Add the pending line, joined with the last line on its axis position if they overlap."""
+        if self.pending is None:
+            return
+        vertical, axis, start, end = self.pending
+        ranges = self.y_ranges if vertical else self.x_ranges
+        last_lines = self.last_lines[vertical]
+        self.pending = None
+
+        # The last line on the position is extended in place
+        last = last_lines.get(axis)
+        if last is not None and ranges.starts[last] <= end and start <= ranges.ends[last]:
+            ranges.starts[last] = min(start, ranges.starts[last])
+            ranges.ends[last] = max(end, ranges.ends[last])
+        else:
+            last_lines[axis] = ranges.append(axis, start, end)
+
+    def ranges(self):
+        """
+        Finish the pending line and return the ranges.
+
+        :return: Tuple of (`Segments` of horizontal ranges of (y-axis, start, end), `Segments`
+                 of vertical ranges of (x-axis, start, end))
+        """
+        self._flush()
+        return self.x_ranges, self.y_ranges
+
+
 def _merge_ranges(ranges):
     """
     After processing all ranges, they could be overlapping and should therefore be
@@ -83,14 +195,64 @@ def _merge_ranges(ranges):
     return merged_ranges
 
 
-def calculate_unique_coordinates(start_point, commands, algorithm=BinarySearch):
+def calculate_unique_coordinates(start_point, commands, algorithm=BinarySearch, stats=None, deadline=None):
     """
     Main function to calculate the number of unique coordinates, based on the starting
     point, the commands and the used algorithm.
 
     :param tuple start_point: Tuple of the starting (x, y) coordinate
-    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+    :param iterable commands: List (or generator) of dictionaries containing the 'direction'
+                              and 'steps' commands
+    :param CoordinateCounter algorithm: Algorithm to be used (default is BinarySearch)
+    :param dict stats: Optional dictionary that is filled with the duration per phase
+                       under 'phases' and the name of the used counter under 'algorithm',
+                       and with the merged (x_ranges, y_ranges) if it has a 'ranges' key
+    :param Deadline deadline: Optional deadline, after which `DeadlineExceeded` is raised
+
+    :return: Tuple of (Integer of unique coordinates, Float of the duration)
+    """
+    return calculate_unique_coordinates_from_moves(start_point, command_moves(commands), algorithm, stats, deadline)
+
+
+def command_moves(commands):
+    """
+    Moves of the commands of a path, in the form of the decoded binary payload format.
+
+    :param iterable commands: Iterable of dictionaries containing the 'direction' and 'steps' commands
+
+    :return: Generator of ((delta_x, delta_y), steps) tuples
+    """
+    return ((DIRECTIONS[command["direction"]], command["steps"]) for command in commands)
+
+
+def merged_ranges(start_point, moves):
+    """
+    Merged lines of a path without counting its unique coordinates, for example to store
+    the segments of a path of which the result was cached.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param iterable moves: Iterable of ((delta_x, delta_y), steps) tuples
+
+    :return: Tuple of (merged x_ranges, merged y_ranges), like the 'ranges' of the statistics
+    """
+    builder = RangeBuilder(start_point)
+    builder.add_moves(moves)
+    x_ranges, y_ranges = builder.ranges()
+    return x_ranges.merged(), y_ranges.merged()
+
+
+def calculate_unique_coordinates_from_moves(start_point, moves, algorithm=BinarySearch, stats=None, deadline=None):
+    """
+    Same as `calculate_unique_coordinates`, but for moves that are already decoded, for
+    example from the binary payload format in `app.encoding`.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param iterable moves: Iterable of ((delta_x, delta_y), steps) tuples
     :param CoordinateCounter algorithm: Algorithm to be used (default is BinarySearch)
+    :param dict stats: Optional dictionary that is filled with the duration per phase
+                       under 'phases' and the name of the used counter under 'algorithm',
+                       and with the merged (x_ranges, y_ranges) if it has a 'ranges' key
+    :param Deadline deadline: Optional deadline, checked between the phases and by the counter
 
     :return: Tuple of (Integer of unique coordinates, Float of the duration)
     """
@@ -98,17 +260,52 @@ def calculate_unique_coordinates(start_point, commands, algorithm=BinarySearch):
     # Start the timer
     start_time = perf_counter()
 
-    # Initial values setup
-    current = start_point
-    x_ranges = set()
-    y_ranges = set()
-
-    # For each command, add a (axis, start, end) tuple to the correct range variable
-    for command in commands:
-        current = _add_to_ranges(current, command, x_ranges, y_ranges)
+    # For each move, extend or add a (axis, start, end) line in the correct ranges
+    builder = RangeBuilder(start_point)
+    builder.add_moves(moves)
+    x_ranges, y_ranges = builder.ranges()
+    build_time = perf_counter()
+    if deadline is not None:
+        deadline.check()
 
     # Use the `algorithm` to calculate the unique coordinates and return
     # that number as well as the duration of that calculation
-    total = algorithm(_merge_ranges(x_ranges), _merge_ranges(y_ranges)).unique_coordinates()
-    duration = perf_counter() - start_time
-    return total, duration
+    x_ranges, y_ranges = x_ranges.merged(), y_ranges.merged()
+    merge_time = perf_counter()
+    counter = algorithm(x_ranges, y_ranges)
+    if deadline is not None:
+        deadline.check()
+        counter.deadline = deadline
+    total = counter.unique_coordinates()
+    end_time = perf_counter()
+
+    if stats is not None:
+        stats.setdefault("phases", {}).update({
+            "build": build_time - start_time,
+            "merge": merge_time - build_time,
+            "count": end_time - merge_time,
+        })
+        # `AutoSelect` records the counter it picked for this input
+        stats["algorithm"] = (getattr(counter, "selected", None) or type(counter)).__name__
+        if "ranges" in stats:
+            stats["ranges"] = (x_ranges, y_ranges)
+    return total, end_time - start_time
+
+
+def calculate_path(start_point, commands, algorithm=BinarySearch, stats=None, deadline=None):
+    """
+    Same as `calculate_unique_coordinates`, but also returns the statistics, at the module
+    level so it can be sent to a worker process.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+    :param CoordinateCounter algorithm: Algorithm to be used (default is BinarySearch)
+    :param dict stats: Optional initial statistics, for example to ask for the 'ranges'
+    :param Deadline deadline: Optional deadline, after which `DeadlineExceeded` is raised
+
+    :return: Tuple of (Integer of unique coordinates, Float of the duration, Dictionary of
+             the statistics)
+    """
+    stats = dict(stats or {})
+    total, duration = calculate_unique_coordinates(start_point, commands, algorithm, stats, deadline)
+    return total, duration, stats
@@ -1,46 +1,560 @@
-from flask import Flask, jsonify, request
+import atexit
+from datetime import datetime
+from flask import Blueprint, Flask, current_app, jsonify, request
 from os import environ
+from time import perf_counter
+from werkzeug.exceptions import RequestEntityTooLarge
 
+from app import metrics
+from app.admission import ConcurrencyLimiter, Deadline, DeadlineExceeded
+from app.algorithms import ALGORITHMS
+from app.batch import evaluate_paths, parse_commands, parse_path, parse_start
+from app.cache import cached_unique_coordinates, path_hash
 from app.config import Config
-from app.database import add_to_db, db
-from app.logic import calculate_unique_coordinates
+from app.database import ExecutionWriter, add_all_to_db, add_to_db, db
+from app.encoding import CONTENT_TYPE, HEADER, command_count, decode_path
+from app.fleet import FleetStore, add_members
+from app.history import execution_statistics, list_executions
+from app.jobs import JobQueueFull, JobStore
+from app.logic import (
+    calculate_path, calculate_unique_coordinates, calculate_unique_coordinates_from_moves, command_moves, merged_ranges,
+)
 from app.models import Execution
+from app.retention import list_rollups
+from app.sessions import SessionConflict, SessionStore, SessionTooLong
+from app.spatial import has_segments, is_visited, rectangle_coverage, store_segments
+from app.streaming import PathStream
+from app.workers import get_process_pool
 
 
-def initialize_app():
-    """Initialize SQLAlchemy with `app`."""
+api = Blueprint("api", __name__)
+fleets = FleetStore()
+
+
+def create_app(config=None):
+    """
+    Application factory, which initializes SQLAlchemy, the write-behind writer, the job and
+    session stores and the concurrency limiter and registers the routes, for example for
+    `gunicorn 'app.main:create_app()'`.
+
+    :param config: Configuration object (default is `Config`)
+
+    :return: The Flask application
+    """
     flask_app = Flask(__name__)
-    flask_app.config.from_object(Config())
+    flask_app.config.from_object(config or Config())
     db.init_app(flask_app)
-    return flask_app
+    flask_app.register_blueprint(api)
+
+    # Queued executions are written before the process exits
+    writer = ExecutionWriter(
+        flask_app,
+        batch_size=flask_app.config["WRITE_BEHIND_BATCH_SIZE"],
+        flush_interval=flask_app.config["WRITE_BEHIND_FLUSH_INTERVAL"],
+        queue_size=flask_app.config["WRITE_BEHIND_QUEUE_SIZE"],
+    )
+    flask_app.extensions["execution_writer"] = writer
+    atexit.register(writer.drain)
 
+    # Jobs are run in threads of this process, their status is shared through the database
+    flask_app.extensions["jobs"] = JobStore(
+        flask_app,
+        workers=flask_app.config["JOBS_WORKERS"],
+        ttl=flask_app.config["JOBS_TTL"],
+        max_queued=flask_app.config["JOBS_MAX_QUEUED"],
+    )
 
-app = initialize_app()
+    # Walk sessions are stored in the database, so any worker process can continue them
+    flask_app.extensions["sessions"] = SessionStore(
+        ttl=flask_app.config["SESSIONS_TTL"], max_commands=flask_app.config["SESSIONS_MAX_COMMANDS"],
+    )
 
+    # Every scrape reaches one worker process, which then reports the metrics of all of them
+    if flask_app.config["METRICS_MULTIPROCESS_DIR"]:
+        metrics.share(flask_app.config["METRICS_MULTIPROCESS_DIR"])
 
-@app.route("/health")
+    # Calculations of all requests of this application share the slots of the limiter
+    flask_app.extensions["limiter"] = ConcurrencyLimiter(
+        flask_app.config["ADMISSION_MAX_CONCURRENT"], flask_app.config["ADMISSION_QUEUE_TIMEOUT"]
+    )
+    return flask_app
+
+
+@api.route("/health")
 def health_check():
     return jsonify({"status": "ok"}), 200
 
 
-@app.route("/tibber-developer-test/enter-path", methods=["POST"])
+@api.route("/metrics")
+def prometheus_metrics():
+    return metrics.render(), 200, {"Content-Type": metrics.CONTENT_TYPE}
+
+
+@api.route("/tibber-developer-test/enter-path", methods=["POST"])
 def tibber_developer_test():
+    start_time = perf_counter()
+    stats = {"phases": {}}
+
+    algorithm = _requested_algorithm()
+    if algorithm is None:
+        return jsonify({"error": "unknown algorithm"}), 400
+
+    # Keep the merged ranges to store them as segments for the spatial queries
+    if current_app.config["SPATIAL_SEGMENTS"]:
+        stats["ranges"] = None
+
+    # In streaming mode, the commands are parsed from the body while calculating
+    if _flag("stream"):
+        mode, enter_path = "stream", _enter_path_streaming
+
+    # Paths in the binary payload format are decoded straight into the range building
+    elif request.mimetype == CONTENT_TYPE:
+        mode, enter_path = "binary", _enter_path_binary
+
+    else:
+        mode, enter_path = "json", _enter_path_json
+    response = _admitted(enter_path, algorithm, stats)
+
+    # Record the duration per phase, also in a Server-Timing header in milliseconds
+    body, status, headers = response if len(response) == 3 else (*response, {})
+    metrics.REQUESTS.inc(mode=mode, status=status)
+    metrics.REQUEST_SECONDS.observe(perf_counter() - start_time, mode=mode)
+    for phase, duration in stats["phases"].items():
+        metrics.PHASE_SECONDS.observe(duration, phase=phase)
+    server_timing = ", ".join(f"{phase};dur={duration * 1000:.3f}" for phase, duration in stats["phases"].items())
+    return body, status, ({**headers, "Server-Timing": server_timing} if server_timing else headers)
+
+
+def _admitted(calculate, *arguments):
+    """
+    Admission control of the endpoints that calculate paths: enter-path, the batch and the
+    sessions. Bodies over `admission.max_payload` bytes are rejected with `413` before they
+    are read, and requests beyond `admission.max_concurrent` calculations in this process
+    with `429` and a Retry-After header. Admitted requests are handled by
+    `calculate(*arguments, deadline)` within `admission.compute_budget` seconds, after which
+    they fail with `503`.
+    """
+    config = current_app.config
+    limiter = current_app.extensions["limiter"]
+    max_payload = config["ADMISSION_MAX_PAYLOAD"]
+    if max_payload:
+        if (request.content_length or 0) > max_payload:
+            return jsonify({"error": "payload too large"}), 413
+
+        # Bodies without a Content-Length header are limited while they are read
+        request.max_content_length = max_payload
+
+    if not limiter.acquire():
+        return jsonify({"error": "too many requests"}), 429, {"Retry-After": str(config["ADMISSION_RETRY_AFTER"])}
+    try:
+        budget = config["ADMISSION_COMPUTE_BUDGET"]
+        return calculate(*arguments, Deadline(budget) if budget else None)
+    except RequestEntityTooLarge:
+        return jsonify({"error": "payload too large"}), 413
+    except DeadlineExceeded:
+        return jsonify({"error": "compute budget exceeded"}), 503
+    finally:
+        limiter.release()
+
+
+def _too_many_commands(count):
+    """Whether a path has more commands than `admission.max_commands`."""
+    max_commands = current_app.config["ADMISSION_MAX_COMMANDS"]
+    return bool(max_commands) and count > max_commands
+
+
+def _flag(name):
+    """Boolean query argument, which is only true for `true`, `1`, `yes` or `on`."""
+    return request.args.get(name, "").lower() in ("true", "1", "yes", "on")
 
-    # Fetch data from POST data without input validation
-    request_data = request.get_json()
-    start_point = (request_data["start"]["x"], request_data["start"]["y"])
-    commands = request_data["commands"]
 
-    # Main logic to calculate unique places and duration
-    result, duration = calculate_unique_coordinates(start_point, commands)
-    new_execution = Execution(commands=len(commands), result=result, duration=duration)
+def _requested_algorithm():
+    """The counter can be forced by name, otherwise the configured default is used."""
+    return ALGORITHMS.get(request.args.get("algorithm", current_app.config["ALGORITHM"]))
+
+
+def _enter_path_json(algorithm, stats, deadline=None):
+    """Calculate the unique places for a path in a JSON request body."""
+
+    # Fetch data from POST data, malformed paths fail here instead of in the calculation
+    parse_start = perf_counter()
+    try:
+        start_point, commands = parse_path(request.get_json(silent=True))
+    except ValueError:
+        return jsonify({"error": "invalid request body"}), 400
+    stats["phases"]["parse"] = perf_counter() - parse_start
+    if _too_many_commands(len(commands)):
+        return jsonify({"error": "too many commands"}), 413
+
+    # Large paths are calculated in a job, so they do not block this worker
+    threshold = current_app.config["JOBS_THRESHOLD"]
+    if _flag("async") or (threshold and len(commands) >= threshold):
+        return _submit_job(start_point, commands, algorithm)
+
+    # Main logic to calculate unique places and duration, unless the same commands
+    # have been calculated before from any starting point
+    key = path_hash(commands)
+    result, duration = cached_unique_coordinates(
+        key, lambda: calculate_unique_coordinates(start_point, commands, algorithm, stats, deadline)
+    )
+    return _store_execution(len(commands), result, duration, stats, key, start_point, lambda: command_moves(commands))
+
+
+def _enter_path_streaming(algorithm, stats, deadline=None):
+    """
+    Calculate the unique places while the commands are parsed from the request body, so
+    only the distinct ranges are kept in memory. The number of unique places does not
+    depend on the starting point, which can appear after the commands in the body, so
+    the walk starts at the origin. The duration therefore includes parsing the body. Once
+    parsed, the starting point is validated like in the other modes.
+    """
+    path = PathStream(request.stream, max_commands=current_app.config["ADMISSION_MAX_COMMANDS"] or None)
+    try:
+        result, duration = calculate_unique_coordinates((0, 0), path.commands(), algorithm, stats, deadline)
+        parse_start(path.start)
+    except (ValueError, KeyError, TypeError, OverflowError):
+        if _too_many_commands(path.count):
+            return jsonify({"error": "too many commands"}), 413
+        return jsonify({"error": "invalid request body"}), 400
+
+    return _store_execution(path.count, result, duration, stats)
+
+
+def _enter_path_binary(algorithm, stats, deadline=None):
+    """
+    Calculate the unique places for a path in the binary payload format of `app.encoding`,
+    which is decoded lazily from the request body instead of parsing JSON.
+    """
+    parse_start = perf_counter()
+    body = request.get_data()
+    try:
+        commands = command_count(body)
+        if _too_many_commands(commands):
+            return jsonify({"error": "too many commands"}), 413
+        start_point, moves = decode_path(body)
+        stats["phases"]["parse"] = perf_counter() - parse_start
+
+        # The records after the header are exactly what the path hash is taken over
+        key = path_hash(records=body[HEADER.size:])
+        result, duration = cached_unique_coordinates(
+            key, lambda: calculate_unique_coordinates_from_moves(start_point, moves, algorithm, stats, deadline)
+        )
+    except (ValueError, IndexError):
+        return jsonify({"error": "invalid request body"}), 400
+
+    return _store_execution(commands, result, duration, stats, key, start_point, lambda: decode_path(body)[1])
+
+
+def _store_execution(commands, result, duration, stats, key=None, start_point=None, moves=None):
+    """
+    Store the execution in the database and return the resulting document or an error.
+    With write-behind enabled, the execution is queued instead and returned without the
+    generated `id` and `timestamp`, unless the caller asks for them with `?sync=true` or
+    the queue is full. `moves` returns the moves of the path, see `_store_segments`.
+    """
+    persist_start = perf_counter()
+    _store_segments(stats, key, start_point, moves)
+    new_execution = _new_execution(commands, result, duration, stats, key, start_point)
+    writer = current_app.extensions["execution_writer"]
+    if current_app.config["WRITE_BEHIND"] and not _flag("sync") and writer.submit(new_execution):
+        stats["phases"]["persist"] = perf_counter() - persist_start
+        return jsonify({"commands": commands, "result": result, "duration": duration}), 202
+
     result = add_to_db(new_execution)
+    stats["phases"]["persist"] = perf_counter() - persist_start
 
     # Return the resulting document or an error
     return (jsonify(result), 200) if result else (jsonify({"error": "request failed"}), 500)
 
 
+def _new_execution(commands, result, duration, stats, key=None, start_point=None):
+    """Create the execution to store, including the phases if enabled in the config."""
+    start_x, start_y = start_point or (None, None)
+    return Execution(
+        commands=commands, result=result, duration=duration, path_hash=key,
+        phases=dict(stats.get("phases", {})) if current_app.config["METRICS_PERSIST_PHASES"] else None,
+        algorithm=stats.get("algorithm"), start_x=start_x, start_y=start_y,
+    )
+
+
+def _store_segments(stats, key, start_point, moves=None):
+    """
+    Store the merged ranges of a path as segments, if enabled in the config. A path of which
+    the result was cached has no ranges in its statistics, so its ranges are built from the
+    moves returned by `moves` when its segments are not stored, for example since the result
+    was cached by a batch or the segments were deleted by the retention.
+    """
+    if not current_app.config["SPATIAL_SEGMENTS"] or key is None or start_point is None:
+        return
+    ranges = stats.get("ranges")
+    if ranges is None:
+        if moves is None or has_segments(key):
+            return
+        ranges = merged_ranges(start_point, moves())
+    store_segments(key, start_point, *ranges)
+
+
+def _submit_job(start_point, commands, algorithm):
+    """
+    Queue the calculation of a path as a job and return its id with `202`, the job is
+    polled at the URL in the Location header. The path is calculated in the shared process
+    pool, so the job threads only wait for the result and store the execution. Beyond
+    `jobs.max_queued` unfinished jobs in this process, the path is rejected with `429`.
+    """
+    config = current_app.config
+    key = path_hash(commands)
+    initial_stats = {"ranges": None} if config["SPATIAL_SEGMENTS"] else {}
+
+    def work():
+        stats = {}
+
+        def calculate():
+            result, duration, path_stats = get_process_pool().submit(
+                calculate_path, start_point, commands, algorithm, initial_stats
+            ).result()
+            stats.update(path_stats)
+            return result, duration
+
+        result, duration = cached_unique_coordinates(key, calculate)
+        _store_segments(stats, key, start_point, lambda: command_moves(commands))
+        return add_to_db(_new_execution(len(commands), result, duration, stats, key, start_point))
+
+    try:
+        job = current_app.extensions["jobs"].submit(work)
+    except JobQueueFull:
+        return jsonify({"error": "too many queued jobs"}), 429, {"Retry-After": str(config["ADMISSION_RETRY_AFTER"])}
+    if job is None:
+        return jsonify({"error": "request failed"}), 500
+    return jsonify(job), 202, {"Location": f"/tibber-developer-test/jobs/{job['id']}"}
+
+
+@api.route("/tibber-developer-test/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = current_app.extensions["jobs"].get(job_id)
+    return (jsonify(job), 200) if job else (jsonify({"error": "job not found"}), 404)
+
+
+@api.route("/tibber-developer-test/enter-paths", methods=["POST"])
+def enter_paths():
+    """
+    Calculate the unique places for a batch of paths, of which the executions are inserted
+    in a single transaction. Invalid paths get an error in their place in the results.
+    """
+    start_time = perf_counter()
+    algorithm = _requested_algorithm()
+    if algorithm is None:
+        return jsonify({"error": "unknown algorithm"}), 400
+
+    response = _admitted(_enter_paths, algorithm)
+    metrics.REQUESTS.inc(mode="batch", status=response[1])
+    metrics.REQUEST_SECONDS.observe(perf_counter() - start_time, mode="batch")
+    return response
+
+
+def _enter_paths(algorithm, deadline=None):
+    """Calculate and store the paths of a batch, of which each is limited like enter-path."""
+    paths = (request.get_json(silent=True) or {}).get("paths")
+    if not isinstance(paths, list) or len(paths) > current_app.config["BATCH_MAX_PATHS"]:
+        return jsonify({"error": "invalid request body"}), 400
+
+    # Only the valid paths are calculated, in the order of the request
+    parsed, errors = {}, {}
+    for index, path in enumerate(paths):
+        try:
+            start_point, commands = parse_path(path)
+        except ValueError:
+            errors[index] = {"error": "invalid path"}
+            continue
+        if _too_many_commands(len(commands)):
+            errors[index] = {"error": "too many commands"}
+        else:
+            parsed[index] = start_point, commands
+    evaluated = evaluate_paths(
+        list(parsed.values()), algorithm, current_app.config["BATCH_PARALLEL_THRESHOLD"], deadline
+    )
+
+    executions = [
+        _new_execution(len(commands), result, duration, stats, key, start_point)
+        for (start_point, commands), (result, duration, stats, key) in zip(parsed.values(), evaluated)
+    ]
+    stored = add_all_to_db(executions)
+    if stored is None:
+        return jsonify({"error": "request failed"}), 500
+
+    stored = dict(zip(parsed, stored))
+    return jsonify({
+        "results": [stored[index] if index in stored else errors[index] for index in range(len(paths))]
+    }), 200
+
+
+@api.route("/tibber-developer-test/executions", methods=["GET"])
+def execution_history():
+    try:
+        executions, cursor = list_executions(
+            request.args.get("limit", 100, type=int), request.args.get("cursor")
+        )
+    except ValueError:
+        return jsonify({"error": "invalid cursor"}), 400
+    return jsonify({"executions": [execution.to_dict() for execution in executions], "cursor": cursor}), 200
+
+
+@api.route("/tibber-developer-test/executions/stats", methods=["GET"])
+def execution_stats():
+    window = _time_window()
+    if window is None:
+        return jsonify({"error": "invalid time window"}), 400
+    return jsonify(execution_statistics(*window)), 200
+
+
+@api.route("/tibber-developer-test/executions/rollups", methods=["GET"])
+def execution_rollups():
+    window = _time_window()
+    if window is None:
+        return jsonify({"error": "invalid time window"}), 400
+    return jsonify({"rollups": [rollup.to_dict() for rollup in list_rollups(*window)]}), 200
+
+
+def _time_window():
+    """The `since` and `until` arguments in ISO format, or `None` if either is invalid."""
+    try:
+        return tuple(
+            datetime.fromisoformat(request.args[name]) if name in request.args else None
+            for name in ("since", "until")
+        )
+    except ValueError:
+        return None
+
+
+def _execution_with_segments(execution_id):
+    """Fetch an execution of which the segments are stored, or `None` otherwise."""
+    execution = db.session.get(Execution, execution_id)
+    if execution is None or execution.path_hash is None or execution.start_x is None:
+        return None
+    return execution if has_segments(execution.path_hash) else None
+
+
+@api.route("/tibber-developer-test/executions/<int:execution_id>/visited", methods=["GET"])
+def point_visited(execution_id):
+    execution = _execution_with_segments(execution_id)
+    if execution is None:
+        return jsonify({"error": "segments not found"}), 404
+
+    x, y = request.args.get("x", type=int), request.args.get("y", type=int)
+    if x is None or y is None:
+        return jsonify({"error": "invalid coordinate"}), 400
+    return jsonify({"x": x, "y": y, "visited": is_visited(execution, x, y)}), 200
+
+
+@api.route("/tibber-developer-test/executions/<int:execution_id>/coverage", methods=["GET"])
+def rectangle_visited(execution_id):
+    execution = _execution_with_segments(execution_id)
+    if execution is None:
+        return jsonify({"error": "segments not found"}), 404
+
+    bounds = [request.args.get(name, type=int) for name in ("min_x", "min_y", "max_x", "max_y")]
+    if None in bounds or bounds[0] > bounds[2] or bounds[1] > bounds[3]:
+        return jsonify({"error": "invalid rectangle"}), 400
+    return jsonify({"result": rectangle_coverage(execution, *bounds)}), 200
+
+
+@api.route("/tibber-developer-test/fleets/<fleet>/executions", methods=["POST"])
+def add_to_fleet(fleet):
+    request_data = request.get_json(silent=True)
+    execution_ids = request_data.get("executions") if isinstance(request_data, dict) else None
+    if len(fleet) > 64 or not isinstance(execution_ids, list) or not execution_ids or not all(
+        isinstance(execution_id, int) and not isinstance(execution_id, bool) for execution_id in execution_ids
+    ):
+        return jsonify({"error": "invalid fleet"}), 400
+
+    # Only paths with stored segments have a summary to merge into the fleet
+    execution_ids = list(dict.fromkeys(execution_ids))
+    executions = [_execution_with_segments(execution_id) for execution_id in execution_ids]
+    missing = [execution_id for execution_id, execution in zip(execution_ids, executions) if execution is None]
+    if missing:
+        return jsonify({"error": "segments not found", "executions": missing}), 404
+
+    add_members(fleet, executions)
+    return jsonify(_fleet_to_dict(fleet, fleets.coverage(fleet))), 200
+
+
+@api.route("/tibber-developer-test/fleets/<fleet>", methods=["GET"])
+def get_fleet(fleet):
+    coverage = fleets.coverage(fleet)
+    if not coverage.members:
+        return jsonify({"error": "fleet not found"}), 404
+    return jsonify(_fleet_to_dict(fleet, coverage)), 200
+
+
+def _fleet_to_dict(fleet, coverage):
+    return {"fleet": fleet, "executions": sorted(coverage.members), "result": coverage.result}
+
+
+@api.route("/tibber-developer-test/sessions", methods=["POST"])
+def create_session():
+    return _admitted(_create_session)
+
+
+def _create_session(deadline=None):
+
+    # Start a new session at the starting point, optionally with the first commands
+    request_data = request.get_json(silent=True)
+    try:
+        start_point, commands = parse_path({"commands": [], **request_data} if isinstance(request_data, dict) else None)
+    except ValueError:
+        return jsonify({"error": "invalid request body"}), 400
+    if _too_many_commands(len(commands)):
+        return jsonify({"error": "too many commands"}), 413
+    try:
+        session = current_app.extensions["sessions"].create(start_point, commands, deadline)
+    except SessionTooLong:
+        return jsonify({"error": "too many commands in session"}), 413
+    return (jsonify(session), 201) if session else (jsonify({"error": "request failed"}), 500)
+
+
+@api.route("/tibber-developer-test/sessions/<session_id>", methods=["GET"])
+def get_session(session_id):
+    session = current_app.extensions["sessions"].get(session_id)
+    return (jsonify(session), 200) if session else (jsonify({"error": "session not found"}), 404)
+
+
+@api.route("/tibber-developer-test/sessions/<session_id>/commands", methods=["POST"])
+def append_to_session(session_id):
+    return _admitted(_append_to_session, session_id)
+
+
+def _append_to_session(session_id, deadline=None):
+
+    # Only the new commands are walked, from the last position of the session
+    request_data = request.get_json(silent=True)
+    try:
+        commands = parse_commands(request_data.get("commands") if isinstance(request_data, dict) else None)
+    except ValueError:
+        return jsonify({"error": "invalid request body"}), 400
+    if _too_many_commands(len(commands)):
+        return jsonify({"error": "too many commands"}), 413
+    try:
+        session = current_app.extensions["sessions"].append(session_id, commands, deadline)
+    except SessionTooLong:
+        return jsonify({"error": "too many commands in session"}), 413
+    except SessionConflict:
+        return jsonify({"error": "session was changed by another request"}), 409
+    return (jsonify(session), 200) if session else (jsonify({"error": "session not found"}), 404)
+
+
+def __getattr__(name):
+    """
+    The default application is created on first use of `app.main.app` instead of on import,
+    so importing the routes does not create a database engine, see `create_app`.
+    """
+    global app
+    if name != "app":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    app = create_app()
+    return app
+
+
 if __name__ == "__main__":
+    app = create_app()
 
     # For non-prod environments, initialize the local database
     if environ.get("ENV") != "prod":
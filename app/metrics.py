@@ -0,0 +1,236 @@
+import atexit
+import json
+import os
+from bisect import bisect_left
+from threading import Lock, Thread
+from time import sleep
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# All metrics of this process, in the order they are rendered
+REGISTRY = []
+
+# Snapshot files of the worker processes in the shared directory, see `share`
+SNAPSHOT_PREFIX = "metrics-"
+SNAPSHOT_SUFFIX = ".json"
+_directory = None
+_interval = 1.0
+_exporter_pid = None
+_exporter_lock = Lock()
+
+
+def _format_labels(label_names, label_values, extra=()):
+    """Format label names and values as `{name="value",...}` for the exposition format."""
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonically increasing counter in the Prometheus text exposition format."""
+
+    def __init__(self, name, documentation, label_names=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = Lock()
+        REGISTRY.append(self)
+
+    def inc(self, amount=1, **labels):
+        _start_exporter()
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self):
+        """Copy of the values by labels, which can be combined with those of other processes."""
+        with self.lock:
+            return dict(self.values)
+
+    @staticmethod
+    def combine(value, other):
+        """Add up the values of the same labels of two processes."""
+        return value + other
+
+    def render(self, values=None):
+        """
+        :param dict values: Values by labels to render instead of the values of this process
+        """
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Histogram with cumulative buckets in the Prometheus text exposition format."""
+
+    def __init__(self, name, documentation, label_names=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self.values = {}
+        self.lock = Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        _start_exporter()
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, value)] += 1
+            self.values[key] = (counts, total + value)
+
+    def snapshot(self):
+        """Copy of the values by labels, which can be combined with those of other processes."""
+        with self.lock:
+            return {key: (list(counts), total) for key, (counts, total) in self.values.items()}
+
+    @staticmethod
+    def combine(value, other):
+        """Add up the bucket counts and sums of the same labels of two processes."""
+        return [count + other_count for count, other_count in zip(value[0], other[0])], value[1] + other[1]
+
+    def render(self, values=None):
+        """
+        :param dict values: Values by labels to render instead of the values of this process
+        """
+        values = self.snapshot() if values is None else values
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def share(directory, interval=1.0):
+    """
+    Share the metrics of this process with the other worker processes of the server, since
+    a scrape reaches only one of them. Every process writes a snapshot of its metrics to a
+    file in `directory` every `interval` seconds and at exit, and `render` adds up the
+    snapshots of all processes, also of the ones that exited, so counters do not go back
+    when a worker is replaced. The directory is emptied when the server starts, see `clear`.
+
+    :param str directory: Directory shared by the worker processes
+    :param float interval: Maximum number of seconds a snapshot lags behind the process
+    """
+    global _directory, _interval
+    os.makedirs(directory, exist_ok=True)
+    _directory, _interval = directory, interval
+
+
+def clear(directory):
+    """
+    Remove the snapshots of the processes of an earlier run of the server.
+
+    :param str directory: Directory shared by the worker processes
+    """
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(SNAPSHOT_PREFIX):
+            os.remove(os.path.join(directory, name))
+
+
+def _snapshot_path(pid):
+    return os.path.join(_directory, f"{SNAPSHOT_PREFIX}{pid}{SNAPSHOT_SUFFIX}")
+
+
+def _start_exporter():
+    """
+    Start the thread that writes the snapshots of this process, once per process, since
+    the thread of a parent process does not exist in the forked workers.
+    """
+    global _exporter_pid
+    if _directory is None or _exporter_pid == os.getpid():
+        return
+    with _exporter_lock:
+        if _exporter_pid != os.getpid():
+            _exporter_pid = os.getpid()
+            Thread(target=_export_periodically, name="metrics-exporter", daemon=True).start()
+            atexit.register(_export)
+
+
+def _export_periodically():
+    while True:
+        sleep(_interval)
+        _export()
+
+
+def _export():
+    """Write the snapshot of this process, replacing the previous one at once."""
+    if _directory is None:
+        return
+    path = _snapshot_path(os.getpid())
+    snapshot = {metric.name: [[key, value] for key, value in metric.snapshot().items()] for metric in REGISTRY}
+    try:
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError:
+        # The metrics stay in memory until the next snapshot
+        pass
+
+
+def _collect():
+    """Values by labels per metric name, of this process and of the shared snapshots of the others."""
+    values = {metric.name: metric.snapshot() for metric in REGISTRY}
+    if _directory is None:
+        return values
+
+    own = os.path.basename(_snapshot_path(os.getpid()))
+    metrics = {metric.name: metric for metric in REGISTRY}
+    for name in os.listdir(_directory):
+        if name == own or not name.startswith(SNAPSHOT_PREFIX) or not name.endswith(SNAPSHOT_SUFFIX):
+            continue
+        try:
+            with open(os.path.join(_directory, name)) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric_name, entries in snapshot.items():
+            if metric_name not in metrics:
+                continue
+            metric_values = values[metric_name]
+            for key, value in entries:
+                key = tuple(key)
+                metric_values[key] = metrics[metric_name].combine(metric_values[key], value) if key in metric_values else value
+    return values
+
+
+def render():
+    """
+    Render all metrics in the Prometheus text exposition format, added up over all worker
+    processes when they are shared, see `share`.
+
+    :return: String of the rendered metrics
+    """
+    _start_exporter()
+    values = _collect()
+    return "\n".join(line for metric in REGISTRY for line in metric.render(values[metric.name])) + "\n"
+
+
+REQUESTS = Counter(
+    "enter_path_requests_total", "Number of enter-path requests by mode and status code",
+    ["mode", "status"],
+)
+REQUEST_SECONDS = Histogram(
+    "enter_path_request_seconds", "Duration of enter-path requests by mode", ["mode"],
+)
+PHASE_SECONDS = Histogram(
+    "enter_path_phase_seconds",
+    "Duration of the phases of enter-path requests: parse, build, merge, count and persist",
+    ["phase"],
+)
@@ -0,0 +1,79 @@
+-- Upgrades a PostgreSQL database created from the initial `executions` table to the current
+-- models in `app/models.py`. Every statement is skipped when its column, table or index
+-- exists already, so the script can be applied again, also to databases created by
+-- `db.create_all()`. Apply it before deploying, e.g. `psql "$DATABASE_URL" -f app/migrations/upgrade.sql`.
+
+BEGIN;
+
+-- Executions: shared result cache, phases, used counter, starting point and history index
+ALTER TABLE executions ADD COLUMN IF NOT EXISTS path_hash VARCHAR(64);
+ALTER TABLE executions ADD COLUMN IF NOT EXISTS phases JSON;
+ALTER TABLE executions ADD COLUMN IF NOT EXISTS algorithm VARCHAR(32);
+ALTER TABLE executions ADD COLUMN IF NOT EXISTS start_x INTEGER;
+ALTER TABLE executions ADD COLUMN IF NOT EXISTS start_y INTEGER;
+CREATE INDEX IF NOT EXISTS ix_executions_path_hash ON executions (path_hash);
+CREATE INDEX IF NOT EXISTS ix_executions_timestamp_id ON executions (timestamp, id);
+
+-- Merged lines of the paths, see `spatial.store_segments`
+CREATE TABLE IF NOT EXISTS segments (
+    path_hash VARCHAR(64) NOT NULL,
+    axis VARCHAR(1) NOT NULL,
+    position INTEGER NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    PRIMARY KEY (path_hash, axis, position, start)
+);
+
+-- Executions of the fleets
+CREATE TABLE IF NOT EXISTS fleet_members (
+    fleet VARCHAR(64) NOT NULL,
+    execution_id INTEGER NOT NULL,
+    path_hash VARCHAR(64) NOT NULL,
+    start_x INTEGER NOT NULL,
+    start_y INTEGER NOT NULL,
+    PRIMARY KEY (fleet, execution_id)
+);
+CREATE INDEX IF NOT EXISTS ix_fleet_members_path_hash ON fleet_members (path_hash);
+
+-- Compacted executions, see `app.retention`
+CREATE TABLE IF NOT EXISTS execution_rollups (
+    period TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    interval INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    commands BIGINT NOT NULL,
+    results BIGINT NOT NULL,
+    duration_sum FLOAT NOT NULL,
+    duration_min FLOAT NOT NULL,
+    duration_max FLOAT NOT NULL,
+    command_buckets JSON NOT NULL,
+    PRIMARY KEY (period)
+);
+
+-- Background jobs, see `app.jobs`
+CREATE TABLE IF NOT EXISTS jobs (
+    id VARCHAR(32) NOT NULL,
+    status VARCHAR(16) NOT NULL,
+    error VARCHAR(255),
+    execution_id INTEGER,
+    created TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    finished TIMESTAMP WITHOUT TIME ZONE,
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_finished ON jobs (finished);
+
+-- Walk sessions, see `app.sessions`
+CREATE TABLE IF NOT EXISTS walk_sessions (
+    id VARCHAR(32) NOT NULL,
+    x BIGINT NOT NULL,
+    y BIGINT NOT NULL,
+    commands INTEGER NOT NULL,
+    result BIGINT NOT NULL,
+    horizontal JSON NOT NULL,
+    vertical JSON NOT NULL,
+    version INTEGER NOT NULL,
+    last_used TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    PRIMARY KEY (id)
+);
+CREATE INDEX IF NOT EXISTS ix_walk_sessions_last_used ON walk_sessions (last_used);
+
+COMMIT;
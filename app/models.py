@@ -1,14 +1,34 @@
+from sqlalchemy.dialects.sqlite import DATETIME
+
 from app.database import db
 
+# SQLite stores `now()` without fractions of a second, so timestamps in queries are
+# rendered the same way to compare them, like for the keyset pagination of the history
+SQLITE_TIMESTAMP = DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d")
+
 
 class Execution(db.Model):
     __tablename__ = 'executions'
+    __table_args__ = (
+        db.Index('ix_executions_timestamp_id', 'timestamp', 'id'),
+    )
+
+    # Fetch the generated `id` and `timestamp` with the insert, so serialising a new execution
+    # does not select it again
+    __mapper_args__ = {'eager_defaults': True}
 
     id = db.Column(db.Integer, primary_key=True)
-    timestamp = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    timestamp = db.Column(
+        db.DateTime().with_variant(SQLITE_TIMESTAMP, "sqlite"), nullable=False, server_default=db.func.now()
+    )
     commands = db.Column(db.Integer, nullable=False)
     result = db.Column(db.Integer, nullable=False)
     duration = db.Column(db.Float, nullable=False)
+    path_hash = db.Column(db.String(64), index=True)
+    phases = db.Column(db.JSON)
+    algorithm = db.Column(db.String(32))
+    start_x = db.Column(db.Integer)
+    start_y = db.Column(db.Integer)
 
     def to_dict(self):
         return {
@@ -16,5 +36,133 @@ class Execution(db.Model):
             'timestamp': self.timestamp.isoformat(),
             'commands': self.commands,
             'result': self.result,
-            'duration': float(self.duration)
+            'duration': float(self.duration),
+            'phases': self.phases,
+            'algorithm': self.algorithm,
+            'start': {'x': self.start_x, 'y': self.start_y} if self.start_x is not None else None,
+        }
+
+
+class Segment(db.Model):
+    """
+    Merged line of a path, relative to the starting point, so executions of the same
+    commands share their segments by path hash. The primary key doubles as the index
+    for looking up the lines of a path on a position.
+    """
+    __tablename__ = 'segments'
+
+    path_hash = db.Column(db.String(64), primary_key=True)
+    axis = db.Column(db.String(1), primary_key=True)
+    position = db.Column(db.Integer, primary_key=True)
+    start = db.Column(db.Integer, primary_key=True)
+    end = db.Column(db.Integer, nullable=False)
+
+
+class FleetMember(db.Model):
+    """
+    Execution whose path belongs to a fleet of robots. The path hash and starting point are
+    copied from the execution, so the member still refers to its segments once the execution
+    is compacted, see `app.fleet`.
+    """
+    __tablename__ = 'fleet_members'
+
+    fleet = db.Column(db.String(64), primary_key=True)
+    execution_id = db.Column(db.Integer, primary_key=True)
+    path_hash = db.Column(db.String(64), nullable=False, index=True)
+    start_x = db.Column(db.Integer, nullable=False)
+    start_y = db.Column(db.Integer, nullable=False)
+
+
+class ExecutionRollup(db.Model):
+    """
+    Summary of the executions in one interval, which replaces them once they are older than
+    the retention window. All columns are sums, minimums, maximums or bucket counts, so
+    summaries of the same interval can be merged, see `app.retention`.
+    """
+    __tablename__ = 'execution_rollups'
+
+    period = db.Column(db.DateTime().with_variant(SQLITE_TIMESTAMP, "sqlite"), primary_key=True)
+    interval = db.Column(db.Integer, nullable=False)
+    count = db.Column(db.Integer, nullable=False)
+    commands = db.Column(db.BigInteger, nullable=False)
+    results = db.Column(db.BigInteger, nullable=False)
+    duration_sum = db.Column(db.Float, nullable=False)
+    duration_min = db.Column(db.Float, nullable=False)
+    duration_max = db.Column(db.Float, nullable=False)
+    command_buckets = db.Column(db.JSON, nullable=False)
+
+    def to_dict(self):
+        return {
+            'period': self.period.isoformat(),
+            'interval': self.interval,
+            'count': self.count,
+            'commands': self.commands,
+            'results': self.results,
+            'duration': {
+                'avg': self.duration_sum / self.count,
+                'min': self.duration_min,
+                'max': self.duration_max,
+            },
+            'command_buckets': self.command_buckets,
+        }
+
+
+class Job(db.Model):
+    """
+    Calculation that runs in the background, of which any worker process can return the
+    status. The stored execution of a finished job is referred to by its id, see `app.jobs`.
+    """
+    __tablename__ = 'jobs'
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(16), nullable=False)
+    error = db.Column(db.String(255))
+
+    # Not a foreign key, since executions are deleted once they are compacted
+    execution_id = db.Column(db.Integer)
+    created = db.Column(db.DateTime().with_variant(SQLITE_TIMESTAMP, "sqlite"), nullable=False)
+    finished = db.Column(db.DateTime().with_variant(SQLITE_TIMESTAMP, "sqlite"), index=True)
+
+    def to_dict(self, result=None):
+        """
+        :param dict result: The stored execution of the job, if it is done
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'result': result,
+            'error': self.error,
+        }
+
+
+class SessionState(db.Model):
+    """
+    State of a walk session, see `app.sessions`, so any worker process can continue it. The
+    merged intervals are stored as lists of [axis, start, end], from which the coverage is
+    restored, and `version` is incremented by every append, so concurrent appends do not
+    overwrite each other.
+    """
+    __tablename__ = 'walk_sessions'
+
+    id = db.Column(db.String(32), primary_key=True)
+    x = db.Column(db.BigInteger, nullable=False)
+    y = db.Column(db.BigInteger, nullable=False)
+    commands = db.Column(db.Integer, nullable=False)
+    result = db.Column(db.BigInteger, nullable=False)
+    horizontal = db.Column(db.JSON, nullable=False)
+    vertical = db.Column(db.JSON, nullable=False)
+    version = db.Column(db.Integer, nullable=False)
+    last_used = db.Column(db.DateTime().with_variant(SQLITE_TIMESTAMP, "sqlite"), nullable=False, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'position': {'x': self.x, 'y': self.y},
+            'commands': self.commands,
+            'result': self.result,
         }
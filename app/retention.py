@@ -0,0 +1,166 @@
+"""
+Compaction of the executions that are older than the retention window into one summary per
+interval, run periodically, for example from cron, with:
+
+    python -m app.retention --days 90 --interval 3600
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import and_, case, func
+
+from app.config import Config
+from app.database import db
+from app.models import Execution, ExecutionRollup, FleetMember, Segment
+
+# Upper bounds of the buckets of the number of commands, like the buckets of `app.metrics`
+COMMAND_BUCKETS = (10, 100, 1000, 10000, 100000)
+EPOCH = datetime(1970, 1, 1)
+
+
+def period_of(timestamp, interval):
+    """
+    Start of the interval a timestamp is in, with intervals aligned to the epoch.
+
+    :param datetime timestamp: Timestamp without timezone
+    :param int interval: Length of the intervals in seconds
+
+    :return: datetime of the start of the interval
+    """
+    return timestamp - timedelta(seconds=(timestamp - EPOCH).total_seconds() % interval)
+
+
+def compact(days, interval=3600, now=None):
+    """
+    Replace the executions older than `days` days by a rollup per interval. Every interval
+    is summarized, merged into its rollup and deleted in a transaction of its own, so the
+    inserts of new executions are never waiting on a long transaction. Segments of which
+    no execution is left are deleted as well.
+
+    :param int days: Number of days executions are kept, older intervals are compacted
+    :param int interval: Length of the intervals of the rollups in seconds
+    :param datetime now: Current UTC time without timezone (default is the clock)
+
+    :return: Dictionary with the number of compacted executions and intervals
+    """
+    now = now or datetime.now(timezone.utc).replace(tzinfo=None)
+    cutoff = period_of(now - timedelta(days=days), interval)
+    compacted = {"executions": 0, "periods": 0}
+
+    # Intervals without executions are skipped by starting at the oldest execution left
+    while True:
+        oldest = db.session.query(func.min(Execution.timestamp)).filter(Execution.timestamp < cutoff).scalar()
+        if oldest is None:
+            return compacted
+
+        period = period_of(oldest, interval)
+        window = (Execution.timestamp >= period, Execution.timestamp < period + timedelta(seconds=interval))
+        compacted["executions"] += _compact_period(period, interval, window)
+        compacted["periods"] += 1
+
+
+def _compact_period(period, interval, window):
+    """Merge the executions in the window into the rollup of the period and delete them."""
+    bounds = (0,) + COMMAND_BUCKETS
+    count, commands, results, duration_sum, duration_min, duration_max, *buckets = db.session.query(
+        func.count(Execution.id),
+        func.sum(Execution.commands),
+        func.sum(Execution.result),
+        func.sum(Execution.duration),
+        func.min(Execution.duration),
+        func.max(Execution.duration),
+        *(
+            func.sum(case((and_(Execution.commands > lower, Execution.commands <= upper), 1), else_=0))
+            for lower, upper in zip(bounds, COMMAND_BUCKETS)
+        ),
+        func.sum(case((Execution.commands > COMMAND_BUCKETS[-1], 1), else_=0)),
+    ).filter(*window).one()
+    hashes = [row[0] for row in db.session.query(Execution.path_hash).filter(*window).distinct()]
+
+    summary = ExecutionRollup(
+        period=period, interval=interval, count=count, commands=int(commands), results=int(results),
+        duration_sum=duration_sum, duration_min=duration_min, duration_max=duration_max,
+        command_buckets=dict(zip([str(bound) for bound in COMMAND_BUCKETS] + ["+Inf"], map(int, buckets))),
+    )
+    rollup = db.session.get(ExecutionRollup, period)
+    if rollup is None:
+        db.session.add(summary)
+    else:
+        merge(rollup, summary)
+
+    Execution.query.filter(*window).delete(synchronize_session=False)
+    _delete_orphaned_segments([key for key in hashes if key is not None])
+    db.session.commit()
+    return count
+
+
+def merge(rollup, other):
+    """
+    Merge the summary of other executions of the same period into a rollup.
+
+    :param ExecutionRollup rollup: Rollup to update
+    :param ExecutionRollup other: Summary of the other executions
+    """
+    rollup.count += other.count
+    rollup.commands += other.commands
+    rollup.results += other.results
+    rollup.duration_sum += other.duration_sum
+    rollup.duration_min = min(rollup.duration_min, other.duration_min)
+    rollup.duration_max = max(rollup.duration_max, other.duration_max)
+    rollup.command_buckets = {
+        bucket: rollup.command_buckets.get(bucket, 0) + other.command_buckets.get(bucket, 0)
+        for bucket in dict.fromkeys([*rollup.command_buckets, *other.command_buckets])
+    }
+
+
+def _delete_orphaned_segments(hashes):
+    """Delete the segments of the path hashes that no execution or fleet refers to anymore."""
+    if not hashes:
+        return
+    referenced = {
+        row[0] for row in db.session.query(Execution.path_hash).filter(Execution.path_hash.in_(hashes)).distinct()
+    } | {
+        row[0] for row in db.session.query(FleetMember.path_hash).filter(FleetMember.path_hash.in_(hashes)).distinct()
+    }
+    orphaned = [key for key in hashes if key not in referenced]
+    if orphaned:
+        Segment.query.filter(Segment.path_hash.in_(orphaned)).delete(synchronize_session=False)
+
+
+def list_rollups(since=None, until=None):
+    """
+    Rollups of the compacted executions in a time window, oldest first.
+
+    :param datetime since: Start of the window (inclusive), or `None` for no start
+    :param datetime until: End of the window (exclusive), or `None` for no end
+
+    :return: List of `ExecutionRollup`
+    """
+    query = ExecutionRollup.query
+    if since is not None:
+        query = query.filter(ExecutionRollup.period >= since)
+    if until is not None:
+        query = query.filter(ExecutionRollup.period < until)
+    return query.order_by(ExecutionRollup.period).all()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=Config.RETENTION_DAYS)
+    parser.add_argument("--interval", type=int, default=Config.RETENTION_ROLLUP_INTERVAL)
+    args = parser.parse_args(arguments)
+    if args.days <= 0:
+        print("Retention is disabled")
+        return 0
+
+    # Imported here, since the routes of `app.main` import this module
+    from app.main import create_app
+    with create_app().app_context():
+        compacted = compact(args.days, args.interval)
+    print(f"Compacted {compacted['executions']} executions into {compacted['periods']} intervals")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
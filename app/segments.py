@@ -0,0 +1,136 @@
+import heapq
+from array import array
+
+
+class Segments:
+    """
+    Columnar store of lines as (axis, start, end), with a typed integer array per column
+    instead of a tuple per line, which takes 24 bytes per line instead of around 150.
+    Iterating yields (axis, start, end) tuples, so it can be used wherever a set of
+    ranges is expected, like by the `CoordinateCounter` implementations.
+
+    The output of `merged` is also grouped by axis: `positions` holds the distinct axis
+    positions in order and the lines on `positions[i]` are at the indices from
+    `offsets[i]` up to `offsets[i + 1]`, sorted by start. Counters use this directly
+    instead of grouping and sorting the lines again, see `grouped`.
+    """
+
+    __slots__ = ("axes", "starts", "ends", "positions", "offsets")
+
+    TYPECODE = "q"
+
+    def __init__(self, lines=()):
+        """
+        Initialize the store, optionally with existing lines.
+
+        :param iterable lines: Iterable of tuples (axis, start, end)
+        """
+        self.axes = array(self.TYPECODE)
+        self.starts = array(self.TYPECODE)
+        self.ends = array(self.TYPECODE)
+        self.positions = None
+        self.offsets = None
+        for axis, start, end in lines:
+            self.append(axis, start, end)
+
+    def __len__(self):
+        return len(self.axes)
+
+    def __iter__(self):
+        return zip(self.axes, self.starts, self.ends)
+
+    def __repr__(self):
+        return f"Segments({list(self)!r})"
+
+    def append(self, axis, start, end):
+        """
+        Add a line at the end of the store.
+
+        :param int axis: Position of the line on the other axis
+        :param int start: First coordinate of the line
+        :param int end: Last coordinate of the line
+
+        :return: Integer index of the line
+        """
+        self.axes.append(axis)
+        self.starts.append(start)
+        self.ends.append(end)
+        return len(self.axes) - 1
+
+    def merged(self):
+        """
+        Same as `_merge_ranges`, but for the columns. The lines are ordered by sorting their
+        indices with the columns as keys, so no tuple is created per line.
+
+        :return: New `Segments` with the merged lines, sorted and grouped by axis
+        """
+        axes, starts, ends = self.axes, self.starts, self.ends
+        order = sorted(range(len(axes)), key=starts.__getitem__)
+        order.sort(key=axes.__getitem__)
+        return _merge_ordered(axes, starts, ends, order)
+
+    def union(self, other):
+        """
+        Union of two merged stores. Both are already sorted by axis and start, so they are
+        merged in a single pass instead of sorting all lines again, which makes the merged
+        lines of a path a summary that can be combined with the summaries of other paths.
+
+        :param Segments other: Output of `merged` or `union`
+
+        :return: New `Segments` with the merged lines of both, like `merged`
+        """
+        axes, starts, ends = self.axes + other.axes, self.starts + other.starts, self.ends + other.ends
+        order = heapq.merge(
+            range(len(self)), range(len(self), len(axes)), key=lambda index: (axes[index], starts[index]),
+        )
+        return _merge_ordered(axes, starts, ends, order)
+
+
+def _merge_ordered(axes, starts, ends, order):
+    """
+    Merge the lines of columns in the given order, see `Segments.merged`.
+
+    :param array axes: Column of the positions of the lines on the other axis
+    :param array starts: Column of the first coordinates of the lines
+    :param array ends: Column of the last coordinates of the lines
+    :param iterable order: Indices of the lines, sorted by axis and start
+
+    :return: New `Segments` with the merged lines, sorted and grouped by axis
+    """
+    merged = Segments()
+    merged_axes, merged_starts, merged_ends = merged.axes, merged.starts, merged.ends
+    positions, offsets = [], array(Segments.TYPECODE)
+    for index in order:
+        axis, start, end = axes[index], starts[index], ends[index]
+
+        # Overlap with the last line on the same axis, merge ranges
+        if positions and positions[-1] == axis and start <= merged_ends[-1]:
+            if end > merged_ends[-1]:
+                merged_ends[-1] = end
+            continue
+
+        # No overlap, possibly the first line of a new axis
+        if not positions or positions[-1] != axis:
+            positions.append(axis)
+            offsets.append(len(merged_axes))
+        merged_axes.append(axis)
+        merged_starts.append(start)
+        merged_ends.append(end)
+
+    offsets.append(len(merged_axes))
+    merged.positions, merged.offsets = positions, offsets
+    return merged
+
+
+def grouped(ranges):
+    """
+    Merged lines grouped by axis, as returned by `Segments.merged`. The output of the merge
+    is returned as is, other ranges, like sets of tuples, are merged first.
+
+    :param iterable ranges: `Segments` or an iterable of tuples (axis, start, end)
+
+    :return: `Segments` with `positions` and `offsets`
+    """
+    if isinstance(ranges, Segments) and ranges.offsets is not None:
+        return ranges
+    return Segments(ranges).merged()
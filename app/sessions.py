@@ -0,0 +1,195 @@
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.coverage import Coverage
+from app.database import db
+from app.logic import DIRECTIONS
+from app.models import SessionState
+
+
+class SessionTooLong(Exception):
+    """Raised by `SessionStore` when the commands would exceed the `max_commands` of a session."""
+
+
+class SessionConflict(Exception):
+    """Raised by `SessionStore.append` when the session was changed by another request meanwhile."""
+
+
+def _now():
+    """Current UTC time without timezone, like the timestamps of `app.retention`."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class WalkSession:
+    """
+    Path of a robot that is reported in chunks. The visited coordinates are kept in a
+    `Coverage`, so appending commands only processes the new commands.
+    """
+
+    def __init__(self, start_point, session_id=None, commands=0, coverage=None):
+        """
+        Initialize a session at the starting point, or continue a stored session.
+
+        :param tuple start_point: Tuple of the starting (x, y) coordinate, or the current
+                                  coordinate of a stored session
+        :param str session_id: The id of a stored session (default is a new id)
+        :param int commands: Number of commands the session walked before
+        :param Coverage coverage: Coverage of the commands the session walked before
+        """
+        self.id = session_id or uuid4().hex
+        self.position = start_point
+        self.commands = commands
+        self.coverage = coverage or Coverage()
+
+    @classmethod
+    def restore(cls, state):
+        """
+        Continue a stored session.
+
+        :param SessionState state: The stored state of the session
+
+        :return: The `WalkSession`
+        """
+        coverage = Coverage.restore(state.horizontal, state.vertical, state.result)
+        return cls((state.x, state.y), state.id, state.commands, coverage)
+
+    def append(self, commands, deadline=None):
+        """
+        Walk the commands from the current position and update the coverage. Once the
+        deadline has passed, `DeadlineExceeded` is raised and the session is left halfway,
+        so `SessionStore` only stores a session once all commands are walked.
+
+        :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+        :param Deadline deadline: Optional deadline, checked while walking the commands
+        """
+        for command in deadline.checked(commands) if deadline is not None else commands:
+            self.position = self.coverage.add_move(
+                self.position, DIRECTIONS[command["direction"]], command["steps"]
+            )
+            self.commands += 1
+
+    def state(self):
+        """
+        Columns of the stored state of the session, see `SessionState`.
+
+        :return: Dictionary of column name to value
+        """
+        return {
+            'x': self.position[0],
+            'y': self.position[1],
+            'commands': self.commands,
+            'result': self.coverage.total,
+            'horizontal': [list(interval) for interval in self.coverage.horizontal],
+            'vertical': [list(interval) for interval in self.coverage.vertical],
+        }
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'position': {'x': self.position[0], 'y': self.position[1]},
+            'commands': self.commands,
+            'result': self.coverage.total,
+        }
+
+
+class SessionStore:
+    """
+    Store of walk sessions, of which the state is kept in the `walk_sessions` table, so any
+    worker process can continue a session. Every append restores the coverage of the session,
+    walks the new commands and stores the new state, or nothing once the deadline passed.
+    Sessions expire after `ttl` seconds without use and walk at most `max_commands` commands,
+    which bounds the size of their intervals.
+    """
+
+    def __init__(self, ttl=3600, max_commands=10000):
+        """
+        :param int ttl: Number of seconds a session is kept without use
+        :param int max_commands: Maximum number of commands of a session, 0 disables the limit
+        """
+        self.ttl = ttl
+        self.max_commands = max_commands
+
+    def create(self, start_point, commands, deadline=None):
+        """
+        Create a new session that walked the first commands and drop the expired ones.
+
+        :param tuple start_point: Tuple of the starting (x, y) coordinate
+        :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+        :param Deadline deadline: Optional deadline, checked while walking the commands
+
+        :return: Dictionary of the session, or `None` if it could not be stored
+        """
+        self._check_length(0, len(commands))
+        session = WalkSession(start_point)
+        session.append(commands, deadline)
+
+        now = _now()
+        try:
+            SessionState.query.filter(SessionState.last_used < now - timedelta(seconds=self.ttl)).delete(
+                synchronize_session=False
+            )
+            db.session.add(SessionState(id=session.id, version=1, last_used=now, **session.state()))
+            db.session.commit()
+            return session.to_dict()
+
+        except SQLAlchemyError:
+            db.session.rollback()
+            return None
+
+    def get(self, session_id):
+        """
+        Fetch a session by id.
+
+        :param str session_id: The id of the session
+
+        :return: Dictionary of the session, or `None` if it does not exist (anymore)
+        """
+        state = self._get_state(session_id)
+        return state.to_dict() if state is not None else None
+
+    def append(self, session_id, commands, deadline=None):
+        """
+        Walk the commands from the last position of a session and store its new state. Once
+        the deadline has passed, `DeadlineExceeded` is raised and the session is unchanged.
+
+        :param str session_id: The id of the session
+        :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+        :param Deadline deadline: Optional deadline, checked while walking the commands
+
+        :return: Dictionary of the session, or `None` if it does not exist (anymore)
+        """
+        state = self._get_state(session_id)
+        if state is None:
+            return None
+        self._check_length(state.commands, len(commands))
+        session = WalkSession.restore(state)
+        session.append(commands, deadline)
+
+        # Another request appended to the session after it was read, if the version changed
+        try:
+            updated = SessionState.query.filter_by(id=session_id, version=state.version).update(
+                {**session.state(), "version": state.version + 1, "last_used": _now()}, synchronize_session=False
+            )
+            if not updated:
+                db.session.rollback()
+                raise SessionConflict(f"session {session_id} was changed meanwhile")
+            db.session.commit()
+            return session.to_dict()
+
+        except SQLAlchemyError as e:
+            db.session.rollback()
+            raise SessionConflict(f"session {session_id} could not be stored") from e
+
+    def _get_state(self, session_id):
+        """The stored state of a session, or `None` if it does not exist or expired."""
+        state = db.session.get(SessionState, session_id)
+        if state is None or state.last_used < _now() - timedelta(seconds=self.ttl):
+            return None
+        return state
+
+    def _check_length(self, walked, appended):
+        """Raise `SessionTooLong` if the session would walk more than `max_commands` commands."""
+        if self.max_commands and walked + appended > self.max_commands:
+            raise SessionTooLong(f"sessions walk at most {self.max_commands} commands")
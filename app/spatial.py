@@ -0,0 +1,151 @@
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.algorithms import AutoSelect
+from app.database import db
+from app.models import Segment
+from app.segments import Segments
+
+HORIZONTAL = "h"
+VERTICAL = "v"
+
+
+def store_segments(key, start_point, x_ranges, y_ranges):
+    """
+    Store the merged lines of a path relative to its starting point, unless the lines of
+    the same commands are stored already.
+
+    :param str key: Hash of the path from `path_hash`
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param set x_ranges: Set of merged tuples (y_pos, start_x, end_x) for horizontal lines
+    :param set y_ranges: Set of merged tuples (x_pos, start_y, end_y) for vertical lines
+
+    :return: Boolean whether the segments are stored
+    """
+    if has_segments(key):
+        return True
+
+    start_x, start_y = start_point
+    rows = [
+        {"path_hash": key, "axis": HORIZONTAL, "position": y_pos - start_y, "start": start - start_x,
+         "end": end - start_x}
+        for y_pos, start, end in x_ranges
+    ] + [
+        {"path_hash": key, "axis": VERTICAL, "position": x_pos - start_x, "start": start - start_y,
+         "end": end - start_y}
+        for x_pos, start, end in y_ranges
+    ]
+    try:
+        if rows:
+            db.session.execute(insert(Segment), rows)
+        db.session.commit()
+        return True
+
+    except SQLAlchemyError:
+        # Roll back the session on error, for example when another worker stored them first
+        db.session.rollback()
+        return has_segments(key)
+
+
+def has_segments(key):
+    """
+    Whether the segments of a path are stored.
+
+    :param str key: Hash of the path from `path_hash`
+
+    :return: Boolean whether any segment is stored for the path
+    """
+    return db.session.query(Segment.query.filter_by(path_hash=key).exists()).scalar()
+
+
+def load_segments(key, start_point):
+    """
+    Merged lines of a stored path in absolute coordinates, which are the mergeable summary of
+    the path, see `Segments.union`. The lines are read in primary key order, which is the
+    order of `Segments.merged`.
+
+    :param str key: Hash of the path from `path_hash`
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+
+    :return: Tuple of merged `Segments` (x_ranges, y_ranges)
+    """
+    start_x, start_y = start_point
+    x_ranges, y_ranges = Segments(), Segments()
+    lines = (
+        db.session.query(Segment.axis, Segment.position, Segment.start, Segment.end)
+        .filter(Segment.path_hash == key)
+        .order_by(Segment.axis, Segment.position, Segment.start)
+    )
+    for axis, position, start, end in lines:
+        if axis == HORIZONTAL:
+            x_ranges.append(position + start_y, start + start_x, end + start_x)
+        else:
+            y_ranges.append(position + start_x, start + start_y, end + start_y)
+    return x_ranges.merged(), y_ranges.merged()
+
+
+def _covering(key, axis, position, coordinate):
+    """
+    Whether a line of the path on `axis` at `position` covers `coordinate`. Merged lines do
+    not overlap, so only the last line starting at or before `coordinate` can cover it,
+    which is a single lookup in the primary key.
+    """
+    line = (
+        Segment.query
+        .filter_by(path_hash=key, axis=axis, position=position)
+        .filter(Segment.start <= coordinate)
+        .order_by(Segment.start.desc())
+        .first()
+    )
+    return line is not None and line.end >= coordinate
+
+
+def is_visited(execution, x, y):
+    """
+    Whether the path of an execution visited a coordinate.
+
+    :param Execution execution: Execution with stored segments
+    :param int x: The x-coordinate
+    :param int y: The y-coordinate
+
+    :return: Boolean whether (x, y) was visited
+    """
+    x, y = x - execution.start_x, y - execution.start_y
+    return _covering(execution.path_hash, HORIZONTAL, y, x) or _covering(execution.path_hash, VERTICAL, x, y)
+
+
+def rectangle_coverage(execution, min_x, min_y, max_x, max_y, algorithm=AutoSelect):
+    """
+    Number of unique coordinates the path of an execution visited within a rectangle, by
+    counting the lines clipped to the rectangle with a `CoordinateCounter`.
+
+    :param Execution execution: Execution with stored segments
+    :param int min_x: The smallest x-coordinate of the rectangle
+    :param int min_y: The smallest y-coordinate of the rectangle
+    :param int max_x: The largest x-coordinate of the rectangle
+    :param int max_y: The largest y-coordinate of the rectangle
+    :param CoordinateCounter algorithm: Algorithm to be used (default is AutoSelect)
+
+    :return: Integer representing the number of unique coordinates in the rectangle
+    """
+    offset_x, offset_y = execution.start_x, execution.start_y
+    min_x, max_x, min_y, max_y = min_x - offset_x, max_x - offset_x, min_y - offset_y, max_y - offset_y
+    lines = Segment.query.filter(Segment.path_hash == execution.path_hash).filter(or_(
+        and_(
+            Segment.axis == HORIZONTAL, Segment.position.between(min_y, max_y),
+            Segment.start <= max_x, Segment.end >= min_x,
+        ),
+        and_(
+            Segment.axis == VERTICAL, Segment.position.between(min_x, max_x),
+            Segment.start <= max_y, Segment.end >= min_y,
+        ),
+    ))
+
+    # Clipping keeps the lines merged, since they did not overlap before
+    x_ranges, y_ranges = set(), set()
+    for line in lines:
+        if line.axis == HORIZONTAL:
+            x_ranges.add((line.position, max(line.start, min_x), min(line.end, max_x)))
+        else:
+            y_ranges.add((line.position, max(line.start, min_y), min(line.end, max_y)))
+    return algorithm(x_ranges, y_ranges).unique_coordinates()
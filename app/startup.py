@@ -0,0 +1,68 @@
+from json import dumps
+from os import environ
+from threading import Lock
+
+
+def load_app():
+    """
+    Full application. For non-prod environments, the local database is initialized, after
+    which its connections are closed so no forked worker inherits them.
+
+    :return: The Flask application
+    """
+    # Imported here, so `LazyApp` can be served without importing Flask or SQLAlchemy
+    from sqlalchemy.exc import SQLAlchemyError
+
+    from app.database import db
+    from app.main import create_app
+
+    flask_app = create_app()
+    if environ.get("ENV") != "prod":
+        with flask_app.app_context():
+            try:
+                db.create_all()
+            except SQLAlchemyError:
+                # Lazily loaded workers can race to create the tables, one of them wins
+                db.session.rollback()
+            db.engine.dispose()
+    return flask_app
+
+
+class LazyApp:
+    """
+    WSGI application that answers the health check itself and loads the actual application
+    on the first other request, so a new process is ready without importing Flask,
+    SQLAlchemy or the database driver and without creating the database engine. Once
+    loaded, all requests, including the health check, go to the application.
+    """
+
+    HEALTH_PATH = "/health"
+    HEALTH_BODY = (dumps({"status": "ok"}, separators=(",", ":")) + "\n").encode()
+
+    def __init__(self, factory=load_app):
+        """
+        :param callable factory: Function returning the WSGI application to load
+        """
+        self.factory = factory
+        self.app = None
+        self.lock = Lock()
+
+    def load(self):
+        """
+        Load the application, once, also when called from several threads at the same time.
+
+        :return: The loaded WSGI application
+        """
+        with self.lock:
+            if self.app is None:
+                self.app = self.factory()
+        return self.app
+
+    def __call__(self, environ, start_response):
+        app = self.app
+        if app is None and environ.get("PATH_INFO") == self.HEALTH_PATH and environ.get("REQUEST_METHOD") in ("GET", "HEAD"):
+            start_response("200 OK", [
+                ("Content-Type", "application/json"), ("Content-Length", str(len(self.HEALTH_BODY))),
+            ])
+            return [self.HEALTH_BODY] if environ["REQUEST_METHOD"] == "GET" else []
+        return (app or self.load())(environ, start_response)
@@ -0,0 +1,161 @@
+"""
+Startup benchmark of the application, which measures in fresh interpreters how long it takes
+until the application is ready, answers its first health check and its first other request,
+run with for example:
+
+    python -m app.startup_benchmark --repeat 5 --output startup.json --baseline baseline.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from statistics import median
+from time import perf_counter
+
+# Application per mode, `eager` creates it on import like `app.wsgi` without fast start
+MODES = {
+    "eager": """
+from app.main import create_app
+application = create_app()
+""",
+    "lazy": """
+from app.startup import LazyApp
+
+def factory():
+    from app.main import create_app
+    return create_app()
+
+application = LazyApp(factory)
+""",
+}
+
+# Measured in the fresh interpreter, the first other request does not use the database
+SCRIPT = """
+import json
+import sys
+from time import perf_counter
+from wsgiref.util import setup_testing_defaults
+
+start_time = perf_counter()
+{mode}
+timings = {{"ready": perf_counter() - start_time}}
+
+def get(path):
+    environ = {{"PATH_INFO": path}}
+    setup_testing_defaults(environ)
+    statuses = []
+    b"".join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    assert statuses[0].startswith("200"), statuses
+
+request_start = perf_counter()
+get("/health")
+timings["health"] = perf_counter() - request_start
+imported = [module for module in ("flask", "sqlalchemy", "psycopg", "psycopg2") if module in sys.modules]
+
+request_start = perf_counter()
+get("/metrics")
+timings["first_request"] = perf_counter() - request_start
+print(json.dumps({{"timings": timings, "imported_at_health": imported}}))
+"""
+
+TIMINGS = ("process", "ready", "health", "first_request")
+
+
+def measure(mode, repeat=3):
+    """
+    Start the application of a mode in `repeat` fresh interpreters, and take the median of
+    every timing. `process` is the wall-clock time of the whole interpreter, as seen from
+    this process, the other timings are measured inside it.
+
+    :param str mode: Name of the mode from `MODES`
+    :param int repeat: Number of interpreters to start
+
+    :return: Dictionary with the median timings and the heavy modules imported at the health check
+    """
+    runs = []
+    for _ in range(repeat):
+        start_time = perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", SCRIPT.format(mode=MODES[mode])], check=True, capture_output=True, text=True,
+        ).stdout
+        measurement = json.loads(output.splitlines()[-1])
+        measurement["timings"]["process"] = perf_counter() - start_time
+        runs.append(measurement)
+
+    return {
+        **{name: median(run["timings"][name] for run in runs) for name in TIMINGS},
+        "imported_at_health": runs[-1]["imported_at_health"],
+    }
+
+
+def run(modes, repeat=3):
+    """
+    Run the benchmark for every mode.
+
+    :param list modes: List of mode names from `MODES`
+    :param int repeat: Number of interpreters to start per mode
+
+    :return: Dictionary with the environment and the list of results
+    """
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+        },
+        "results": [{"mode": mode, **measure(mode, repeat)} for mode in modes],
+    }
+
+
+def compare(report, baseline, tolerance=0.25):
+    """
+    Compare a report with a stored baseline report.
+
+    :param dict report: Report from `run`
+    :param dict baseline: Report from an earlier `run`
+    :param float tolerance: Allowed relative slowdown before flagging a regression
+
+    :return: List of strings describing the regressions
+    """
+    expected = {result["mode"]: result for result in baseline["results"]}
+    regressions = []
+    for result in report["results"]:
+        if result["mode"] not in expected:
+            continue
+        for name in TIMINGS:
+            if result[name] > expected[result["mode"]][name] * (1 + tolerance):
+                regressions.append(f"{result['mode']} {name}: {result[name]:.4f}s > {expected[result['mode']][name]:.4f}s")
+    return regressions
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", help="Path to write the JSON report to")
+    parser.add_argument("--baseline", help="Path of a JSON report to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(arguments)
+
+    report = run(args.modes, args.repeat)
+    for result in report["results"]:
+        print(f"{result['mode']:>6} " + " ".join(f"{name} {result[name]:.4f}s" for name in TIMINGS))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r") as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
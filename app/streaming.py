@@ -0,0 +1,137 @@
+import codecs
+import json
+
+from app.encoding import valid_command
+
+
+class PathStream:
+    """
+    Incremental parser for an enter-path request body, which yields the commands one by
+    one while the body is read in chunks, instead of materialising the whole document.
+    Every command is validated like `app.batch.parse_commands` before it is yielded.
+    """
+
+    WHITESPACE = " \t\n\r"
+
+    def __init__(self, stream, chunk_size=64 * 1024, max_commands=None):
+        """
+        Initialize the parser on top of a binary stream.
+
+        :param stream: File-like object with a `read(size)` method returning bytes
+        :param int chunk_size: Number of bytes to read from the stream at once
+        :param int max_commands: Maximum number of commands, or `None` for no maximum
+        """
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.max_commands = max_commands
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.json_decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.position = 0
+        self.finished = False
+
+        # Filled in while parsing
+        self.start = None
+        self.count = 0
+
+    def _read(self):
+        """
+        Read the next chunk from the stream into the buffer, dropping the part of the
+        buffer that has already been parsed.
+
+        :return: Boolean whether more data was read
+        """
+        if self.finished:
+            return False
+
+        chunk = self.stream.read(self.chunk_size)
+        self.finished = not chunk
+        self.buffer = self.buffer[self.position:] + self.decoder.decode(chunk, final=self.finished)
+        self.position = 0
+        return not self.finished
+
+    def _peek(self):
+        """
+        Skip whitespace and return the next character without consuming it.
+
+        :return: String of the next character
+        """
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in self.WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self._read():
+                raise ValueError("Unexpected end of the request body")
+
+    def _expect(self, characters):
+        """
+        Consume the next character, which should be one of `characters`.
+
+        :param str characters: String of the allowed characters
+
+        :return: String of the consumed character
+        """
+        character = self._peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of '{characters}' at '{character}'")
+        self.position += 1
+        return character
+
+    def _value(self):
+        """
+        Decode the next JSON value, reading more chunks until it is complete. A value that
+        ends exactly at the end of the buffer could be a truncated number, so that is only
+        accepted at the end of the stream.
+
+        :return: The decoded value
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.position)
+                if end < len(self.buffer) or self.finished:
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.finished:
+                    raise
+            self._read()
+
+    def commands(self):
+        """
+        Generator that parses the request body and yields the commands as soon as they
+        are complete. Other keys, like 'start', are stored on the parser.
+
+        :return: Generator of dictionaries containing the 'direction' and 'steps'
+        """
+        self._expect("{")
+        if self._peek() == "}":
+            return
+
+        while True:
+            key = self._value()
+            self._expect(":")
+
+            if key == "commands":
+                self._expect("[")
+                if self._peek() == "]":
+                    self.position += 1
+                else:
+                    while True:
+                        self.count += 1
+                        if self.max_commands is not None and self.count > self.max_commands:
+                            raise ValueError(f"More than {self.max_commands} commands")
+                        command = self._value()
+                        if not valid_command(command):
+                            raise ValueError(f"Invalid command {self.count}")
+                        yield command
+                        if self._expect(",]") == "]":
+                            break
+            else:
+                value = self._value()
+                if key == "start":
+                    self.start = value
+
+            if self._expect(",}") == "}":
+                return
@@ -0,0 +1,55 @@
+import io
+import json
+from functools import partial
+
+import pytest
+
+from app import benchmark, logic
+from app.admission import ConcurrencyLimiter, Deadline, DeadlineExceeded
+from app.algorithms import ALGORITHMS, ParallelSweepLine
+from app.streaming import PathStream
+
+
+def test_deadline():
+    """Tests that a deadline passes the items of a loop until it has passed."""
+    deadline = Deadline(60)
+    assert list(deadline.checked(range(5000))) == list(range(5000))
+    assert 0 < deadline.remaining() <= 60
+
+    expired = Deadline(-1)
+    assert expired.remaining() == 0
+    with pytest.raises(DeadlineExceeded):
+        list(expired.checked(range(10)))
+
+
+def test_counters_abort_after_deadline():
+    """Tests that every counter stops with `DeadlineExceeded` once the deadline has passed, and counts as before otherwise."""
+    start_point, commands = benchmark.comb(400)
+    expected = logic.calculate_unique_coordinates(start_point, commands)[0]
+    algorithms = {**ALGORITHMS, "ParallelSweepLine": partial(ParallelSweepLine, workers=2, threshold=0)}
+    for name, algorithm in algorithms.items():
+        assert logic.calculate_unique_coordinates(start_point, commands, algorithm, None, Deadline(60))[0] == expected, name
+        with pytest.raises(DeadlineExceeded):
+            logic.calculate_unique_coordinates(start_point, commands, algorithm, None, Deadline(-1))
+
+
+def test_concurrency_limiter():
+    """Tests that the limiter rejects requests beyond the limit until a slot is released."""
+    limiter = ConcurrencyLimiter(2, wait=0.01)
+    assert limiter.acquire() and limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+
+    unlimited = ConcurrencyLimiter(0)
+    assert all(unlimited.acquire() for _ in range(100))
+
+
+def test_streaming_command_limit():
+    """Tests that `PathStream` stops parsing after the maximum number of commands."""
+    body = json.dumps({"commands": [{"direction": "east", "steps": 1}] * 11}).encode()
+    path = PathStream(io.BytesIO(body), max_commands=10)
+    with pytest.raises(ValueError):
+        list(path.commands())
+    assert path.count == 11
+    assert len(list(PathStream(io.BytesIO(body), max_commands=11).commands())) == 11
@@ -0,0 +1,64 @@
+import pytest
+
+from app import benchmark
+from app.admission import Deadline, DeadlineExceeded
+from app.algorithms import BinarySearch
+from app.batch import evaluate_paths, parse_path
+from app.cache import path_hash, results
+
+
+def test_parse_path():
+    """Tests that `parse_path` returns the start and commands, and rejects invalid paths."""
+    commands = [{"direction": "east", "steps": 2}]
+    assert parse_path({"start": {"x": 1, "y": 2}, "commands": commands}) == ((1, 2), commands)
+
+    for path in [
+        {"start": {"x": 1}, "commands": commands},
+        {"start": {"x": 1, "y": 2}, "commands": [{"direction": "up", "steps": 2}]},
+        {"start": {"x": 1, "y": 2}, "commands": [{"direction": "east", "steps": "2"}]},
+        {"start": {"x": 1, "y": 2}, "commands": [{"direction": "east", "steps": -1}]},
+        {"start": {"x": 1, "y": 2}, "commands": [{"direction": "east", "steps": 2 ** 33}]},
+        {"start": {"x": 1, "y": 2}, "commands": "east"},
+        {"start": {"x": 2 ** 31, "y": 2}, "commands": commands},
+        {"start": {"x": 1, "y": float("inf")}, "commands": commands},
+        None,
+    ]:
+        with pytest.raises(ValueError):
+            parse_path(path)
+
+
+@pytest.mark.parametrize("parallel_threshold", [100, 0])
+def test_evaluate_paths(parallel_threshold):
+    """
+    Tests that `evaluate_paths` returns the results in the order of the paths, both in the
+    current process and in the process pool, and serves repeated paths from the cache.
+    """
+    results.results.clear()
+    square = [
+        {"direction": "east", "steps": 1},
+        {"direction": "north", "steps": 1},
+        {"direction": "west", "steps": 1},
+        {"direction": "south", "steps": 1},
+    ]
+    paths = [
+        ((10, 22), [{"direction": "east", "steps": 2}, {"direction": "north", "steps": 1}]),
+        ((1, 1), square * 100),
+        ((0, 0), []),
+    ]
+    evaluated = evaluate_paths(paths, BinarySearch, parallel_threshold)
+    assert [result for result, _, _, _ in evaluated] == [4, 4, 0]
+    assert [key for _, _, _, key in evaluated] == [path_hash(commands) for _, commands in paths]
+    assert evaluated[0][2]["algorithm"] == "BinarySearch"
+
+    # The same commands from another starting point come from the cache
+    (result, duration, stats, _), = evaluate_paths([((5, 5), square * 100)], BinarySearch, parallel_threshold)
+    assert (result, duration, stats) == (4, 0.0, {})
+
+
+@pytest.mark.parametrize("parallel_threshold", [100, 0])
+def test_evaluate_paths_deadline(parallel_threshold):
+    """Tests that `evaluate_paths` stops with `DeadlineExceeded` once the deadline has passed."""
+    results.results.clear()
+    start_point, commands = benchmark.comb(400)
+    with pytest.raises(DeadlineExceeded):
+        evaluate_paths([(start_point, commands)], BinarySearch, parallel_threshold, Deadline(-1))
@@ -0,0 +1,37 @@
+from app import algorithms, benchmark, logic
+
+
+def test_workloads():
+    """
+    Tests that every workload generates the requested number of commands, for which
+    `calculate_unique_coordinates` gives the same result as the benchmark.
+    """
+    for name, workload in benchmark.WORKLOADS.items():
+        start_point, commands = workload(100)
+        assert len(commands) == 100, name
+
+        measurement = benchmark.measure(start_point, commands, algorithms.BinarySearch, repeat=1)
+        assert measurement["result"] == logic.calculate_unique_coordinates(start_point, commands)[0]
+        assert set(measurement["phases"]) == {"build", "merge", "count"}
+        assert all(phase["peak_memory"] > 0 for phase in measurement["phases"].values())
+
+
+def test_counters():
+    """Tests that `counters` finds all concrete counters, including subclasses of subclasses."""
+    found = benchmark.counters()
+    assert found["BinarySearch"] is algorithms.BinarySearch
+    assert found["SweepLine"] is algorithms.SweepLine
+    assert found["ParallelSweepLine"] is algorithms.ParallelSweepLine
+    assert "CoordinateCounter" not in found
+
+
+def test_compare_with_baseline():
+    """Tests that `compare` flags slower and incorrect results compared to the baseline."""
+    baseline = benchmark.run(["spiral"], [40], ["BinarySearch", "SweepLine"], repeat=1, memory=False)
+    assert benchmark.compare(baseline, baseline) == []
+
+    report = {"results": [dict(result) for result in baseline["results"]]}
+    report["results"][0]["time"] = baseline["results"][0]["time"] * 2 + 1
+    report["results"][1]["result"] += 1
+    regressions = benchmark.compare(report, baseline)
+    assert len(regressions) == 2
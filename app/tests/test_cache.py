@@ -0,0 +1,34 @@
+from app import encoding
+from app.cache import ResultCache, path_hash
+
+
+def test_result_cache_evicts_least_recently_used():
+    """Tests that `ResultCache` evicts the least recently used result when full."""
+    cache = ResultCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    cache = ResultCache(0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_path_hash():
+    """
+    Tests that `path_hash` is the same for JSON commands and the binary records from any
+    starting point, but differs for other commands.
+    """
+    commands = [
+        {"direction": "east", "steps": 2},
+        {"direction": "north", "steps": 1},
+    ]
+    body = encoding.encode_path((10, 22), commands)
+    assert path_hash(commands) == path_hash(records=body[encoding.HEADER.size:])
+    assert path_hash(commands) == path_hash(records=encoding.encode_path((-5, 3), commands)[8:])
+    assert path_hash(commands) != path_hash(commands[:1])
@@ -0,0 +1,112 @@
+import random
+
+from app import logic
+from app.coverage import AxisIntervals, Coverage
+from app.sessions import WalkSession
+
+
+def test_axis_intervals_add():
+    """
+    Tests that `AxisIntervals.add` merges overlapping intervals and returns the parts
+    that were not covered yet.
+    """
+    intervals = AxisIntervals()
+    assert intervals.add(1, 10, 20) == [(10, 20)]
+    assert intervals.add(1, 30, 40) == [(30, 40)]
+    assert intervals.add(1, 15, 35) == [(21, 29)]
+    assert intervals.add(1, 0, 50) == [(0, 9), (41, 50)]
+    assert intervals.add(1, 5, 6) == []
+    assert intervals.add(-3, 5, 6) == [(5, 6)]
+    assert list(intervals) == [(-3, 5, 6), (1, 0, 50)]
+    assert len(intervals) == 2
+
+
+def test_axis_intervals_lookup():
+    """Tests that `covers` and `count_covering` find the intervals covering a value."""
+    intervals = AxisIntervals()
+    intervals.add(1, 0, 10)
+    intervals.add(2, 5, 5)
+    intervals.add(4, 20, 30)
+
+    assert intervals.covers(1, 0)
+    assert intervals.covers(2, 5)
+    assert not intervals.covers(2, 6)
+    assert not intervals.covers(3, 5)
+    assert intervals.count_covering(0, 10, 5) == 2
+    assert intervals.count_covering(2, 4, 25) == 1
+
+
+def test_count_covering_matches_positions():
+    """
+    Tests that `count_covering` matches checking every position with `covers`, while
+    intervals are merged and replaced.
+    """
+    rng = random.Random(8)
+    intervals = AxisIntervals()
+    for _ in range(300):
+        start = rng.randint(-100, 100)
+        intervals.add(rng.randint(-20, 20), start, start + rng.randint(0, 30))
+        low = rng.randint(-25, 25)
+        high, value = low + rng.randint(0, 20), rng.randint(-110, 140)
+        assert intervals.count_covering(low, high, value) == sum(
+            intervals.covers(position, value) for position in range(low, high + 1)
+        )
+
+
+def test_coverage_matches_calculate_unique_coordinates():
+    """
+    Tests that the incrementally updated total of `Coverage` matches
+    `calculate_unique_coordinates` after every command of random walks.
+    """
+    rng = random.Random(7)
+    for _ in range(10):
+        commands = [
+            {"direction": rng.choice(list(logic.DIRECTIONS)), "steps": rng.randint(0, 8)}
+            for _ in range(60)
+        ]
+        coverage = Coverage()
+        current = (0, 0)
+        for index, command in enumerate(commands):
+            current = coverage.add_move(current, logic.DIRECTIONS[command["direction"]], command["steps"])
+            expected = logic.calculate_unique_coordinates((0, 0), commands[:index + 1])[0]
+            assert coverage.total == expected
+
+        x_ranges, y_ranges = set(), set()
+        current = (0, 0)
+        for command in commands:
+            current = logic._add_to_ranges(current, command, x_ranges, y_ranges)
+        assert set(coverage.horizontal) == logic._merge_ranges(x_ranges)
+        assert set(coverage.vertical) == logic._merge_ranges(y_ranges)
+
+
+def test_session_append_in_chunks():
+    """
+    Tests that appending commands to a session in chunks results in the same count as
+    the full path, continuing from the last position, also after restoring its coverage.
+    """
+    commands = [
+        {"direction": "east", "steps": 5},
+        {"direction": "north", "steps": 1},
+        {"direction": "east", "steps": 5},
+        {"direction": "south", "steps": 2},
+        {"direction": "west", "steps": 8},
+        {"direction": "north", "steps": 1},
+        {"direction": "west", "steps": 5},
+    ]
+    session = WalkSession((1, 1))
+    session.append(commands[:3])
+    state = session.state()
+    session = WalkSession(
+        (state["x"], state["y"]), session.id, state["commands"],
+        Coverage.restore(state["horizontal"], state["vertical"], state["result"]),
+    )
+    session.append(commands[3:])
+
+    assert session.to_dict() == {
+        "id": session.id,
+        "position": {"x": -2, "y": 1},
+        "commands": 7,
+        "result": 25,
+    }
+    assert session.coverage.contains(1, 1)
+    assert not session.coverage.contains(1, 3)
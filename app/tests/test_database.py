@@ -0,0 +1,66 @@
+import os
+import re
+from threading import Thread
+
+from flask import Flask
+from sqlalchemy import event
+
+from app.database import ExecutionWriter, add_all_to_db, add_to_db, db
+from app.models import Execution
+
+UPGRADE_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations", "upgrade.sql")
+
+# Columns of the initial `executions` table, which the upgrade script starts from
+INITIAL_EXECUTION_COLUMNS = {"id", "timestamp", "commands", "result", "duration"}
+
+
+def test_writer_survives_failed_batch():
+    """Tests that `drain` returns and the writer keeps writing after a batch failed unexpectedly."""
+    writer = ExecutionWriter(None, flush_interval=0)
+    for _ in range(2):
+
+        # Entries without a table fail outside of SQLAlchemy
+        assert writer.submit(object())
+        drain = Thread(target=writer.drain, daemon=True)
+        drain.start()
+        drain.join(timeout=5)
+        assert not drain.is_alive()
+    assert writer.thread.is_alive()
+
+
+def test_add_to_db_without_select():
+    """Tests that the stored entries are serialised without selecting them again after the commit."""
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        statements = []
+        event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        stored = add_all_to_db([Execution(commands=index, result=index, duration=0.1) for index in range(3)])
+        stored.append(add_to_db(Execution(commands=3, result=3, duration=0.1)))
+
+        assert [entry["id"] for entry in stored] == [1, 2, 3, 4]
+        assert all(entry["timestamp"] for entry in stored)
+        assert not [statement for statement in statements if statement.lstrip().upper().startswith("SELECT")]
+
+
+def test_upgrade_script_covers_models():
+    """Tests that the upgrade script adds every table, column and index of the models."""
+    with open(UPGRADE_SCRIPT) as f:
+        script = f.read()
+
+    for table in db.metadata.sorted_tables:
+        columns = {column.name for column in table.columns}
+        if table.name == "executions":
+            added = set(re.findall(r"ALTER TABLE executions ADD COLUMN IF NOT EXISTS (\w+) ", script))
+            assert added == columns - INITIAL_EXECUTION_COLUMNS
+        else:
+            created = re.search(rf"CREATE TABLE IF NOT EXISTS {table.name} \((.*?)\n\);", script, re.DOTALL)
+            assert created, table.name
+            lines = [line.strip() for line in created.group(1).splitlines() if line.strip()]
+            assert {line.split()[0].strip('"') for line in lines if not line.startswith("PRIMARY KEY")} == columns
+        for index in table.indexes:
+            indexed = ", ".join(column.name for column in index.columns)
+            assert f"CREATE INDEX IF NOT EXISTS {index.name} ON {table.name} ({indexed});" in script
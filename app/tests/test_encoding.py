@@ -0,0 +1,56 @@
+import pytest
+
+from app import encoding, logic
+
+
+def test_encode_and_decode_path():
+    """
+    Tests that `decode_path` returns the starting coordinate and the moves of a path
+    encoded with `encode_path`, using 5 bytes per command.
+    """
+    commands = [
+        {"direction": "east", "steps": 99999},
+        {"direction": "north", "steps": 0},
+        {"direction": "south", "steps": 3},
+        {"direction": "west", "steps": 1},
+    ]
+    body = encoding.encode_path((-100000, 42), commands)
+    assert len(body) == 8 + 5 * len(commands)
+    assert encoding.command_count(body) == len(commands)
+
+    start_point, moves = encoding.decode_path(body)
+    assert start_point == (-100000, 42)
+    assert list(moves) == [
+        (logic.DIRECTIONS[command["direction"]], command["steps"]) for command in commands
+    ]
+
+
+def test_decoded_path_unique_coordinates():
+    """
+    Tests that a decoded path results in the same number of unique coordinates as the
+    original commands.
+    """
+    commands = [
+        {"direction": "east", "steps": 5},
+        {"direction": "north", "steps": 1},
+        {"direction": "east", "steps": 5},
+        {"direction": "south", "steps": 2},
+        {"direction": "west", "steps": 8},
+        {"direction": "north", "steps": 1},
+        {"direction": "west", "steps": 5},
+    ]
+    start_point, moves = encoding.decode_path(encoding.encode_path((1, 1), commands))
+    assert logic.calculate_unique_coordinates_from_moves(start_point, moves)[0] == 25
+
+
+def test_decode_invalid_path():
+    """Tests that `decode_path` rejects bodies with an invalid length or direction code."""
+    body = encoding.encode_path((0, 0), [{"direction": "east", "steps": 1}])
+    with pytest.raises(ValueError):
+        encoding.decode_path(body[:-1])
+    with pytest.raises(ValueError):
+        encoding.decode_path(b"")
+
+    _, moves = encoding.decode_path(body[:8] + bytes([9]) + body[9:])
+    with pytest.raises(IndexError):
+        list(moves)
@@ -0,0 +1,42 @@
+import random
+
+from app import logic
+from app.fleet import FleetCoverage
+
+
+def _summary(start_point, commands):
+    """Merged lines of a path, like `load_segments` returns them for a stored path."""
+    _, _, stats = logic.calculate_path(start_point, commands, stats={"ranges": None})
+    return stats["ranges"]
+
+
+def test_fleet_coverage_matches_concatenated_paths():
+    """
+    Tests that merging the summaries of paths one at a time counts the same coordinates as
+    calculating the lines of all paths at once, and that members are only merged once.
+    """
+    rng = random.Random(5)
+    directions = list(logic.DIRECTIONS)
+    paths = [
+        ((rng.randint(-20, 20), rng.randint(-20, 20)),
+         [{"direction": rng.choice(directions), "steps": rng.randint(1, 15)} for _ in range(20)])
+        for _ in range(6)
+    ]
+
+    coverage = FleetCoverage()
+    assert coverage.result == 0
+    x_ranges, y_ranges = set(), set()
+    for execution_id, (start_point, commands) in enumerate(paths):
+        coverage = coverage.merge({execution_id: _summary(start_point, commands)})
+        summary = _summary(start_point, commands)
+        x_ranges.update(summary[0])
+        y_ranges.update(summary[1])
+        assert coverage.result == logic.BinarySearch(
+            logic._merge_ranges(x_ranges), logic._merge_ranges(y_ranges),
+        ).unique_coordinates()
+
+    assert coverage.members == frozenset(range(len(paths)))
+    assert coverage.merge({0: _summary(*paths[1])}).result == coverage.result
+    assert FleetCoverage().merge({
+        execution_id: _summary(*path) for execution_id, path in enumerate(paths)
+    }).result == coverage.result
@@ -0,0 +1,86 @@
+from threading import Event
+
+import pytest
+from flask import Flask
+
+from app.database import db
+from app.jobs import JobQueueFull, JobStore
+from app.models import Execution, Job
+
+
+@pytest.fixture
+def flask_app():
+    """Fixture of an application with an in-memory database for the jobs."""
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+
+
+def _store_execution(result):
+    """Work of a job, which stores an execution like the async enter-path requests."""
+    execution = Execution(commands=2, result=result, duration=0.1)
+    db.session.add(execution)
+    db.session.commit()
+    return execution.to_dict()
+
+
+def test_job_store(flask_app):
+    """Tests that jobs run in the background and return their stored execution from the database."""
+    store = JobStore(flask_app, workers=1)
+    started, release = Event(), Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+        return _store_execution(4)
+
+    job = store.submit(work)
+    assert job["status"] == Job.QUEUED
+    started.wait(5)
+    assert store.get(job["id"])["status"] == Job.RUNNING
+
+    release.set()
+    store.executor.shutdown(wait=True)
+    db.session.remove()
+    done = store.get(job["id"])
+    assert (done["status"], done["error"], done["result"]["result"]) == (Job.DONE, None, 4)
+
+    # Another worker process sees the same job through the database
+    assert JobStore(flask_app).get(job["id"]) == done
+    assert store.get("unknown") is None
+
+
+def test_job_failed(flask_app):
+    """Tests that a job fails when the work raises an error or returns nothing."""
+    store = JobStore(flask_app, workers=1)
+    failed = store.submit(lambda: 1 / 0)
+    empty = store.submit(lambda: None)
+    store.executor.shutdown(wait=True)
+
+    assert store.get(failed["id"]) == {"id": failed["id"], "status": Job.FAILED, "result": None, "error": "division by zero"}
+    assert store.get(empty["id"])["error"] == "request failed"
+
+
+def test_job_queue_full(flask_app):
+    """Tests that jobs beyond `max_queued` unfinished jobs are rejected until one finishes."""
+    store = JobStore(flask_app, workers=1, max_queued=1)
+    release = Event()
+    store.submit(lambda: _store_execution(1) if release.wait(5) else None)
+    with pytest.raises(JobQueueFull):
+        store.submit(lambda: None)
+
+    release.set()
+    store.executor.shutdown(wait=True)
+    store.executor = None
+    assert store.submit(lambda: None) is not None
+
+
+def test_job_expires(flask_app):
+    """Tests that finished jobs expire after the ttl."""
+    store = JobStore(flask_app, workers=1, ttl=-1)
+    job = store.submit(lambda: _store_execution(1))
+    store.executor.shutdown(wait=True)
+    assert store.get(job["id"]) is None
@@ -0,0 +1,54 @@
+import tempfile
+
+import pytest
+
+from app import loadtest
+
+
+def test_payloads():
+    """Tests that the payloads stay within their size and the requests follow the mix."""
+    requests = loadtest.generate({"tiny": 1, "maximum": 0}, 10)
+    assert {name for name, _ in requests} == {"tiny"}
+    assert len(loadtest.maximum(loadtest.random.Random(1))) == 10000
+    assert all(command["steps"] < 100000 for command in loadtest.maximum(loadtest.random.Random(1)))
+
+    assert loadtest.parse_mix(["tiny=3", "typical=1"]) == {"tiny": 3, "typical": 1}
+    with pytest.raises(ValueError):
+        loadtest.parse_mix(["huge=1"])
+
+
+def test_server_timing_and_percentiles():
+    """Tests parsing the Server-Timing header and the percentiles by rank."""
+    assert loadtest.server_timing("parse;dur=1.500, persist;dur=2.000") == {"parse": 0.0015, "persist": 0.002}
+    assert loadtest.server_timing(None) == {}
+    assert loadtest.percentiles(list(range(101))) == {"p50": 50, "p95": 95, "p99": 99}
+    assert loadtest.percentiles([]) == {"p50": None, "p95": None, "p99": None}
+
+
+def test_summarize_accepted():
+    """Tests that queued requests are counted as accepted, apart from the calculated ones and the errors."""
+    responses = [
+        ("tiny", 200, 0.2, {"count": 0.1, "persist": 0.05}),
+        ("tiny", 202, 0.01, {}),
+        ("tiny", 500, 0.01, {}),
+        ("tiny", None, 0.01, {}),
+    ]
+    summary = loadtest.summarize(responses, elapsed=1.0)
+    assert (summary["requests"], summary["errors"], summary["accepted"]) == (4, 2, 1)
+    assert summary["throughput"] == 1.0
+    assert summary["latency"]["p50"] == 0.2
+    assert summary["persist"]["p50"] == 0.05
+
+
+def test_local_load_test():
+    """Tests a short load test against a local gunicorn server with the SQLite stand-in."""
+    requests = loadtest.generate({"tiny": 3, "typical": 1}, 20)
+    with tempfile.TemporaryDirectory() as database_dir, loadtest.local_server(database_dir, workers=2) as url:
+        report = loadtest.run(url, requests, concurrency=2)
+
+    assert report["summary"]["requests"] == 20
+    assert report["summary"]["errors"] == report["summary"]["accepted"] == 0
+    assert report["summary"]["throughput"] > 0
+    assert set(report["payloads"]) == {"tiny", "typical"}
+    assert report["summary"]["persist"]["p50"] > 0
+    assert report["summary"]["latency"]["p99"] >= report["summary"]["compute"]["p99"]
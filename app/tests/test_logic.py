@@ -1,4 +1,8 @@
-from app import algorithms, logic
+import random
+from functools import partial
+
+from app import algorithms, logic, workers
+from app.config import Config
 
 
 def test_add_to_ranges_east():
@@ -65,6 +69,39 @@ def test_add_to_ranges_south():
     assert y_ranges == {(12, 20, 25), (-9987, -3431, 25)}
 
 
+def test_range_builder():
+    """
+    Tests that `RangeBuilder` joins consecutive moves, reversals and covered lines, and
+    that the merged ranges are the same as when adding a tuple per move.
+    """
+    builder = logic.RangeBuilder((0, 0))
+    for direction, steps in [("east", 2), ("east", 3), ("west", 4), ("north", 2), ("south", 2), ("west", 1)]:
+        builder.add_move(logic.DIRECTIONS[direction], steps)
+    assert tuple(map(set, builder.ranges())) == ({(0, 0, 5)}, {(1, 0, 2)})
+
+    builder = logic.RangeBuilder((1, 1))
+    for direction in ["east", "north", "west", "south"] * 100:
+        builder.add_move(logic.DIRECTIONS[direction], 1)
+    assert tuple(map(set, builder.ranges())) == ({(1, 1, 2), (2, 1, 2)}, {(1, 1, 2), (2, 1, 2)})
+
+    rng = random.Random(7)
+    for _ in range(50):
+        start = (rng.randint(-5, 5), rng.randint(-5, 5))
+        commands = [
+            {"direction": rng.choice(list(logic.DIRECTIONS)), "steps": rng.randint(0, 6)}
+            for _ in range(rng.randint(0, 40))
+        ]
+        current, x_ranges, y_ranges = start, set(), set()
+        builder = logic.RangeBuilder(start)
+        for command in commands:
+            current = logic._add_to_ranges(current, command, x_ranges, y_ranges)
+            builder.add_move(logic.DIRECTIONS[command["direction"]], command["steps"])
+        built_x, built_y = builder.ranges()
+        assert builder.current == current
+        assert set(built_x.merged()) == logic._merge_ranges(x_ranges)
+        assert set(built_y.merged()) == logic._merge_ranges(y_ranges)
+
+
 def test_merge_ranges_without_overlap():
     """
     Tests that `_merge_ranges` correctly leaves ranges in places that do no need to
@@ -98,12 +135,15 @@ def test_merge_ranges_with_overlap():
 def test_calculate_unique_coordinates():
     """
     Tests that `calculate_unique_coordinates` correctly returns 4 coordinates when
-    taking 2 steps east and 1 step north and using all 3 algorithms.
+    taking 2 steps east and 1 step north and using all algorithms.
     """
     counting_algorithms = [
         algorithms.BinarySearch,
         algorithms.EarlyIntersectionFiltering,
         algorithms.SimpleIntersection,
+        algorithms.SweepLine,
+        algorithms.Bitmap,
+        algorithms.AutoSelect,
     ]
     start = (1, 1)
     commands = [
@@ -120,12 +160,15 @@ def test_calculate_unique_coordinates_overlapping():
     """
     Tests that `calculate_unique_coordinates` correctly returns the number of unique
     coordinates when there is an overlap in the vertices as it makes a small circle and
-    using all 3 algorithms.
+    using all algorithms.
     """
     counting_algorithms = [
         algorithms.BinarySearch,
         algorithms.EarlyIntersectionFiltering,
         algorithms.SimpleIntersection,
+        algorithms.SweepLine,
+        algorithms.Bitmap,
+        algorithms.AutoSelect,
     ]
     start = (1, 1)
     commands = [
@@ -144,12 +187,15 @@ def test_calculate_unique_coordinates_in_circles():
     """
     Tests that `calculate_unique_coordinates` correctly returns the number of unique
     coordinates when there are a lot of overlaps in the vertices as it makes 100
-    circles in this test, using all 3 algorithms.
+    circles in this test, using all algorithms.
     """
     counting_algorithms = [
         algorithms.BinarySearch,
         algorithms.EarlyIntersectionFiltering,
         algorithms.SimpleIntersection,
+        algorithms.SweepLine,
+        algorithms.Bitmap,
+        algorithms.AutoSelect,
     ]
     start = (1, 1)
     commands = [
@@ -168,12 +214,15 @@ def test_calculate_unique_coordinates_complicated_movement():
     """
     Tests that `calculate_unique_coordinates` correctly returns the number of unique
     coordinates when there are a lot of overlaps in the vertices as it makes 100
-    circles in this test, using all 3 algorithms.
+    circles in this test, using all algorithms.
     """
     counting_algorithms = [
         algorithms.BinarySearch,
         algorithms.EarlyIntersectionFiltering,
         algorithms.SimpleIntersection,
+        algorithms.SweepLine,
+        algorithms.Bitmap,
+        algorithms.AutoSelect,
     ]
     start = (1, 1)
     commands = [
@@ -194,7 +243,7 @@ def test_calculate_unique_coordinates_complicated_movement():
 def test_calculate_unique_coordinates_maximum_input():
     """
     Tests that `calculate_unique_coordinates` is performant for large inputs, ensuring that
-    it does not take longer than 10s to finish, using all 3 algorithms.
+    it does not take longer than 10s to finish, using all algorithms.
 
     NOTE: takes approximately 20s to run, since it takes 5 to 10s per algorithm
     """
@@ -202,6 +251,9 @@ def test_calculate_unique_coordinates_maximum_input():
         algorithms.BinarySearch,
         algorithms.EarlyIntersectionFiltering,
         algorithms.SimpleIntersection,
+        algorithms.SweepLine,
+        algorithms.Bitmap,
+        algorithms.AutoSelect,
     ]
     start = (-100000, -100000)
     commands = [
@@ -216,3 +268,160 @@ def test_calculate_unique_coordinates_maximum_input():
         unique_coordinates, duration = logic.calculate_unique_coordinates(start, commands, algorithm)
         assert unique_coordinates == expected
         assert duration < 10
+
+
+def test_fenwick_tree_prefix_sums():
+    """
+    Tests that `FenwickTree` correctly keeps track of prefix sums when adding and
+    removing values.
+    """
+    tree = algorithms.FenwickTree(5)
+    tree.add(0, 1)
+    tree.add(3, 2)
+    tree.add(4, 1)
+    assert tree.prefix_sum(-1) == 0
+    assert tree.prefix_sum(0) == 1
+    assert tree.prefix_sum(2) == 1
+    assert tree.prefix_sum(4) == 4
+
+    tree.add(3, -2)
+    assert tree.prefix_sum(4) == 2
+
+
+def test_calculate_unique_coordinates_comb():
+    """
+    Tests that `calculate_unique_coordinates` correctly returns the number of unique
+    coordinates for a comb-shaped path, where every vertical line crosses many horizontal
+    lines, by comparing it with the coordinates visited step by step.
+    """
+    start = (0, 0)
+    commands = [{"direction": "east", "steps": 40}]
+    for _ in range(20):
+        commands += [
+            {"direction": "north", "steps": 3},
+            {"direction": "west", "steps": 40},
+            {"direction": "north", "steps": 3},
+            {"direction": "east", "steps": 40},
+        ]
+    commands += [
+        {"direction": "south", "steps": 120},
+        {"direction": "west", "steps": 15},
+        {"direction": "north", "steps": 130},
+    ]
+
+    visited = {start}
+    x, y = start
+    for command in commands:
+        delta_x, delta_y = logic.DIRECTIONS[command["direction"]]
+        for _ in range(command["steps"]):
+            x, y = x + delta_x, y + delta_y
+            visited.add((x, y))
+
+    for algorithm in [algorithms.BinarySearch, algorithms.SweepLine, algorithms.Bitmap]:
+        assert logic.calculate_unique_coordinates(start, commands, algorithm)[0] == len(visited)
+
+
+def test_calculate_unique_coordinates_parallel():
+    """
+    Tests that `ParallelSweepLine` returns the same number of unique coordinates when
+    counting the intersections in multiple worker processes.
+    """
+    algorithm = partial(algorithms.ParallelSweepLine, workers=3, threshold=0)
+    start = (-100000, -100000)
+    commands = [
+        {"direction": "east", "steps": 99999},
+        {"direction": "north", "steps": 99999},
+        {"direction": "west", "steps": 99998},
+        {"direction": "south", "steps": 99998},
+    ] * 2500
+    assert logic.calculate_unique_coordinates(start, commands, algorithm)[0] == 993737501
+
+    commands = [
+        {"direction": "east", "steps": 1},
+        {"direction": "north", "steps": 1},
+        {"direction": "west", "steps": 1},
+        {"direction": "south", "steps": 1},
+    ] * 100
+    assert logic.calculate_unique_coordinates((1, 1), commands, algorithm)[0] == 4
+
+    # Paths without vertical lines have no bands to count
+    assert logic.calculate_unique_coordinates((1, 1), [{"direction": "east", "steps": 5}], algorithm)[0] == 6
+
+
+def test_default_workers(monkeypatch):
+    """
+    Tests that the pools of all gunicorn workers together start one process per core,
+    unless the number of processes is configured.
+    """
+    monkeypatch.setattr(workers.os, "cpu_count", lambda: 8)
+    monkeypatch.setattr(Config, "PARALLEL_WORKERS", 0)
+    for server_workers, expected in [(0, 1), (1, 8), (2, 4), (3, 2), (16, 1)]:
+        monkeypatch.setattr(Config, "SERVER_WORKERS", server_workers)
+        assert workers.default_workers() == expected
+
+    monkeypatch.setattr(Config, "PARALLEL_WORKERS", 3)
+    assert workers.default_workers() == 3
+
+
+def test_calculate_unique_coordinates_stats():
+    """
+    Tests that `calculate_unique_coordinates` fills the duration per phase in `stats`,
+    which add up to at most the total duration.
+    """
+    stats = {}
+    commands = [
+        {"direction": "east", "steps": 2},
+        {"direction": "north", "steps": 1},
+    ]
+    _, duration = logic.calculate_unique_coordinates((1, 1), commands, stats=stats)
+    assert set(stats["phases"]) == {"build", "merge", "count"}
+    assert sum(stats["phases"].values()) <= duration
+
+
+def test_auto_select():
+    """
+    Tests that `AutoSelect` picks `BinarySearch` for lines that barely overlap and
+    `SweepLine` when every vertical line crosses every horizontal line, and records it.
+    """
+    commands = [{"direction": "east", "steps": 2}, {"direction": "north", "steps": 1}]
+    stats = {}
+    assert logic.calculate_unique_coordinates((0, 0), commands, algorithms.AutoSelect, stats)[0] == 4
+    assert stats["algorithm"] == "BinarySearch"
+
+    x_ranges = {(y_pos, 0, 1000) for y_pos in range(0, 1000, 2)}
+    y_ranges = {(x_pos, 0, 1000) for x_pos in range(1, 1000, 2)}
+    counter = algorithms.AutoSelect(x_ranges, y_ranges)
+    assert counter.unique_coordinates() == algorithms.BinarySearch(x_ranges, y_ranges).unique_coordinates()
+    assert counter.selected is algorithms.SweepLine
+
+
+def test_bitmap_fallback():
+    """
+    Tests that `Bitmap` counts inputs with a bounding box above `max_area` with the
+    fallback, and returns 0 without lines.
+    """
+    x_ranges = {(0, 0, 10), (5, -3, 3)}
+    y_ranges = {(0, -2, 7), (10, 0, 5)}
+    expected = algorithms.BinarySearch(x_ranges, y_ranges).unique_coordinates()
+    assert algorithms.Bitmap(x_ranges, y_ranges).unique_coordinates() == expected
+
+    counted = []
+
+    class Fallback(algorithms.BinarySearch):
+        def unique_coordinates(self):
+            counted.append(True)
+            return super().unique_coordinates()
+
+    counter = algorithms.Bitmap(x_ranges, y_ranges, max_area=10, fallback=Fallback)
+    assert counter.unique_coordinates() == expected
+    assert counted == [True]
+    assert algorithms.Bitmap(set(), set()).unique_coordinates() == 0
+
+
+def test_auto_select_bitmap():
+    """Tests that `AutoSelect` picks `Bitmap` for many lines in a small bounding box."""
+    x_ranges = {(y_pos, 0, 99) for y_pos in range(100)}
+    y_ranges = {(x_pos, 0, 99) for x_pos in range(100)}
+    counter = algorithms.AutoSelect(x_ranges, y_ranges)
+    assert counter.unique_coordinates() == 10000
+    assert counter.selected is algorithms.Bitmap
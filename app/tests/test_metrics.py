@@ -0,0 +1,83 @@
+import json
+import os
+
+from app import metrics
+from app.metrics import REGISTRY, Counter, Histogram, render
+
+
+def test_counter_render():
+    """Tests that `Counter` renders a value per combination of labels."""
+    counter = Counter("test_requests_total", "Test counter", ["status"])
+    REGISTRY.remove(counter)
+    counter.inc(status=200)
+    counter.inc(2, status=200)
+    counter.inc(status=500)
+
+    assert counter.render() == [
+        "# HELP test_requests_total Test counter",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{status="200"} 3',
+        'test_requests_total{status="500"} 1',
+    ]
+
+
+def test_histogram_render():
+    """Tests that `Histogram` renders cumulative buckets, the sum and the count."""
+    histogram = Histogram("test_seconds", "Test histogram", buckets=(0.1, 1))
+    REGISTRY.remove(histogram)
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(5)
+
+    assert histogram.render() == [
+        "# HELP test_seconds Test histogram",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{le="0.1"} 2',
+        'test_seconds_bucket{le="1"} 2',
+        'test_seconds_bucket{le="+Inf"} 3',
+        "test_seconds_sum 5.15",
+        "test_seconds_count 3",
+    ]
+
+
+def test_render_registry():
+    """Tests that `render` includes the metrics of the enter-path endpoint."""
+    rendered = render()
+    assert "# TYPE enter_path_requests_total counter" in rendered
+    assert "# TYPE enter_path_phase_seconds histogram" in rendered
+
+
+def test_render_shared(tmp_path, monkeypatch):
+    """
+    Tests that `render` adds up the snapshots that other worker processes shared, without
+    counting the snapshot of this process twice.
+    """
+    monkeypatch.setattr(metrics, "_exporter_pid", os.getpid())
+    monkeypatch.setattr(metrics, "_directory", None)
+    metrics.share(str(tmp_path))
+
+    counter = Counter("test_shared_total", "Test counter", ["status"])
+    histogram = Histogram("test_shared_seconds", "Test histogram", buckets=(1,))
+    try:
+        counter.inc(status=200)
+        histogram.observe(0.5)
+        metrics._export()
+        with open(tmp_path / "metrics-1.json", "w") as f:
+            json.dump({
+                "test_shared_total": [[["200"], 2], [["500"], 1]],
+                "test_shared_seconds": [[[], [[0, 1], 2.0]]],
+                "unknown_total": [[[], 1]],
+            }, f)
+
+        rendered = render()
+        assert 'test_shared_total{status="200"} 3' in rendered
+        assert 'test_shared_total{status="500"} 1' in rendered
+        assert 'test_shared_seconds_bucket{le="1"} 1' in rendered
+        assert "test_shared_seconds_count 2" in rendered
+        assert "test_shared_seconds_sum 2.5" in rendered
+
+        metrics.clear(str(tmp_path))
+        assert os.listdir(tmp_path) == []
+    finally:
+        REGISTRY.remove(counter)
+        REGISTRY.remove(histogram)
@@ -1,7 +1,13 @@
 import pytest
+from datetime import timedelta
 from flask import json
-from app.main import app, db
+from app import main
+from app.cache import path_hash, results
+from app.config import Config
+from app.encoding import CONTENT_TYPE, encode_path
+from app.main import app, create_app, db
 from app.models import Execution
+from app.retention import compact
 
 
 @pytest.fixture
@@ -151,3 +157,453 @@ def test_running_maximum_commands(client):
         assert execution.result == data["result"]
         assert execution.result == 993737501
         assert execution.duration < 10
+
+
+def test_streaming_execution(client):
+    """
+    Test that the streaming mode parses the body incrementally and returns the same
+    result as the regular mode, even when 'start' is sent after the commands.
+    """
+    body = json.dumps({
+        "commands": [
+            {"direction": "east", "steps": 1},
+            {"direction": "north", "steps": 1},
+            {"direction": "west", "steps": 1},
+            {"direction": "south", "steps": 1},
+        ] * 100,
+        "start": {"x": 1, "y": 1},
+    })
+    response = client.post(
+        "/tibber-developer-test/enter-path?stream=true",
+        data=body,
+        content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json["commands"] == 400
+    assert response.json["result"] == 4
+
+    # Only true values enable the streaming mode, which does not keep the starting point
+    response = client.post(
+        "/tibber-developer-test/enter-path?stream=false&sync=no",
+        data=body,
+        content_type="application/json"
+    )
+    assert response.status_code == 200
+    assert response.json["start"] == {"x": 1, "y": 1}
+
+    # Invalid bodies are rejected instead of failing with an error
+    response = client.post(
+        "/tibber-developer-test/enter-path?stream=true",
+        data='{"commands": [{"direction": "east"',
+        content_type="application/json"
+    )
+    assert response.status_code == 400
+
+    # The starting point is validated once the body is parsed, like in the regular mode
+    for start in (None, {"x": 1}, {"x": "a", "y": 1}, {"x": 2 ** 31, "y": 0}):
+        path = {"commands": [{"direction": "east", "steps": 1}]}
+        if start is not None:
+            path["start"] = start
+        assert client.post("/tibber-developer-test/enter-path?stream=true", json=path).status_code == 400
+
+
+def test_invalid_steps(client):
+    """Test that steps outside the range of the binary records are rejected in all JSON modes."""
+    for steps in (-1, 2 ** 33, 2 ** 64):
+        path = {"start": {"x": 0, "y": 0}, "commands": [{"direction": "east", "steps": steps}]}
+        for url in (
+            "/tibber-developer-test/enter-path",
+            "/tibber-developer-test/enter-path?async=true",
+            "/tibber-developer-test/enter-path?stream=true",
+        ):
+            assert client.post(url, json=path).status_code == 400
+        response = client.post("/tibber-developer-test/enter-paths", json={"paths": [path]})
+        assert response.json["results"] == [{"error": "invalid path"}]
+
+
+def test_binary_execution(client):
+    """Test that paths in the binary payload format return the same result."""
+    body = encode_path((10, 22), [
+        {"direction": "east", "steps": 2},
+        {"direction": "north", "steps": 1},
+    ])
+    response = client.post("/tibber-developer-test/enter-path", data=body, content_type=CONTENT_TYPE)
+    assert response.status_code == 200
+    assert response.json["commands"] == 2
+    assert response.json["result"] == 4
+
+    # Bodies with an invalid length are rejected instead of failing with an error
+    response = client.post("/tibber-developer-test/enter-path", data=body[:-1], content_type=CONTENT_TYPE)
+    assert response.status_code == 400
+
+
+def test_session_execution(client):
+    """Test that a session can be created, extended with commands and fetched."""
+    response = client.post("/tibber-developer-test/sessions", json={
+        "start": {"x": 10, "y": 22},
+        "commands": [{"direction": "east", "steps": 2}],
+    })
+    assert response.status_code == 201
+    session_id = response.json["id"]
+    assert response.json["result"] == 3
+
+    response = client.post(
+        f"/tibber-developer-test/sessions/{session_id}/commands",
+        json={"commands": [{"direction": "north", "steps": 1}]}
+    )
+    assert response.status_code == 200
+    assert response.json["result"] == 4
+
+    response = client.get(f"/tibber-developer-test/sessions/{session_id}")
+    assert response.json == {
+        "id": session_id,
+        "position": {"x": 12, "y": 23},
+        "commands": 2,
+        "result": 4,
+    }
+
+    response = client.get("/tibber-developer-test/sessions/unknown")
+    assert response.status_code == 404
+
+    # Invalid commands are rejected without changing the session
+    for url, body in [
+        (f"/tibber-developer-test/sessions/{session_id}/commands", {"commands": [{"direction": "up", "steps": 1}]}),
+        (f"/tibber-developer-test/sessions/{session_id}/commands", {"commands": "north"}),
+        ("/tibber-developer-test/sessions", {"start": {"x": 0}}),
+        ("/tibber-developer-test/sessions", {"start": {"x": 0, "y": 0}, "commands": [{"direction": "north"}]}),
+    ]:
+        assert client.post(url, json=body).status_code == 400
+    assert client.get(f"/tibber-developer-test/sessions/{session_id}").json["commands"] == 2
+
+    # Sessions walk at most `sessions.max_commands` commands in total
+    store = app.extensions["sessions"]
+    store.max_commands = 2
+    try:
+        response = client.post(
+            f"/tibber-developer-test/sessions/{session_id}/commands", json={"commands": [{"direction": "north", "steps": 1}]},
+        )
+        assert response.status_code == 413
+    finally:
+        store.max_commands = app.config["SESSIONS_MAX_COMMANDS"]
+
+
+def test_cached_execution(client):
+    """
+    Test that the same commands from another starting point are served from the cache
+    and stored with the same path hash.
+    """
+    commands = [
+        {"direction": "east", "steps": 5},
+        {"direction": "north", "steps": 1},
+        {"direction": "east", "steps": 5},
+        {"direction": "south", "steps": 2},
+    ]
+    first = _get_response_data(client, {"start": {"x": 1, "y": 1}, "commands": commands})
+    assert results.get(path_hash(commands)) == first["result"]
+
+    second = _get_response_data(client, {"start": {"x": -40, "y": 7}, "commands": commands})
+    assert second["result"] == first["result"]
+
+    with app.app_context():
+        first_execution = Execution.query.session.get(Execution, first["id"])
+        second_execution = Execution.query.session.get(Execution, second["id"])
+        assert first_execution.path_hash == second_execution.path_hash == path_hash(commands)
+
+
+def test_write_behind_execution(client):
+    """
+    Test that with write-behind enabled the execution is returned before it is stored,
+    and that `?sync=true` still returns the stored execution.
+    """
+    payload = {
+        "start": {"x": 10, "y": 22},
+        "commands": [
+            {"direction": "east", "steps": 2},
+            {"direction": "north", "steps": 1},
+        ]
+    }
+    app.config["WRITE_BEHIND"] = True
+    try:
+        response = client.post("/tibber-developer-test/enter-path", json=payload)
+        assert response.status_code == 202
+        assert response.json["result"] == 4
+        assert "id" not in response.json
+
+        response = client.post("/tibber-developer-test/enter-path?sync=true", json=payload)
+        assert response.status_code == 200
+        assert "id" in response.json
+
+    finally:
+        app.config["WRITE_BEHIND"] = False
+
+    # Both executions are in the database once the queue is written
+    app.extensions["execution_writer"].drain()
+    with app.app_context():
+        assert Execution.query.filter_by(result=4).count() == 2
+
+
+def test_create_app():
+    """Test that the application factory creates independent apps with all routes."""
+    other_app = create_app()
+    assert other_app is not app
+    assert other_app.extensions["execution_writer"] is not app.extensions["execution_writer"]
+    with other_app.test_client() as other_client:
+        assert other_client.get("/health").json == {"status": "ok"}
+
+
+def test_metrics(client):
+    """Test that the phases of a request show up in the Server-Timing header and metrics."""
+    response = client.post("/tibber-developer-test/enter-path", json={
+        "start": {"x": 0, "y": 0},
+        "commands": [{"direction": "north", "steps": 3}, {"direction": "east", "steps": 2}],
+    })
+    assert response.status_code == 200
+    phases = [timing.split(";")[0] for timing in response.headers["Server-Timing"].split(", ")]
+    assert set(phases) <= {"parse", "build", "merge", "count", "persist"}
+    assert "parse" in phases and "persist" in phases
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert 'enter_path_requests_total{mode="json",status="200"}' in response.text
+    assert 'enter_path_phase_seconds_count{phase="persist"}' in response.text
+
+
+def test_algorithm(client):
+    """Test that a counter can be forced by name and is stored with the execution."""
+    results.results.clear()
+    payload = {"start": {"x": 0, "y": 0}, "commands": [{"direction": "north", "steps": 3}]}
+    response = client.post("/tibber-developer-test/enter-path?algorithm=SweepLine", json=payload)
+    assert response.status_code == 200
+    assert response.json["result"] == 4
+    assert response.json["algorithm"] == "SweepLine"
+
+    response = client.post("/tibber-developer-test/enter-path?algorithm=Unknown", json=payload)
+    assert response.status_code == 400
+
+
+def test_batch_execution(client):
+    """Test that a batch of paths is stored in one go, with an error for invalid paths."""
+    response = client.post("/tibber-developer-test/enter-paths", json={"paths": [
+        {"start": {"x": 10, "y": 22}, "commands": [{"direction": "east", "steps": 2}, {"direction": "north", "steps": 1}]},
+        {"start": {"x": 0, "y": 0}, "commands": [{"direction": "up", "steps": 1}]},
+        {"start": {"x": 0, "y": 0}, "commands": [{"direction": "north", "steps": 3}]},
+    ]})
+    assert response.status_code == 200
+    first, invalid, last = response.json["results"]
+    assert (first["commands"], first["result"]) == (2, 4)
+    assert invalid == {"error": "invalid path"}
+    assert (last["commands"], last["result"]) == (1, 4)
+
+    with app.app_context():
+        assert Execution.query.count() == 2
+
+    response = client.post("/tibber-developer-test/enter-paths", json={"paths": "none"})
+    assert response.status_code == 400
+
+
+def test_async_execution(client):
+    """Test that an async path returns a job, which is polled until the execution is stored."""
+    results.results.clear()
+    response = client.post("/tibber-developer-test/enter-path?async=true", json={
+        "start": {"x": 10, "y": 22},
+        "commands": [{"direction": "east", "steps": 2}, {"direction": "north", "steps": 1}],
+    })
+    assert response.status_code == 202
+    location = response.headers["Location"]
+    assert location == f"/tibber-developer-test/jobs/{response.json['id']}"
+
+    jobs = app.extensions["jobs"]
+    jobs.executor.shutdown(wait=True)
+    jobs.executor = None
+    response = client.get(location)
+    assert response.json["status"] == "done"
+    assert response.json["result"]["result"] == 4
+
+    with app.app_context():
+        assert Execution.query.session.get(Execution, response.json["result"]["id"]) is not None
+
+    assert client.get("/tibber-developer-test/jobs/unknown").status_code == 404
+
+    # Paths beyond the unfinished jobs of this process are rejected
+    jobs.unfinished = jobs.max_queued
+    try:
+        response = client.post("/tibber-developer-test/enter-path?async=true", json={
+            "start": {"x": 0, "y": 0}, "commands": [{"direction": "east", "steps": 1}],
+        })
+        assert response.status_code == 429
+        assert response.headers["Retry-After"]
+    finally:
+        jobs.unfinished = 0
+
+
+def test_spatial_queries(client):
+    """Test that the visited coordinates of a stored path can be queried by point and rectangle."""
+    results.results.clear()
+    app.config["SPATIAL_SEGMENTS"] = True
+    try:
+        data = _get_response_data(client, {
+            "start": {"x": 10, "y": 20},
+            "commands": [
+                {"direction": "east", "steps": 4},
+                {"direction": "north", "steps": 4},
+                {"direction": "west", "steps": 2},
+                {"direction": "south", "steps": 6},
+            ]
+        })
+    finally:
+        app.config["SPATIAL_SEGMENTS"] = False
+    assert data["result"] == 16
+
+    url = f"/tibber-developer-test/executions/{data['id']}"
+    for (x, y), visited in [((10, 20), True), ((14, 22), True), ((12, 18), True), ((13, 21), False)]:
+        assert client.get(f"{url}/visited?x={x}&y={y}").json["visited"] is visited
+    assert client.get(f"{url}/coverage?min_x=10&min_y=20&max_x=14&max_y=24").json["result"] == 14
+    assert client.get(f"{url}/coverage?min_x=0&min_y=0&max_x=99&max_y=99").json["result"] == 16
+
+    assert client.get(f"{url}/visited?x=1").status_code == 400
+    assert client.get("/tibber-developer-test/executions/0/visited?x=1&y=1").status_code == 404
+
+
+def test_spatial_queries_cached(client):
+    """Test that segments are stored for a path of which the result was cached by a batch."""
+    results.results.clear()
+    path = {"start": {"x": 5, "y": 5}, "commands": [{"direction": "east", "steps": 3}, {"direction": "north", "steps": 2}]}
+    assert client.post("/tibber-developer-test/enter-paths", json={"paths": [path]}).status_code == 200
+
+    app.config["SPATIAL_SEGMENTS"] = True
+    try:
+        for body in (json.dumps(path), encode_path((5, 5), path["commands"])):
+            content_type = "application/json" if isinstance(body, str) else CONTENT_TYPE
+            data = client.post("/tibber-developer-test/enter-path", data=body, content_type=content_type).json
+            assert data["result"] == 6
+            url = f"/tibber-developer-test/executions/{data['id']}"
+            assert client.get(f"{url}/visited?x=8&y=7").json["visited"] is True
+            assert client.get(f"{url}/coverage?min_x=0&min_y=0&max_x=9&max_y=9").json["result"] == 6
+    finally:
+        app.config["SPATIAL_SEGMENTS"] = False
+
+
+def test_execution_history(client):
+    """Test that the history is paged newest first and the statistics cover all executions."""
+    for steps in range(1, 6):
+        _get_response_data(client, {"start": {"x": 0, "y": 0}, "commands": [{"direction": "north", "steps": steps}]})
+
+    pages, cursor = [], None
+    while True:
+        response = client.get("/tibber-developer-test/executions?limit=2" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        pages.append([execution["result"] for execution in response.json["executions"]])
+        cursor = response.json["cursor"]
+        if cursor is None:
+            break
+    assert pages == [[6, 5], [4, 3], [2]]
+
+    stats = client.get("/tibber-developer-test/executions/stats").json
+    assert (stats["count"], stats["commands"], stats["results"]) == (5, 5, 20)
+    assert stats["duration"]["min"] <= stats["duration"]["p50"] <= stats["duration"]["max"]
+    assert client.get("/tibber-developer-test/executions/stats?since=2100-01-01").json["count"] == 0
+
+    assert client.get("/tibber-developer-test/executions?cursor=invalid").status_code == 400
+    assert client.get("/tibber-developer-test/executions/stats?until=invalid").status_code == 400
+
+
+def test_retention_compaction(client):
+    """Test that executions past the retention window are replaced by a mergeable rollup."""
+    for steps in (1, 2):
+        _get_response_data(client, {"start": {"x": 0, "y": 0}, "commands": [{"direction": "north", "steps": steps}]})
+
+    with app.app_context():
+        first = db.session.query(Execution.timestamp).order_by(Execution.id).first()[0]
+        assert compact(30, 3600, now=first + timedelta(days=29)) == {"executions": 0, "periods": 0}
+        assert compact(30, 3600, now=first + timedelta(days=31)) == {"executions": 2, "periods": 1}
+        assert Execution.query.count() == 0
+
+    rollups = client.get("/tibber-developer-test/executions/rollups").json["rollups"]
+    assert len(rollups) == 1
+    assert (rollups[0]["count"], rollups[0]["commands"], rollups[0]["results"]) == (2, 2, 5)
+    assert rollups[0]["command_buckets"]["10"] == 2
+
+
+def test_fleet_coverage(client):
+    """
+    Test that the coverage of a fleet is the union of the paths of its executions, also once
+    the executions are compacted.
+    """
+    results.results.clear()
+    main.fleets.fleets.clear()
+    app.config["SPATIAL_SEGMENTS"] = True
+    try:
+        first, second, third = (
+            _get_response_data(client, {"start": start, "commands": [
+                {"direction": "east", "steps": 4},
+                {"direction": "north", "steps": 2},
+            ]})
+            for start in ({"x": 0, "y": 0}, {"x": 2, "y": 0}, {"x": 0, "y": 10})
+        )
+    finally:
+        app.config["SPATIAL_SEGMENTS"] = False
+
+    url = "/tibber-developer-test/fleets/cleaners"
+    response = client.post(f"{url}/executions", json={"executions": [first["id"], second["id"]]})
+    assert response.status_code == 200
+    assert response.json == {"fleet": "cleaners", "executions": [first["id"], second["id"]], "result": 11}
+
+    response = client.post(f"{url}/executions", json={"executions": [second["id"], third["id"]]})
+    assert response.json["result"] == 18
+    assert client.get(url).json["executions"] == [first["id"], second["id"], third["id"]]
+
+    # The segments of the members outlive the compacted executions
+    with app.app_context():
+        first_timestamp = db.session.query(Execution.timestamp).order_by(Execution.id).first()[0]
+        compact(30, 3600, now=first_timestamp + timedelta(days=31))
+    main.fleets.fleets.clear()
+    assert client.get(url).json["result"] == 18
+
+    assert client.get("/tibber-developer-test/fleets/unknown").status_code == 404
+    assert client.post(f"{url}/executions", json={"executions": [0]}).status_code == 404
+    assert client.post(f"{url}/executions", json={"executions": "all"}).status_code == 400
+
+
+def test_admission_control(client):
+    """Test that malformed, too large and excess requests are rejected before calculating."""
+    command = {"direction": "north", "steps": 1}
+    too_many = {"start": {"x": 0, "y": 0}, "commands": [command] * (app.config["ADMISSION_MAX_COMMANDS"] + 1)}
+    assert client.post("/tibber-developer-test/enter-path", json=too_many).status_code == 413
+    assert client.post(
+        "/tibber-developer-test/enter-path", data=encode_path((0, 0), too_many["commands"]), content_type=CONTENT_TYPE
+    ).status_code == 413
+    assert client.post(
+        "/tibber-developer-test/enter-path", data="x" * (app.config["ADMISSION_MAX_PAYLOAD"] + 1),
+        content_type="application/json",
+    ).status_code == 413
+    assert client.post("/tibber-developer-test/enter-path", json={"start": {"x": 0}, "commands": []}).status_code == 400
+
+    assert client.post("/tibber-developer-test/enter-path", json={
+        "start": {"x": 2 ** 63, "y": 0}, "commands": [command],
+    }).status_code == 400
+
+    # The batch and the sessions have the same limits per path
+    response = client.post("/tibber-developer-test/enter-paths", json={"paths": [too_many]})
+    assert response.json["results"] == [{"error": "too many commands"}]
+    assert client.post("/tibber-developer-test/sessions", json=too_many).status_code == 413
+    session_id = client.post("/tibber-developer-test/sessions", json={"start": {"x": 0, "y": 0}}).json["id"]
+    assert client.post(
+        f"/tibber-developer-test/sessions/{session_id}/commands", json={"commands": too_many["commands"]},
+    ).status_code == 413
+
+    # All slots of an application with a single slot are taken by other requests
+    class LimitedConfig(Config):
+        ADMISSION_MAX_CONCURRENT = 1
+
+    limited_app = create_app(LimitedConfig())
+    limited_app.extensions["limiter"].acquire()
+    limited_client = limited_app.test_client()
+    for url, body in [
+        ("/tibber-developer-test/enter-path", {"start": {"x": 0, "y": 0}, "commands": [command]}),
+        ("/tibber-developer-test/enter-paths", {"paths": [{"start": {"x": 0, "y": 0}, "commands": [command]}]}),
+        ("/tibber-developer-test/sessions", {"start": {"x": 0, "y": 0}}),
+    ]:
+        response = limited_client.post(url, json=body)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == str(limited_app.config["ADMISSION_RETRY_AFTER"])
@@ -0,0 +1,62 @@
+import pickle
+import random
+
+from app import logic
+from app.segments import Segments, grouped
+
+
+def test_segments_columns():
+    """Tests that `Segments` keeps the lines in columns and iterates them as tuples."""
+    segments = Segments([(1, 10, 20), (-3, 5, 6)])
+    assert segments.append(1, 30, 40) == 2
+    assert len(segments) == 3
+    assert list(segments) == [(1, 10, 20), (-3, 5, 6), (1, 30, 40)]
+    assert list(segments.starts) == [10, 5, 30]
+    assert list(pickle.loads(pickle.dumps(segments))) == list(segments)
+
+
+def test_segments_merged_matches_merge_ranges():
+    """
+    Tests that `Segments.merged` returns the same lines as `_merge_ranges`, sorted by axis
+    and start.
+    """
+    rng = random.Random(3)
+    for _ in range(50):
+        lines = [(rng.randint(-3, 3), start, start + rng.randint(0, 10)) for start in rng.sample(range(-50, 50), 30)]
+        merged = Segments(lines).merged()
+        assert set(merged) == logic._merge_ranges(set(lines))
+        assert list(merged) == sorted(merged)
+
+
+def test_segments_grouped():
+    """
+    Tests that the merged lines are grouped by axis with `positions` and `offsets`, and
+    that `grouped` merges other ranges first.
+    """
+    merged = Segments([(2, 5, 6), (-1, 0, 3), (2, 0, 1), (-1, 2, 8), (7, 1, 1)]).merged()
+    assert list(merged) == [(-1, 0, 8), (2, 0, 1), (2, 5, 6), (7, 1, 1)]
+    assert merged.positions == [-1, 2, 7]
+    assert list(merged.offsets) == [0, 1, 3, 4]
+    assert grouped(merged) is merged
+
+    lines = grouped({(2, 5, 6), (2, 0, 1)})
+    assert (lines.positions, list(lines.offsets)) == ([2], [0, 2])
+    assert grouped(set()).positions == []
+
+
+def test_segments_union_matches_merged():
+    """
+    Tests that the union of two merged stores has the same lines and groups as merging all
+    lines of both.
+    """
+    rng = random.Random(4)
+    for _ in range(50):
+        first, second = (
+            [(rng.randint(-3, 3), start, start + rng.randint(0, 10)) for start in rng.sample(range(-50, 50), count)]
+            for count in (rng.randint(0, 30), rng.randint(0, 30))
+        )
+        union = Segments(first).merged().union(Segments(second).merged())
+        merged = Segments(first + second).merged()
+        assert list(union) == list(merged)
+        assert union.positions == merged.positions
+        assert list(union.offsets) == list(merged.offsets)
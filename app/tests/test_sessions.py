@@ -0,0 +1,82 @@
+import pytest
+from flask import Flask
+
+from app.admission import Deadline, DeadlineExceeded
+from app.database import db
+from app.models import SessionState
+from app.sessions import SessionConflict, SessionStore, SessionTooLong
+
+EAST = {"direction": "east", "steps": 5}
+NORTH = {"direction": "north", "steps": 1}
+WEST = {"direction": "west", "steps": 8}
+
+
+@pytest.fixture
+def flask_app():
+    """Fixture of an application with an in-memory database for the sessions."""
+    flask_app = Flask(__name__)
+    flask_app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(flask_app)
+    with flask_app.app_context():
+        db.create_all()
+        yield flask_app
+
+
+def test_session_store(flask_app):
+    """Tests that a session is continued from its stored state, as another worker process would."""
+    session = SessionStore().create((1, 1), [EAST])
+    assert session["result"] == 6
+    db.session.remove()
+
+    session = SessionStore().append(session["id"], [NORTH, WEST])
+    assert session["position"] == {"x": -2, "y": 2}
+    assert (session["commands"], session["result"]) == (3, 15)
+    assert SessionStore().get(session["id"]) == session
+    assert SessionStore().get("unknown") is None
+    assert SessionStore().append("unknown", [EAST]) is None
+
+
+def test_session_expiry(flask_app):
+    """Tests that sessions are no longer returned after they expire, and are dropped on create."""
+    store = SessionStore(ttl=-1)
+    session = store.create((0, 0), [])
+    assert store.get(session["id"]) is None
+    store.create((0, 0), [])
+    assert db.session.get(SessionState, session["id"]) is None
+
+
+def test_session_max_commands(flask_app):
+    """Tests that a session walks at most `max_commands` commands in total."""
+    store = SessionStore(max_commands=2)
+    with pytest.raises(SessionTooLong):
+        store.create((0, 0), [EAST] * 3)
+    session = store.create((0, 0), [EAST])
+    with pytest.raises(SessionTooLong):
+        store.append(session["id"], [EAST, EAST])
+    assert store.append(session["id"], [EAST])["commands"] == 2
+
+
+def test_session_conflict(flask_app, monkeypatch):
+    """Tests that an append fails instead of overwriting an append that was stored meanwhile."""
+    store = SessionStore()
+    session = store.create((0, 0), [])
+    get_state = store._get_state
+
+    def get_state_and_append_meanwhile(session_id):
+        state = get_state(session_id)
+        SessionState.query.filter_by(id=session_id).update({"version": state.version + 1}, synchronize_session=False)
+        return state
+
+    monkeypatch.setattr(store, "_get_state", get_state_and_append_meanwhile)
+    with pytest.raises(SessionConflict):
+        store.append(session["id"], [EAST])
+    assert SessionStore().get(session["id"])["commands"] == 0
+
+
+def test_session_deadline(flask_app):
+    """Tests that a session is unchanged when the deadline passes while walking the commands."""
+    store = SessionStore()
+    session = store.create((0, 0), [EAST])
+    with pytest.raises(DeadlineExceeded):
+        store.append(session["id"], [NORTH, WEST], Deadline(-1))
+    assert store.get(session["id"]) == session
@@ -0,0 +1,68 @@
+import subprocess
+import sys
+from wsgiref.util import setup_testing_defaults
+
+from app import startup_benchmark
+from app.config import Config, setting
+from app.startup import LazyApp
+
+
+def _get(application, path):
+    """Small helper function to call a WSGI application, returning the status and body."""
+    environ = {"PATH_INFO": path}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = b"".join(application(environ, lambda status, headers, exc_info=None: statuses.append(status)))
+    return statuses[0], body
+
+
+def test_lazy_app():
+    """Tests that the health check is answered without loading the application, which is loaded once."""
+    loaded = []
+
+    def factory():
+        loaded.append(True)
+        return lambda environ, start_response: start_response("200 OK", []) or [environ["PATH_INFO"].encode()]
+
+    lazy_app = LazyApp(factory)
+    assert _get(lazy_app, "/health") == ("200 OK", b'{"status":"ok"}\n')
+    assert loaded == []
+
+    assert _get(lazy_app, "/metrics") == ("200 OK", b"/metrics")
+    assert _get(lazy_app, "/health") == ("200 OK", b"/health")
+    assert loaded == [True]
+
+
+def test_settings_are_read_once():
+    """Tests that a setting is read on first access and then replaced by its value."""
+    reads = []
+
+    class Settings(Config):
+        VALUE = setting(lambda config: reads.append(True) or config["database"]["db"])
+
+    assert Settings.VALUE == Settings().VALUE == Config.DATABASE_DB
+    assert reads == [True]
+    assert "VALUE" in vars(Settings) and Settings.__dict__["VALUE"] == Config.DATABASE_DB
+
+
+def test_config_is_not_read_on_import():
+    """Tests that importing the application modules does not parse the YAML config, which is read on first use."""
+    code = (
+        "import app.algorithms, app.batch, app.cache, app.jobs, app.main\n"
+        "from app.config import load_config_from_env\n"
+        "print(load_config_from_env.cache_info().currsize)"
+    )
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == "0"
+
+
+def test_startup_benchmark():
+    """Tests that the lazy application answers the health check before importing Flask or SQLAlchemy."""
+    report = startup_benchmark.run(["lazy"], repeat=1)
+    result = report["results"][0]
+    assert result["imported_at_health"] == []
+    assert all(result[name] > 0 for name in startup_benchmark.TIMINGS)
+
+    assert startup_benchmark.compare(report, report) == []
+    slower = {"results": [{**result, "ready": result["ready"] * 2 + 1}]}
+    assert len(startup_benchmark.compare(slower, report)) == 1
@@ -0,0 +1,63 @@
+import io
+import json
+
+import pytest
+
+from app.streaming import PathStream
+
+
+def _parse(body, chunk_size):
+    """Small helper function to parse a body and return the parser and its commands."""
+    path = PathStream(io.BytesIO(body.encode()), chunk_size=chunk_size)
+    return path, list(path.commands())
+
+
+def test_commands_in_small_chunks():
+    """
+    Tests that `PathStream` yields all commands and stores the start point, also when
+    values are split over many chunks.
+    """
+    payload = {
+        "start": {"x": -12345, "y": 678},
+        "commands": [{"direction": "east", "steps": 99999}, {"direction": "north", "steps": 1}] * 50,
+    }
+    body = json.dumps(payload, indent=2)
+
+    for chunk_size in [1, 3, 7, 64 * 1024]:
+        path, commands = _parse(body, chunk_size)
+        assert commands == payload["commands"]
+        assert path.start == payload["start"]
+        assert path.count == 100
+
+
+def test_start_after_commands():
+    """
+    Tests that `PathStream` handles the 'start' key after the 'commands' and ignores
+    unknown keys.
+    """
+    body = '{"commands": [{"direction": "west", "steps": 2}], "other": [1, {"a": 2}], "start": {"x": 1, "y": 2}}'
+    path, commands = _parse(body, 4)
+    assert commands == [{"direction": "west", "steps": 2}]
+    assert path.start == {"x": 1, "y": 2}
+
+
+def test_empty_commands():
+    """Tests that `PathStream` handles an empty list of commands and an empty object."""
+    path, commands = _parse('{"start": {"x": 0, "y": 0}, "commands": []}', 5)
+    assert commands == []
+    assert path.count == 0
+
+    path, commands = _parse("{}", 5)
+    assert commands == []
+    assert path.start is None
+
+
+def test_invalid_body():
+    """Tests that `PathStream` raises a `ValueError` for truncated or invalid bodies."""
+    for body in [
+        '{"commands": [{"direction": "east"', '{"commands": {}}', '[]', '',
+        '{"commands": [{"direction": "east", "steps": 18446744073709551616}]}',
+        '{"commands": [{"direction": "up", "steps": 1}]}',
+    ]:
+        with pytest.raises(ValueError):
+            _parse(body, 4)
@@ -0,0 +1,102 @@
+import random
+
+import numpy as np
+
+from app import logic, vectorized
+
+
+def test_merge_segments_matches_merge_ranges():
+    """
+    Tests that `_merge_segments` merges overlapping segments in the same way as
+    `_merge_ranges`, across multiple axes.
+    """
+    ranges = {(1, -21, 100), (1, 1, 101), (1, 200, 300), (3, 50, 100), (3, 100, 120), (-5, 0, 0)}
+    axis, start, end = (np.array(column, dtype=np.int64) for column in zip(*ranges))
+
+    merged = vectorized._merge_segments(axis, start, end)
+    assert set(zip(*(column.tolist() for column in merged))) == logic._merge_ranges(ranges)
+
+
+def test_calculate_unique_coordinates():
+    """
+    Tests that `calculate_unique_coordinates` correctly returns the number of unique
+    coordinates for the assignment example and when running in circles.
+    """
+    commands = [
+        {"direction": "east", "steps": 2},
+        {"direction": "north", "steps": 1},
+    ]
+    assert vectorized.calculate_unique_coordinates((10, 22), commands)[0] == 4
+
+    commands = [
+        {"direction": "east", "steps": 1},
+        {"direction": "north", "steps": 1},
+        {"direction": "west", "steps": 1},
+        {"direction": "south", "steps": 1},
+    ] * 100
+    assert vectorized.calculate_unique_coordinates((1, 1), commands)[0] == 4
+    assert vectorized.calculate_unique_coordinates((1, 1), [])[0] == 0
+
+
+def test_calculate_unique_coordinates_random_walks():
+    """
+    Tests that `calculate_unique_coordinates` returns the same number of unique
+    coordinates as `logic.calculate_unique_coordinates` for random walks.
+    """
+    rng = random.Random(42)
+    for _ in range(20):
+        commands = [
+            {"direction": rng.choice(list(logic.DIRECTIONS)), "steps": rng.randint(0, 20)}
+            for _ in range(rng.randint(1, 300))
+        ]
+        expected = logic.calculate_unique_coordinates((3, -7), commands)[0]
+        assert vectorized.calculate_unique_coordinates((3, -7), commands)[0] == expected
+
+
+def test_prefix_counts():
+    """
+    Tests that `_prefix_counts` returns the same counts as checking every prefix.
+    """
+    rng = np.random.default_rng(42)
+    values = rng.integers(-50, 50, size=37)
+    prefixes = rng.integers(0, len(values) + 1, size=200)
+    limits = rng.integers(-60, 60, size=200)
+
+    expected = [int((values[:prefix] <= limit).sum()) for prefix, limit in zip(prefixes, limits)]
+    assert vectorized._prefix_counts(values, prefixes, limits).tolist() == expected
+
+
+def test_calculate_unique_coordinates_maximum_input():
+    """
+    Tests that `calculate_unique_coordinates` is correct and performant for large inputs.
+    """
+    start = (-100000, -100000)
+    commands = [
+        {"direction": "east", "steps": 99999},
+        {"direction": "north", "steps": 99999},
+        {"direction": "west", "steps": 99998},
+        {"direction": "south", "steps": 99998},
+    ] * 2500
+    expected = 993737501
+
+    unique_coordinates, duration = vectorized.calculate_unique_coordinates(start, commands)
+    assert unique_coordinates == expected
+    assert duration < 10
+
+
+def test_far_apart_values():
+    """
+    Tests that the merge and the merge sort tree are exact for values far apart, where
+    keys derived from the span of the values would overflow.
+    """
+    far = 2 ** 61
+    axis = np.array([0, 0, 1, 1], dtype=np.int64)
+    start = np.array([-far, 0, -far, far - 10], dtype=np.int64)
+    end = np.array([-far + 5, far, -far + 1, far], dtype=np.int64)
+    merged = vectorized._merge_segments(axis, start, end)
+    assert [column.tolist() for column in merged] == [[0, 0, 1, 1], [-far, 0, -far, far - 10], [-far + 5, far, -far + 1, far]]
+
+    values = np.array([far, -far, 0, far - 1], dtype=np.int64)
+    prefixes = np.array([4, 4, 2, 3, 1], dtype=np.int64)
+    limits = np.array([far - 1, -far, 0, far, -far], dtype=np.int64)
+    assert vectorized._prefix_counts(values, prefixes, limits).tolist() == [3, 1, 1, 3, 0]
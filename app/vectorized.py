@@ -0,0 +1,189 @@
+from time import perf_counter
+
+import numpy as np
+
+from app.logic import DIRECTIONS
+
+
+# Direction codes are the index of the direction in `DIRECTIONS`
+DIRECTION_CODES = {direction: code for code, direction in enumerate(DIRECTIONS)}
+DELTA_X = np.array([delta_x for delta_x, _ in DIRECTIONS.values()], dtype=np.int64)
+DELTA_Y = np.array([delta_y for _, delta_y in DIRECTIONS.values()], dtype=np.int64)
+
+
+def _commands_to_arrays(commands):
+    """
+    Convert the commands to integer arrays in a single pass per column.
+
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+
+    :return: Tuple of (array of direction codes, array of steps)
+    """
+    count = len(commands)
+    codes = np.fromiter(
+        (DIRECTION_CODES[command["direction"]] for command in commands), dtype=np.int8, count=count
+    )
+    steps = np.fromiter((command["steps"] for command in commands), dtype=np.int64, count=count)
+    return codes, steps
+
+
+def _segments(start_point, codes, steps):
+    """
+    Derive the start and end coordinate of every command with cumulative sums and split
+    them into horizontal and vertical segments.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param np.ndarray codes: Array of direction codes
+    :param np.ndarray steps: Array of steps
+
+    :return: Tuple of (horizontal, vertical) segments, both as (axis, start, end) arrays
+    """
+    delta_x = DELTA_X[codes]
+    delta_y = DELTA_Y[codes]
+
+    # Ending coordinates are the running sum of the moves, starting coordinates are
+    # the ending coordinates of the previous command
+    end_x = start_point[0] + np.cumsum(delta_x * steps)
+    end_y = start_point[1] + np.cumsum(delta_y * steps)
+    start_x = np.concatenate(([start_point[0]], end_x[:-1]))
+    start_y = np.concatenate(([start_point[1]], end_y[:-1]))
+
+    horizontal = delta_y == 0
+    vertical = ~horizontal
+    return (
+        (start_y[horizontal],
+         np.minimum(start_x, end_x)[horizontal],
+         np.maximum(start_x, end_x)[horizontal]),
+        (start_x[vertical],
+         np.minimum(start_y, end_y)[vertical],
+         np.maximum(start_y, end_y)[vertical]),
+    )
+
+
+def _merge_segments(axis, start, end):
+    """
+    Vectorized equivalent of `_merge_ranges`, which sorts the segments by axis and start
+    and merges overlapping segments using a running maximum of the ends per axis.
+
+    :param np.ndarray axis: Array of axis positions of the segments
+    :param np.ndarray start: Array of start positions of the segments
+    :param np.ndarray end: Array of end positions of the segments
+
+    :return: Tuple of (axis, start, end) arrays of merged segments, sorted by axis and start
+    """
+    if not len(axis):
+        return axis, start, end
+
+    order = np.lexsort((start, axis))
+    axis, start, end = axis[order], start[order], end[order]
+
+    # Mark the first segment of every axis
+    new_axis = np.empty(len(axis), dtype=bool)
+    new_axis[0] = True
+    np.not_equal(axis[1:], axis[:-1], out=new_axis[1:])
+
+    # Running maximum of the ends within each axis, by shifting every axis group above
+    # the values of the previous group so the maximum never leaks across groups. The ends
+    # are replaced by their rank, so the shifted values stay below the number of segments
+    # squared instead of overflowing for coordinates far apart
+    distinct_ends, end_ranks = np.unique(end, return_inverse=True)
+    offset = (np.cumsum(new_axis) - 1) * len(distinct_ends)
+    running_end = distinct_ends[np.maximum.accumulate(end_ranks + offset) - offset]
+
+    # A new merged segment starts at a new axis or when there's no overlap
+    new_segment = new_axis
+    new_segment[1:] |= start[1:] > running_end[:-1]
+    first = np.flatnonzero(new_segment)
+    return axis[first], start[first], np.maximum.reduceat(end, first)
+
+
+def _prefix_counts(values, prefixes, limits):
+    """
+    For every query, counts how many of the first `prefix` values are at most `limit`.
+    The values are stored in a merge sort tree, where level k holds the values sorted
+    within consecutive blocks of 2^k values. A prefix splits into at most one block per
+    level, which are all looked up with a single `searchsorted` per level.
+
+    :param np.ndarray values: Array of values, in the order that the prefixes refer to
+    :param np.ndarray prefixes: Array with the length of the prefix of every query
+    :param np.ndarray limits: Array with the (inclusive) limit of every query
+
+    :return: Array with the count of every query
+    """
+    counts = np.zeros(len(prefixes), dtype=np.int64)
+    if not len(values):
+        return counts
+
+    # Replace values and limits by their rank among the distinct values, shifted into
+    # [0, span), so every block gets its own key range without overflowing the keys
+    distinct, ranks = np.unique(values, return_inverse=True)
+    span = len(distinct) + 1
+    shifted_values = ranks + 1
+    shifted_limits = np.searchsorted(distinct, limits, side="right")
+    positions = np.arange(len(values), dtype=np.int64)
+
+    for level in range(len(values).bit_length()):
+        keys = np.sort((positions >> level) * span + shifted_values)
+
+        # The prefix contains a block of this level if the matching bit is set
+        in_prefix = (prefixes >> level) & 1
+        block = (prefixes >> (level + 1)) << 1
+        found = np.searchsorted(keys, block * span + shifted_limits, side="right") - (block << level)
+        counts += in_prefix * found
+
+    return counts
+
+
+def _count_intersections(horizontal, vertical):
+    """
+    Counts the number of intersections between the merged horizontal and vertical
+    segments. The horizontal segments between the start and end of every vertical
+    segment are found with `searchsorted`, after which the segments that contain the
+    x-coordinate of the vertical segment are counted as (start_x <= x) - (end_x < x).
+
+    :param tuple horizontal: Tuple of (y_pos, start_x, end_x) arrays, sorted by y_pos
+    :param tuple vertical: Tuple of (x_pos, start_y, end_y) arrays
+
+    :return: Integer representing the number of intersections
+    """
+    y_pos, start_x, end_x = horizontal
+    x_pos, start_y, end_y = vertical
+
+    # Query both the prefix up to the end and up to the start of every vertical segment
+    prefixes = np.concatenate((
+        np.searchsorted(y_pos, end_y, side="right"),
+        np.searchsorted(y_pos, start_y, side="left"),
+    ))
+    limits = np.concatenate((x_pos, x_pos))
+    counts = _prefix_counts(start_x, prefixes, limits) - _prefix_counts(end_x, prefixes, limits - 1)
+    return int(counts[:len(x_pos)].sum() - counts[len(x_pos):].sum())
+
+
+def calculate_unique_coordinates(start_point, commands):
+    """
+    NumPy-vectorized equivalent of `logic.calculate_unique_coordinates`, which processes
+    all commands as arrays instead of one by one.
+
+    :param tuple start_point: Tuple of the starting (x, y) coordinate
+    :param list commands: List of dictionaries containing the 'direction' and 'steps' commands
+
+    :return: Tuple of (Integer of unique coordinates, Float of the duration)
+    """
+
+    # Start the timer
+    start_time = perf_counter()
+
+    if not len(commands):
+        return 0, perf_counter() - start_time
+
+    # Convert the commands once and derive all segments from them
+    codes, steps = _commands_to_arrays(commands)
+    horizontal, vertical = _segments(start_point, codes, steps)
+    horizontal = _merge_segments(*horizontal)
+    vertical = _merge_segments(*vertical)
+
+    # Sum of all points on horizontal and vertical lines, minus the intersections
+    total = int((horizontal[2] - horizontal[1] + 1).sum() + (vertical[2] - vertical[1] + 1).sum())
+    total -= _count_intersections(horizontal, vertical)
+    duration = perf_counter() - start_time
+    return total, duration
@@ -0,0 +1,60 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from threading import Lock
+
+from app.config import Config
+
+_pools = {}
+_lock = Lock()
+_in_worker = False
+
+
+def _mark_worker():
+    """Initializer of the worker processes, see `in_worker_process`."""
+    global _in_worker
+    _in_worker = True
+
+
+def in_worker_process():
+    """
+    Whether this is a worker process of a pool, which should not start a pool of its own,
+    since the nested pool keeps the worker from exiting.
+
+    :return: Boolean whether this is a worker process
+    """
+    return _in_worker
+
+
+def default_workers():
+    """
+    Number of processes of the pool of this process: `algorithm.parallel_workers` of the
+    config, or otherwise the cores divided over the gunicorn workers, so the pools of all
+    workers together start about one process per core.
+
+    :return: Integer of the number of processes, at least 1
+    """
+    if Config.PARALLEL_WORKERS:
+        return Config.PARALLEL_WORKERS
+    cores = os.cpu_count() or 1
+    return max(cores // (Config.SERVER_WORKERS or cores), 1)
+
+
+def get_process_pool(workers=None):
+    """
+    Fetch a process pool with `workers` processes, which is created on first use and then
+    shared by all requests in this process, so worker start-up is only paid once. The
+    workers are started by a fork server, since forking a process with threads, like a
+    gunicorn worker, can copy locks that are held by other threads.
+
+    :param int workers: Number of worker processes (default is `default_workers`)
+
+    :return: `ProcessPoolExecutor` with the requested number of workers
+    """
+    workers = workers or default_workers()
+    with _lock:
+        if workers not in _pools:
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=get_context("forkserver"), initializer=_mark_worker,
+            )
+        return _pools[workers]
@@ -0,0 +1,7 @@
+from app.config import Config
+from app.startup import LazyApp, load_app
+
+
+# In fast-start mode, workers answer the health check right away and load the application
+# on the first other request, otherwise it is loaded once before forking the workers
+app = LazyApp(load_app) if Config.SERVER_FAST_START else load_app()